@@ -1,56 +1,246 @@
 from abc import ABC, abstractmethod
 import asyncio
-import json
 import logging
+import os
+import random
+import time
 import websockets
-from typing import Dict, Any, Optional
+from collections import deque
+from typing import Dict, Any, List, Optional, Set
 from datetime import datetime
+from ..mcp_server.protocol import WireCodec, codec_for_subprotocol, offered_subprotocols
+from ..telemetry.metrics import MetricsRegistry
+from ..telemetry.tracing import Span, get_tracer
 
 logger = logging.getLogger(__name__)
 
 class BaseAgent(ABC):
-    def __init__(self, agent_id: str, mcp_server_url: str):
+    # Task types this agent can process, advertised to the MCP Server for routing
+    capabilities: List[str] = []
+    # Topics this agent wants messages for: "context", "agent_status",
+    # "task_updates" or "task:<task_id>"
+    subscriptions: List[str] = ["context"]
+    # Seconds a task of each type may run before it is abandoned; other types
+    # use TASK_TIMEOUT_SECONDS, and a task's own timeout_seconds wins over both
+    task_timeouts: Dict[str, float] = {}
+
+    def __init__(self, agent_id: str, mcp_server_url: str, max_concurrent_tasks: Optional[int] = None):
         self.agent_id = agent_id
         self.mcp_server_url = mcp_server_url
         self.websocket = None
         self.context = {}
+        # Versions of the shared context as last seen from the MCP Server; a
+        # delta whose from_version is ahead of context_version means one was missed
+        self.context_version = 0
+        self.context_versions: Dict[str, int] = {}
         self.is_connected = False
         self.current_tasks = []
 
+        # Tasks are handed to a bounded pool of workers so the receive loop never
+        # blocks on a slow task. When the queue is full new tasks wait in an
+        # overflow list instead, so cancel and context frames behind them are
+        # still read; the MCP Server bounds how many tasks it sends anyway.
+        self.max_concurrent_tasks = max_concurrent_tasks or int(os.getenv("MAX_CONCURRENT_TASKS", "5"))
+        self.task_queue_size = int(os.getenv("TASK_QUEUE_SIZE", str(self.max_concurrent_tasks * 2)))
+        self.drain_timeout = float(os.getenv("AGENT_DRAIN_TIMEOUT_SECONDS", "30"))
+        self._task_queue: Optional[asyncio.Queue] = None
+        self._overflow = deque()
+        self._workers: List[asyncio.Task] = []
+        self._listener: Optional[asyncio.Task] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self.default_task_timeout = float(os.getenv("TASK_TIMEOUT_SECONDS", "300"))
+        self.task_timeouts = {**self.task_timeouts, **self._parse_timeouts(os.getenv("TASK_TIMEOUTS", ""))}
+        # Running tasks by id, so a cancel from the MCP Server can stop them
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancel_requested: Set[str] = set()
+
+        # Liveness and reconnect settings. Results produced while disconnected
+        # are kept in the outbox and sent once the connection is back.
+        self.heartbeat_interval = float(os.getenv("AGENT_HEARTBEAT_SECONDS", "10"))
+        self.reconnect_base_delay = float(os.getenv("AGENT_RECONNECT_BASE_SECONDS", "1"))
+        self.reconnect_max_delay = float(os.getenv("AGENT_RECONNECT_MAX_SECONDS", "30"))
+        self._outbox = deque(maxlen=int(os.getenv("AGENT_OUTBOX_SIZE", "1000")))
+        self._stopping = False
+
+        # Preferred wire encoding, offered to the MCP Server as websocket
+        # subprotocols; the server's choice decides the codec, JSON if it picks none
+        self.wire_encoding = os.getenv("AGENT_WIRE_ENCODING", "msgpack").lower()
+        self.wire_compression = os.getenv("AGENT_WIRE_COMPRESSION", "zstd").lower()
+        if self.wire_compression == "none":
+            self.wire_compression = None
+        self.codec = WireCodec("json")
+
+        # Metrics of this agent and its AI provider, pushed to the MCP Server
+        # which serves them on /metrics labelled with the agent id
+        self.metrics = MetricsRegistry()
+        self.metrics_push_interval = float(os.getenv("AGENT_METRICS_PUSH_SECONDS", "15"))
+        self._metrics_pusher: Optional[asyncio.Task] = None
+        self._task_duration = self.metrics.histogram(
+            "agent_task_duration_seconds", "Time agents spend on a task", ("type", "outcome"),
+        )
+        self.metrics.gauge("agent_tasks_running", "Tasks an agent is working on", func=lambda: len(self._running))
+        self.metrics.gauge(
+            "agent_tasks_queued", "Tasks waiting for a free agent worker",
+            func=lambda: (self._task_queue.qsize() if self._task_queue else 0) + len(self._overflow),
+        )
+        self.metrics.gauge("agent_max_concurrent_tasks", "Worker pool size of an agent", func=lambda: self.max_concurrent_tasks)
+
+        # Tasks carry the MCP Server's traceparent; spans cover the wait for a
+        # worker ("agent.receive") and the processing ("agent.task")
+        self.tracer = get_tracer()
+        self._receive_spans: Dict[str, Span] = {}
+
     async def connect(self):
         """Establish WebSocket connection with MCP Server"""
         try:
-            self.websocket = await websockets.connect(f"{self.mcp_server_url}/ws/agent/{self.agent_id}")
+            self.websocket = await websockets.connect(
+                f"{self.mcp_server_url}/ws/agent/{self.agent_id}",
+                ping_interval=self.heartbeat_interval,
+                ping_timeout=self.heartbeat_interval,
+                subprotocols=offered_subprotocols(self.wire_encoding, self.wire_compression),
+            )
+            self.codec = codec_for_subprotocol(self.websocket.subprotocol)
             self.is_connected = True
-            logger.info(f"Agent {self.agent_id} connected to MCP Server")
+            logger.info(f"Agent {self.agent_id} connected to MCP Server using {self.codec.subprotocol}")
+            
+            # Start the task workers before listening so no task waits on startup
+            self._start_workers()
             
             # Start listening for messages
-            asyncio.create_task(self._listen_for_messages())
+            self._listener = asyncio.create_task(self._listen_for_messages())
+            self._heartbeat = asyncio.create_task(self._send_heartbeats())
+            if self.metrics_push_interval > 0:
+                self._metrics_pusher = asyncio.create_task(self._push_metrics())
             
-            # Send initial status
+            # Deliver results finished while disconnected, then resume with
+            # the tasks still in progress so they are not delivered again
+            await self._flush_outbox()
             await self.send_status("ready")
             
         except Exception as e:
             logger.error(f"Failed to connect to MCP Server: {e}")
             self.is_connected = False
 
+    async def run(self):
+        """Stay connected to the MCP Server, reconnecting with backoff until disconnected"""
+        self._stopping = False
+        attempt = 0
+        while not self._stopping:
+            await self.connect()
+            if self.is_connected:
+                attempt = 0
+                await asyncio.gather(self._listener, return_exceptions=True)
+            if self._stopping:
+                break
+            delay = random.uniform(0, min(self.reconnect_max_delay, self.reconnect_base_delay * 2 ** attempt))
+            attempt += 1
+            logger.info(f"Agent {self.agent_id} reconnecting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
     async def disconnect(self):
-        """Close WebSocket connection"""
+        """Drain in-flight tasks and close WebSocket connection"""
+        self._stopping = True
+        # Stop receiving new work, then let queued and running tasks finish
+        if self._listener and self._listener is not asyncio.current_task():
+            self._listener.cancel()
+        await self._drain_workers()
+        await self.tracer.flush()
+        if self._heartbeat:
+            self._heartbeat.cancel()
+        if self._metrics_pusher:
+            self._metrics_pusher.cancel()
+        
         if self.websocket:
             await self.websocket.close()
             self.is_connected = False
             logger.info(f"Agent {self.agent_id} disconnected from MCP Server")
 
+    async def _send_heartbeats(self):
+        """Tell the MCP Server this agent is alive, even when it has nothing else to say"""
+        while self.is_connected:
+            await asyncio.sleep(self.heartbeat_interval)
+            await self._send({"type": "heartbeat", "agent_id": self.agent_id})
+
+    async def _push_metrics(self):
+        """Send this agent's metrics to the MCP Server, which has the /metrics endpoint"""
+        while self.is_connected:
+            await asyncio.sleep(self.metrics_push_interval)
+            await self._send({"type": "metrics", "agent_id": self.agent_id, "families": self.metrics.collect()})
+
+    async def _send(self, message: Dict[str, Any], buffer: bool = False) -> bool:
+        """Send a message, keeping it for the next connection if `buffer` and it cannot be sent"""
+        if self.is_connected:
+            try:
+                await self.websocket.send(self.codec.encode(message))
+                return True
+            except websockets.exceptions.ConnectionClosed:
+                self.is_connected = False
+        if buffer:
+            self._outbox.append(message)
+        return False
+
+    async def _flush_outbox(self):
+        while self._outbox and self.is_connected:
+            message = self._outbox.popleft()
+            if not await self._send(message):
+                self._outbox.appendleft(message)
+                break
+
+    def _start_workers(self):
+        """Start the bounded pool of task workers"""
+        if self._workers:
+            return
+        self._task_queue = asyncio.Queue(maxsize=self.task_queue_size)
+        self._workers = [
+            asyncio.create_task(self._task_worker(i))
+            for i in range(self.max_concurrent_tasks)
+        ]
+        logger.info(f"Agent {self.agent_id} started {self.max_concurrent_tasks} task workers")
+
+    async def _task_worker(self, worker_index: int):
+        """Pull tasks off the local queue and process them one at a time"""
+        while True:
+            task = await self._task_queue.get()
+            if self._overflow:
+                # Refill before task_done so a drain does not finish while tasks overflow
+                self._task_queue.put_nowait(self._overflow.popleft())
+            try:
+                await self._handle_task(task)
+            except Exception as e:
+                logger.error(f"Worker {worker_index} of agent {self.agent_id} failed: {e}")
+            finally:
+                self._task_queue.task_done()
+
+    async def _drain_workers(self):
+        """Wait for queued tasks to finish, then stop the workers"""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._task_queue.join(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Agent {self.agent_id} gave up draining after {self.drain_timeout}s "
+                f"with {self._task_queue.qsize()} tasks queued"
+            )
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
     async def _listen_for_messages(self):
         """Listen for incoming messages from MCP Server"""
         while self.is_connected:
             try:
                 message = await self.websocket.recv()
-                data = json.loads(message)
+                data = self.codec.decode(message)
                 await self._handle_message(data)
             except websockets.exceptions.ConnectionClosed:
                 logger.error("Connection to MCP Server closed")
                 self.is_connected = False
+                if self._heartbeat:
+                    self._heartbeat.cancel()
+                if self._metrics_pusher:
+                    self._metrics_pusher.cancel()
                 break
             except Exception as e:
                 logger.error(f"Error handling message: {e}")
@@ -60,26 +250,159 @@ class BaseAgent(ABC):
         message_type = message.get("type")
         
         if message_type == "task":
-            await self._handle_task(message)
+            await self._enqueue_task(message)
+        elif message_type == "cancel":
+            self._cancel_task(message.get("task_id"))
+        elif message_type == "context_delta":
+            await self._handle_context_delta(message)
+        elif message_type == "context_snapshot":
+            await self._handle_context_snapshot(message)
         elif message_type == "context_update":
             await self._handle_context_update(message)
         elif message_type == "agent_status":
             await self._handle_agent_status(message)
 
+    async def _enqueue_task(self, task: Dict[str, Any]):
+        """Hand a task to the worker pool without blocking the receive loop"""
+        task_id = task.get("task_id")
+        if not task_id:
+            return
+        if task_id in self.current_tasks:
+            # The MCP Server redelivers unfinished tasks when we reconnect
+            logger.info(f"Agent {self.agent_id} ignoring duplicate delivery of task {task_id}")
+            return
+        self.current_tasks.append(task_id)
+        self._receive_spans[task_id] = self.tracer.start_span(
+            "agent.receive", parent=task.get("traceparent"), attributes={"agent_id": self.agent_id, "task_id": task_id},
+        )
+        
+        if self._task_queue is None:
+            self._start_workers()
+        if self._task_queue.full():
+            logger.warning(f"Agent {self.agent_id} task queue full, holding task {task_id} until a worker is free")
+            self._overflow.append(task)
+        else:
+            self._task_queue.put_nowait(task)
+
     async def _handle_task(self, task: Dict[str, Any]):
         """Handle incoming task"""
         task_id = task.get("task_id")
         if task_id:
-            self.current_tasks.append(task_id)
-            try:
-                result = await self.process_task(task)
-                await self.send_task_completion(task_id, result)
-            except Exception as e:
-                logger.error(f"Error processing task {task_id}: {e}")
-                await self.send_task_error(task_id, str(e))
+            receive_span = self._receive_spans.pop(task_id, None)
+            if receive_span is not None:
+                receive_span.end()
+            # Don't spend provider calls on a result nobody is waiting for any more
+            if task.get("deadline") and time.time() >= task["deadline"]:
+                logger.info(f"Agent {self.agent_id} skipping task {task_id}, its deadline passed")
+                await self.send_task_error(task_id, "Deadline exceeded before processing", expired=True)
+                return
+            if task_id in self._cancel_requested:
+                # Cancelled while it waited in the local queue
+                self._cancel_requested.discard(task_id)
+                self._forget_task(task_id)
+                return
+            task_type = task.get("task_type", task.get("type"))
+            attributes = {"agent_id": self.agent_id, "task_id": task_id, "type": task_type}
+            with self.tracer.span("agent.task", parent=task.get("traceparent"), attributes=attributes) as span:
+                timeout = self._task_timeout(task)
+                # Created inside the span so provider calls become its children
+                runner = asyncio.create_task(self.process_task(task))
+                self._running[task_id] = runner
+                started = time.perf_counter()
+                outcome = "completed"
+                try:
+                    result = await asyncio.wait_for(runner, timeout)
+                    await self.send_task_completion(task_id, result)
+                except asyncio.TimeoutError:
+                    outcome = "timeout"
+                    logger.warning(f"Task {task_id} timed out after {round(timeout, 1):g}s")
+                    span.record_error(f"timed out after {round(timeout, 1):g}s")
+                    await self.send_task_error(task_id, f"Task timed out after {round(timeout, 1):g}s")
+                except asyncio.CancelledError:
+                    outcome = "cancelled"
+                    if task_id not in self._cancel_requested:
+                        raise
+                    # The MCP Server already recorded the cancellation
+                    logger.info(f"Agent {self.agent_id} cancelled task {task_id}")
+                    self._forget_task(task_id)
+                except Exception as e:
+                    outcome = "failed"
+                    logger.error(f"Error processing task {task_id}: {e}")
+                    span.record_error(e)
+                    await self.send_task_error(task_id, str(e))
+                finally:
+                    span.set_attribute("outcome", outcome)
+                    self._task_duration.observe(time.perf_counter() - started, type=task_type, outcome=outcome)
+                    self._running.pop(task_id, None)
+                    self._cancel_requested.discard(task_id)
+
+    @staticmethod
+    def _parse_timeouts(value: str) -> Dict[str, float]:
+        """Parse "type=seconds,type=seconds" timeout overrides"""
+        timeouts = {}
+        for item in filter(None, (part.strip() for part in value.split(","))):
+            task_type, _, seconds = item.partition("=")
+            timeouts[task_type.strip()] = float(seconds)
+        return timeouts
+
+    def _task_timeout(self, task: Dict[str, Any]) -> float:
+        """Seconds a task may run: its own timeout, its type's, or the default, capped by its deadline"""
+        task_type = task.get("task_type", task.get("type"))
+        timeout = float(task.get("timeout_seconds") or self.task_timeouts.get(task_type, self.default_task_timeout))
+        if task.get("deadline"):
+            timeout = min(timeout, max(0.0, task["deadline"] - time.time()))
+        return timeout
+
+    def _cancel_task(self, task_id: Optional[str]):
+        """Stop a task the MCP Server cancelled, whether running or still queued here"""
+        if task_id not in self.current_tasks:
+            return
+        self._cancel_requested.add(task_id)
+        runner = self._running.get(task_id)
+        if runner is not None:
+            # Cancelling the coroutine also cancels the provider call it awaits
+            runner.cancel()
+
+    def _forget_task(self, task_id: str):
+        if task_id in self.current_tasks:
+            self.current_tasks.remove(task_id)
+
+    def _apply_context(self, values: Dict[str, Any], deleted: List[str], versions: Dict[str, int]):
+        """Apply changed keys, skipping any older than the version already held"""
+        for key, value in values.items():
+            version = versions.get(key, 0)
+            if version > self.context_versions.get(key, 0):
+                self.context[key] = value
+                self.context_versions[key] = version
+        for key in deleted:
+            version = versions.get(key, 0)
+            if version >= self.context_versions.get(key, 0):
+                self.context.pop(key, None)
+                # Keep the version as a tombstone so a late, older set is ignored
+                self.context_versions[key] = version
+
+    async def _handle_context_delta(self, message: Dict[str, Any]):
+        """Apply a versioned context delta, asking for a snapshot if one was missed"""
+        self._apply_context(message.get("set", {}), message.get("delete", []), message.get("versions", {}))
+        if message.get("from_version", 0) > self.context_version:
+            logger.info(f"Agent {self.agent_id} missed context versions, requesting snapshot")
+            await self._send({"type": "context_sync", "agent_id": self.agent_id})
+        self.context_version = max(self.context_version, message.get("version", 0))
+
+    async def _handle_context_snapshot(self, message: Dict[str, Any]):
+        """Replace the local context with the server's, keeping newer keys already applied"""
+        version = message.get("version", 0)
+        versions = message.get("versions", {})
+        stale = [
+            key for key in self.context
+            if key not in versions and self.context_versions.get(key, 0) <= version
+        ]
+        self._apply_context(message.get("context", {}), stale, {**versions, **dict.fromkeys(stale, version)})
+        self.context_version = max(self.context_version, version)
+        logger.info(f"Agent {self.agent_id} received context snapshot at version {version}")
 
     async def _handle_context_update(self, message: Dict[str, Any]):
-        """Handle context updates from other agents"""
+        """Handle unversioned context updates from older MCP Servers"""
         self.context.update(message.get("context", {}))
         logger.info(f"Agent {self.agent_id} received context update")
 
@@ -90,49 +413,97 @@ class BaseAgent(ABC):
 
     async def send_status(self, status: str):
         """Send status update to MCP Server"""
-        if self.is_connected:
-            await self.websocket.send(json.dumps({
-                "type": "agent_status",
-                "agent_id": self.agent_id,
-                "status": status,
-                "timestamp": datetime.utcnow().isoformat()
-            }))
+        await self._send({
+            "type": "agent_status",
+            "agent_id": self.agent_id,
+            "status": status,
+            "capabilities": self.capabilities,
+            "max_concurrent_tasks": self.max_concurrent_tasks,
+            "current_tasks": list(self.current_tasks),
+            "subscriptions": self.subscriptions,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+
+    async def subscribe(self, topics: List[str]):
+        """Start receiving messages published to more topics"""
+        self.subscriptions = list(dict.fromkeys(self.subscriptions + topics))
+        await self._send({"type": "subscribe", "agent_id": self.agent_id, "topics": topics})
+
+    async def unsubscribe(self, topics: List[str]):
+        """Stop receiving messages published to some topics"""
+        self.subscriptions = [t for t in self.subscriptions if t not in topics]
+        await self._send({"type": "unsubscribe", "agent_id": self.agent_id, "topics": topics})
 
     async def send_task_completion(self, task_id: str, result: Any):
         """Send task completion notification"""
-        if self.is_connected:
-            await self.websocket.send(json.dumps({
-                "type": "task_complete",
-                "task_id": task_id,
-                "agent_id": self.agent_id,
-                "result": result,
-                "timestamp": datetime.utcnow().isoformat()
-            }))
-            if task_id in self.current_tasks:
-                self.current_tasks.remove(task_id)
-
-    async def send_task_error(self, task_id: str, error: str):
+        if task_id in self.current_tasks:
+            self.current_tasks.remove(task_id)
+        message = {
+            "type": "task_complete",
+            "task_id": task_id,
+            "agent_id": self.agent_id,
+            "result": result,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        self._add_traceparent(message)
+        await self._send(message, buffer=True)
+
+    async def send_task_progress(self, task_id: str, chunk: str, sequence: int):
+        """Send an incremental piece of a task's output"""
+        await self._send({
+            "type": "task_progress",
+            "task_id": task_id,
+            "agent_id": self.agent_id,
+            "chunk": chunk,
+            "sequence": sequence,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+
+    async def send_task_error(self, task_id: str, error: str, expired: bool = False):
         """Send task error notification"""
-        if self.is_connected:
-            await self.websocket.send(json.dumps({
-                "type": "task_error",
-                "task_id": task_id,
-                "agent_id": self.agent_id,
-                "error": error,
-                "timestamp": datetime.utcnow().isoformat()
-            }))
-            if task_id in self.current_tasks:
-                self.current_tasks.remove(task_id)
-
-    async def send_context_update(self, context: Dict[str, Any]):
-        """Send context update to other agents"""
-        if self.is_connected:
-            await self.websocket.send(json.dumps({
-                "type": "context_update",
-                "agent_id": self.agent_id,
-                "context": context,
-                "timestamp": datetime.utcnow().isoformat()
-            }))
+        if task_id in self.current_tasks:
+            self.current_tasks.remove(task_id)
+        message = {
+            "type": "task_error",
+            "task_id": task_id,
+            "agent_id": self.agent_id,
+            "error": error,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        if expired:
+            message["expired"] = True
+        self._add_traceparent(message)
+        await self._send(message, buffer=True)
+
+    def _add_traceparent(self, message: Dict[str, Any]):
+        """Let the MCP Server continue the task's trace when it handles the outcome"""
+        traceparent = self.tracer.current_traceparent()
+        if traceparent:
+            message["traceparent"] = traceparent
+
+    async def send_context_update(self, context: Dict[str, Any], ttl: Optional[float] = None):
+        """Share the keys of `context` whose values differ from the shared context"""
+        changed = {key: value for key, value in context.items() if self.context.get(key, object()) != value}
+        if changed:
+            await self.send_context_patch(changed, ttl=ttl)
+
+    async def send_context_patch(
+        self,
+        set_values: Optional[Dict[str, Any]] = None,
+        delete: Optional[List[str]] = None,
+        ttl: Optional[float] = None,
+    ):
+        """Set and delete shared context keys; the MCP Server echoes back the versioned delta"""
+        message = {
+            "type": "context_patch",
+            "agent_id": self.agent_id,
+            "set": set_values or {},
+            "delete": delete or [],
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        if ttl is not None:
+            message["ttl"] = ttl
+        await self._send(message, buffer=True)
 
     @abstractmethod
     async def process_task(self, task: Dict[str, Any]) -> Any:
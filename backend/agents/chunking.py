@@ -0,0 +1,125 @@
+import asyncio
+import re
+from typing import Dict, Any, Awaitable, Callable, List, Tuple, TypeVar
+from .seo_analyzer import HTML_HEADING_RE, MARKDOWN_HEADING_RE
+from ..ai.base_provider import estimate_tokens
+
+PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?])\s+")
+
+T = TypeVar("T")
+
+def _split_at(text: str, positions: List[int]) -> List[str]:
+    bounds = [0] + sorted(p for p in set(positions) if 0 < p < len(text)) + [len(text)]
+    return [text[a:b] for a, b in zip(bounds, bounds[1:]) if a < b]
+
+def split_sections(text: str) -> List[str]:
+    """Split a document before each markdown or HTML heading"""
+    starts = [m.start() for m in MARKDOWN_HEADING_RE.finditer(text)]
+    starts += [m.start() for m in HTML_HEADING_RE.finditer(text)]
+    return _split_at(text, starts)
+
+def _split_to_fit(text: str, max_tokens: int) -> List[str]:
+    """Split a piece too long for one chunk at paragraphs, else sentences, else spaces"""
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+    for break_re in (PARAGRAPH_BREAK_RE, SENTENCE_BREAK_RE):
+        parts = _split_at(text, [m.end() for m in break_re.finditer(text)])
+        if len(parts) > 1:
+            return [piece for part in parts for piece in _split_to_fit(part, max_tokens)]
+    size = max_tokens * 4
+    pieces = []
+    while len(text) > size:
+        cut = text.rfind(" ", 0, size) + 1 or size
+        pieces.append(text[:cut])
+        text = text[cut:]
+    return pieces + [text]
+
+def chunk_document(text: str, max_tokens: int = 2000) -> List[str]:
+    """Split a document into chunks of at most about `max_tokens`
+
+    Chunks break at headings where the sections fit, otherwise at paragraphs
+    or sentences, and joining them gives back the document.
+    """
+    chunks: List[str] = []
+    current = ""
+    for section in split_sections(text):
+        for piece in _split_to_fit(section, max_tokens):
+            if current and estimate_tokens(current + piece) > max_tokens:
+                chunks.append(current)
+                current = ""
+            current += piece
+    if current:
+        chunks.append(current)
+    return chunks or [text]
+
+def split_chunks(text: str, max_tokens: int = 2000) -> Tuple[List[str], List[str]]:
+    """chunk_document, with the whitespace around each chunk recorded rather than sent
+
+    Returns the non-blank chunks stripped, and the whitespace before, between
+    and after them, one more separator than chunks, for join_chunks.
+    """
+    chunks: List[str] = []
+    separators: List[str] = []
+    pending = ""
+    for chunk in chunk_document(text, max_tokens):
+        core = chunk.strip()
+        if not core:
+            pending += chunk
+            continue
+        start = len(chunk) - len(chunk.lstrip())
+        separators.append(pending + chunk[:start])
+        chunks.append(core)
+        pending = chunk[start + len(core):]
+    separators.append(pending)
+    return chunks, separators
+
+def join_chunks(chunks: List[str], separators: List[str]) -> str:
+    """Reassemble rewritten chunks with the whitespace split_chunks recorded around the originals"""
+    return separators[0] + "".join(chunk.strip() + separator for chunk, separator in zip(chunks, separators[1:]))
+
+async def map_chunks(chunks: List[str], func: Callable[[str], Awaitable[T]], concurrency: int) -> List[T]:
+    """Apply `func` to every chunk with at most `concurrency` calls running, keeping chunk order
+
+    If one chunk fails the calls still running are cancelled, as their
+    results could not be used.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(chunk: str) -> T:
+        async with semaphore:
+            return await func(chunk)
+
+    tasks = [asyncio.ensure_future(run(chunk)) for chunk in chunks]
+    try:
+        return list(await asyncio.gather(*tasks))
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+def merge_analyses(analyses: List[Dict[str, Any]], weights: List[float]) -> Dict[str, Any]:
+    """Combine per-chunk analyses into one for the whole document
+
+    Scores are averaged weighted by chunk size, lists are merged, flags are
+    true if any chunk's is, and distinct text values are joined.
+    """
+    merged: Dict[str, Any] = {}
+    for key in dict.fromkeys(key for analysis in analyses for key in analysis):
+        values = [(a[key], w) for a, w in zip(analyses, weights) if a.get(key) is not None]
+        if not values:
+            merged[key] = None
+            continue
+        first = values[0][0]
+        if isinstance(first, bool):
+            merged[key] = any(value for value, _ in values)
+        elif isinstance(first, (int, float)):
+            total = sum(w for _, w in values) or 1
+            merged[key] = round(sum(value * w for value, w in values) / total, 1)
+        elif isinstance(first, list):
+            merged[key] = list(dict.fromkeys(item for value, _ in values for item in value))
+        elif isinstance(first, str):
+            merged[key] = "; ".join(dict.fromkeys(value for value, _ in values))
+        else:
+            merged[key] = first
+    return merged
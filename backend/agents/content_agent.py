@@ -1,31 +1,57 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+import asyncio
 import logging
+import os
 from .base_agent import BaseAgent
+from .chunking import chunk_document, join_chunks, map_chunks, merge_analyses, split_chunks
+from .keyword_index import create_keyword_index
+from .seo_analyzer import SeoAnalyzer
+from ..ai.base_provider import estimate_tokens
 from ..ai.provider_factory import AIProviderFactory
 
 logger = logging.getLogger(__name__)
 
 class ContentAgent(BaseAgent):
-    def __init__(self, agent_id: str, mcp_server_url: str):
-        super().__init__(agent_id, mcp_server_url)
-        self.ai_provider = AIProviderFactory.create_provider()
+    capabilities = ["generate_content", "analyze_content", "analyze_content_batch", "optimize_content", "generate_keywords"]
+    # Batches make several packed provider calls, so allow them longer
+    task_timeouts = {"analyze_content_batch": 900}
+    
+    # Analysis fields that need the model's judgement; the rest are computed locally
+    llm_analysis_fields = ["seo_score", "engagement_score"]
+
+    def __init__(self, agent_id: str, mcp_server_url: str, max_concurrent_tasks: Optional[int] = None):
+        super().__init__(agent_id, mcp_server_url, max_concurrent_tasks)
+        self.ai_provider = AIProviderFactory.create_provider(self.metrics)
+        # Longer documents are analyzed and optimized in chunks, several at a time
+        self.chunk_tokens = int(os.getenv("CONTENT_CHUNK_TOKENS", "2000"))
+        self.chunk_concurrency = int(os.getenv("CONTENT_CHUNK_CONCURRENCY", "4"))
+        # Keywords generated before, for any topic, are looked up before asking the model
+        self.keyword_index = create_keyword_index()
+        self.keyword_min_results = int(os.getenv("KEYWORD_INDEX_MIN_RESULTS", "10"))
+        self._keyword_lookups = self.metrics.counter(
+            "keyword_index_lookups_total", "generate_keywords tasks by whether the keyword index answered them", ("result",),
+        )
 
     async def process_task(self, task: Dict[str, Any]) -> Any:
         """Process content-related tasks"""
-        task_type = task.get("type")
+        task_type = task.get("task_type", task.get("type"))
         task_data = task.get("data", {})
         
         if task_type == "generate_content":
-            return await self._generate_content(task_data)
+            return await self._generate_content(task_data, task.get("task_id"))
         elif task_type == "analyze_content":
             return await self._analyze_content(task_data)
+        elif task_type == "analyze_content_batch":
+            return await self._analyze_content_batch(task_data)
         elif task_type == "optimize_content":
             return await self._optimize_content(task_data)
+        elif task_type == "generate_keywords":
+            return await self._generate_keywords(task_data)
         else:
             raise ValueError(f"Unknown task type: {task_type}")
 
-    async def _generate_content(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate SEO-optimized content"""
+    async def _generate_content(self, data: Dict[str, Any], task_id: Optional[str] = None) -> Dict[str, Any]:
+        """Generate SEO-optimized content, streaming chunks as task progress if requested"""
         try:
             # Extract parameters
             topic = data.get("topic")
@@ -49,7 +75,14 @@ class ContentAgent(BaseAgent):
             """
             
             # Generate content using AI provider
-            result = await self.ai_provider.generate_text(prompt)
+            if data.get("stream") and task_id:
+                chunks = []
+                async for chunk in self.ai_provider.stream_text(prompt):
+                    await self.send_task_progress(task_id, chunk, len(chunks))
+                    chunks.append(chunk)
+                result = "".join(chunks)
+            else:
+                result = await self.ai_provider.generate_text(prompt)
             
             # Share context with other agents
             await self.send_context_update({
@@ -79,8 +112,20 @@ class ContentAgent(BaseAgent):
             if not content:
                 raise ValueError("No content provided for analysis")
             
-            # Use AI provider to analyze content
-            analysis = await self.ai_provider.analyze_text(content)
+            # Compute objective metrics locally and ask the AI provider only for the rest
+            chunks = chunk_document(content, data.get("chunk_tokens", self.chunk_tokens))
+            with self.tracer.span("content.analyze", attributes={"words": len(content.split()), "chunks": len(chunks)}):
+                local_analysis = SeoAnalyzer(data.get("keywords", [])).analyze(content)
+                ai_analyses = await map_chunks(
+                    chunks,
+                    lambda chunk: self.ai_provider.analyze_text(chunk, fields=self.llm_analysis_fields),
+                    self.chunk_concurrency
+                )
+                if len(chunks) == 1:
+                    ai_analysis = ai_analyses[0]
+                else:
+                    ai_analysis = merge_analyses(ai_analyses, [estimate_tokens(chunk) for chunk in chunks])
+            analysis = {**ai_analysis, **local_analysis}
             
             return {
                 "analysis": analysis,
@@ -92,6 +137,42 @@ class ContentAgent(BaseAgent):
             logger.error(f"Error analyzing content: {e}")
             raise
 
+    async def _analyze_content_batch(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Analyze many documents, e.g. the pages of a site audit, in packed AI calls"""
+        try:
+            # Documents are either plain strings or {"id": ..., "content": ...}
+            documents = [
+                doc if isinstance(doc, dict) else {"id": i, "content": doc}
+                for i, doc in enumerate(data.get("documents", []))
+            ]
+            if not documents or not all(doc.get("content") for doc in documents):
+                raise ValueError("No content provided for one or more documents")
+            
+            texts = [doc["content"] for doc in documents]
+            local_analyses = SeoAnalyzer(data.get("keywords", [])).analyze_batch(texts)
+            ai_analyses = await self.ai_provider.analyze_batch(
+                texts,
+                max_batch_tokens=data.get("max_batch_tokens", 8000),
+                fields=self.llm_analysis_fields
+            )
+            analyses = [{**ai, **local} for ai, local in zip(ai_analyses, local_analyses)]
+            
+            return {
+                "results": [
+                    {
+                        "id": doc.get("id"),
+                        "analysis": analysis,
+                        "content_length": len(doc["content"].split())
+                    }
+                    for doc, analysis in zip(documents, analyses)
+                ],
+                "timestamp": data.get("timestamp")
+            }
+            
+        except Exception as e:
+            logger.error(f"Error analyzing content batch: {e}")
+            raise
+
     async def _optimize_content(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Optimize existing content for SEO"""
         try:
@@ -101,26 +182,84 @@ class ContentAgent(BaseAgent):
             if not content:
                 raise ValueError("No content provided for optimization")
             
-            # First analyze the content
-            analysis = await self._analyze_content({"content": content})
-            
-            # Use AI provider to optimize content
-            optimized_content = await self.ai_provider.optimize_text(
-                content,
-                target_keywords=target_keywords
+            # Long documents are rewritten chunk by chunk in parallel, so the
+            # slowest chunk rather than the whole document bounds the latency
+            chunk_tokens = data.get("chunk_tokens", self.chunk_tokens)
+            chunks, separators = split_chunks(content, chunk_tokens)
+            optimizing = map_chunks(
+                chunks,
+                lambda chunk: self.ai_provider.optimize_text(chunk, target_keywords=target_keywords),
+                self.chunk_concurrency
             )
             
-            return {
-                "original_content": content,
+            # Reuse an analysis from an earlier workflow step rather than repeating it
+            analysis = data.get("analysis")
+            if analysis is None:
+                tasks = [
+                    asyncio.ensure_future(self._analyze_content({"content": content, "keywords": target_keywords, "chunk_tokens": chunk_tokens})),
+                    asyncio.ensure_future(optimizing),
+                ]
+                try:
+                    analysis, optimized_chunks = await asyncio.gather(*tasks)
+                finally:
+                    # If one fails the other's result could not be used
+                    for task in tasks:
+                        if not task.done():
+                            task.cancel()
+            else:
+                optimized_chunks = await optimizing
+            optimized_content = optimized_chunks[0] if len(chunks) == 1 else join_chunks(optimized_chunks, separators)
+            
+            result = {
                 "optimized_content": optimized_content,
                 "analysis": analysis,
                 "improvements": {
                     "keywords_added": target_keywords,
                     "original_length": len(content.split()),
-                    "optimized_length": len(optimized_content.split())
+                    "optimized_length": len(optimized_content.split()),
+                    "chunks": len(chunks)
                 }
             }
+            # The caller already has the original; echoing it doubles the result size
+            if data.get("include_original", True):
+                result["original_content"] = content
+            return result
             
         except Exception as e:
             logger.error(f"Error optimizing content: {e}")
-            raise 
\ No newline at end of file
+            raise 
+
+    async def _generate_keywords(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Get keywords for a topic from the keyword index, generating them only if it has too few"""
+        try:
+            topic = data.get("topic")
+            if not topic:
+                raise ValueError("No topic provided for keyword generation")
+            limit = data.get("limit")
+            
+            keywords = None
+            if not self.keyword_index:
+                lookup = "disabled"
+            elif data.get("refresh"):
+                # Asked to generate anew, so the index was not consulted
+                lookup = "refresh"
+            else:
+                keywords = await self.keyword_index.lookup(topic, limit, data.get("min_results", self.keyword_min_results))
+                lookup = "hit" if keywords is not None else "miss"
+            self._keyword_lookups.inc(result=lookup)
+            if keywords is not None:
+                return {"topic": topic, "keywords": keywords, "source": "index", "timestamp": data.get("timestamp")}
+            
+            generated = await self.ai_provider.generate_keywords(topic)
+            keywords = await self.keyword_index.add(topic, generated) if self.keyword_index else generated
+            return {
+                "topic": topic,
+                "keywords": keywords[:limit],
+                "source": "ai",
+                "duplicates_removed": len(generated) - len(keywords),
+                "timestamp": data.get("timestamp")
+            }
+            
+        except Exception as e:
+            logger.error(f"Error generating keywords: {e}")
+            raise
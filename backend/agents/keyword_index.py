@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is of on or the to what when where which who why with your".split()
+)
+# Largest 31-bit prime; MinHash permutations are computed modulo it
+MERSENNE_PRIME = (1 << 31) - 1
+
+def normalize_keyword(keyword: str) -> str:
+    """Lowercase a keyword and reduce it to its words, e.g. " Best SEO-Tools! " -> "best seo tools" """
+    text = unicodedata.normalize("NFKC", keyword).lower().replace("'", "").replace("’", "")
+    return " ".join(TOKEN_RE.findall(text))
+
+def stem(word: str) -> str:
+    """Strip plural endings so "tools" matches "tool" and "strategies" matches "strategy" """
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def canonical_key(keyword: str) -> str:
+    """Key shared by reorderings and plural forms of a keyword, e.g. "seo tool best" for "best seo tools" """
+    return " ".join(sorted(stem(word) for word in normalize_keyword(keyword).split()))
+
+def index_terms(keyword: str) -> Set[str]:
+    """Stemmed words, less stopwords, and adjacent word pairs of a keyword"""
+    stems = [stem(word) for word in normalize_keyword(keyword).split()]
+    terms = {s for s in stems if s not in STOPWORDS}
+    terms.update(f"{a} {b}" for a, b in zip(stems, stems[1:]))
+    return terms
+
+class MinHasher:
+    """MinHash signatures of character n-grams; equal positions estimate Jaccard similarity"""
+
+    def __init__(self, num_perm: int = 64, ngram: int = 3, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.ngram = ngram
+        self.a = rng.randint(1, MERSENNE_PRIME, num_perm).astype(np.uint64)
+        self.b = rng.randint(0, MERSENNE_PRIME, num_perm).astype(np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        padded = f" {text} "
+        shingles = {padded[i:i + self.ngram] for i in range(max(1, len(padded) - self.ngram + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # One row per permutation; a < 2**31 and hashes < 2**32 so products fit in 64 bits
+        return ((np.outer(self.a, hashes) + self.b[:, None]) % MERSENNE_PRIME).min(axis=1).astype(np.uint32)
+
+class KeywordIndex:
+    """Persistent store of generated keywords, deduplicated and indexed by topic
+
+    Keywords that are reorderings or plural forms of each other share a
+    canonical key and are stored once. Near-duplicates are grouped into
+    clusters by the MinHash similarity of their character trigrams, and lookups
+    return one keyword per cluster. Each process keeps the inverted index and
+    cluster signatures in memory, loading rows added by other processes
+    sharing the database before each call.
+    """
+
+    def __init__(self, path: str, similarity_threshold: float = 0.75, num_perm: int = 64):
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.hasher = MinHasher(num_perm)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = asyncio.Lock()
+        self._max_id = 0
+        self._keywords: Dict[int, str] = {}
+        self._canonical: Dict[str, int] = {}
+        self._cluster: Dict[int, int] = {}
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        # Signatures of cluster representatives, grown by doubling
+        self._rep_ids: List[int] = []
+        self._rep_signatures = np.empty((64, num_perm), dtype=np.uint32)
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # cluster_id is NULL for a cluster's representative
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS keywords (
+                id INTEGER PRIMARY KEY,
+                keyword TEXT NOT NULL,
+                canonical TEXT NOT NULL UNIQUE,
+                cluster_id INTEGER,
+                signature BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS keyword_topics (
+                topic TEXT NOT NULL,
+                keyword_id INTEGER NOT NULL,
+                PRIMARY KEY (topic, keyword_id)
+            )
+        """)
+        self._conn.commit()
+        logger.info(f"Keyword index ready at {self.path}")
+
+    async def close(self):
+        async with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+
+    async def _run(self, func, *args):
+        async with self._lock:
+            return await asyncio.to_thread(func, *args)
+
+    def _refresh(self):
+        """Load keywords added since the last call, by this or another process"""
+        if self._conn is None:
+            self._open()
+        rows = self._conn.execute(
+            "SELECT id, keyword, canonical, cluster_id, signature FROM keywords WHERE id > ? ORDER BY id",
+            (self._max_id,),
+        ).fetchall()
+        for keyword_id, keyword, canonical, cluster_id, signature in rows:
+            if keyword_id not in self._keywords:
+                self._load(keyword_id, keyword, canonical, cluster_id, np.frombuffer(signature, dtype=np.uint32))
+            self._max_id = keyword_id
+
+    def _load(self, keyword_id: int, keyword: str, canonical: str, cluster_id: Optional[int], signature: np.ndarray):
+        self._keywords[keyword_id] = keyword
+        self._canonical[canonical] = keyword_id
+        self._cluster[keyword_id] = cluster_id or keyword_id
+        for term in index_terms(keyword):
+            self._postings[term].add(keyword_id)
+        if cluster_id is None:
+            count = len(self._rep_ids)
+            if count == len(self._rep_signatures):
+                self._rep_signatures = np.concatenate([self._rep_signatures, np.empty_like(self._rep_signatures)])
+            self._rep_signatures[count] = signature
+            self._rep_ids.append(keyword_id)
+
+    def _nearest_cluster(self, signature: np.ndarray) -> Optional[int]:
+        """The representative of the most similar cluster, if similar enough to join it"""
+        count = len(self._rep_ids)
+        if not count:
+            return None
+        similarity = (self._rep_signatures[:count] == signature).mean(axis=1)
+        best = int(similarity.argmax())
+        return self._rep_ids[best] if similarity[best] >= self.similarity_threshold else None
+
+    def _representatives(self, keyword_ids: Iterable[int], limit: Optional[int] = None) -> List[str]:
+        """One keyword per cluster, in the order given"""
+        clusters = dict.fromkeys(self._cluster[i] for i in keyword_ids)
+        return [self._keywords[i] for i in clusters][:limit]
+
+    def _search(self, topic: str) -> List[int]:
+        """Keywords containing every word of the topic, those sharing its word pairs first"""
+        terms = index_terms(topic)
+        words = [t for t in terms if " " not in t]
+        if not words:
+            return []
+        postings = sorted((self._postings.get(w, set()) for w in words), key=len)
+        matches = set.intersection(*postings)
+        pairs = [t for t in terms if " " in t]
+        return sorted(matches, key=lambda i: (-sum(i in self._postings.get(p, ()) for p in pairs), i))
+
+    def _lookup(self, topic: str, limit: Optional[int], min_results: int) -> Optional[List[str]]:
+        self._refresh()
+        stored = [row[0] for row in self._conn.execute(
+            "SELECT keyword_id FROM keyword_topics WHERE topic = ? ORDER BY rowid", (canonical_key(topic),)
+        )]
+        if stored:
+            return self._representatives(stored, limit)
+        found = self._representatives(self._search(normalize_keyword(topic)), limit)
+        return found if len(found) >= min(min_results, limit or min_results) else None
+
+    def _add(self, topic: str, keywords: List[str]) -> List[str]:
+        self._refresh()
+        # Topics are stored by canonical key too, so "SEO tools" and "seo tool" share keywords
+        topic = canonical_key(topic)
+        now = time.time()
+        keyword_ids = []
+        for keyword in keywords:
+            normalized = normalize_keyword(keyword)
+            if not normalized:
+                continue
+            canonical = canonical_key(normalized)
+            keyword_id = self._canonical.get(canonical)
+            if keyword_id is None:
+                signature = self.hasher.signature(canonical)
+                cluster_id = self._nearest_cluster(signature)
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO keywords (keyword, canonical, cluster_id, signature, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (normalized, canonical, cluster_id, signature.tobytes(), now),
+                )
+                if cursor.rowcount:
+                    keyword_id = cursor.lastrowid
+                    self._load(keyword_id, normalized, canonical, cluster_id, signature)
+                else:
+                    # Another process stored it first
+                    self._refresh()
+                    keyword_id = self._canonical[canonical]
+            keyword_ids.append(keyword_id)
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO keyword_topics (topic, keyword_id) VALUES (?, ?)",
+            [(topic, keyword_id) for keyword_id in keyword_ids],
+        )
+        self._conn.commit()
+        return self._representatives(keyword_ids)
+
+    async def lookup(self, topic: str, limit: Optional[int] = None, min_results: int = 10) -> Optional[List[str]]:
+        """Keywords stored for the topic, or else keywords containing all its words
+
+        Returns None when the topic was never stored and fewer than
+        `min_results` stored keywords match it, so the caller should generate.
+        """
+        return await self._run(self._lookup, topic, limit, min_results)
+
+    async def add(self, topic: str, keywords: List[str]) -> List[str]:
+        """Store keywords generated for a topic and return them normalized and deduplicated"""
+        return await self._run(self._add, topic, keywords)
+
+    async def get_stats(self) -> Dict[str, int]:
+        async with self._lock:
+            return {"keywords": len(self._keywords), "clusters": len(self._rep_ids), "terms": len(self._postings)}
+
+def create_keyword_index() -> Optional[KeywordIndex]:
+    """Create the keyword index based on environment configuration; None when disabled"""
+    url = os.getenv("KEYWORD_INDEX_URL", "sqlite:///keyword_index.db")
+    if url in ("", "none"):
+        return None
+    if url.startswith("sqlite:///"):
+        return KeywordIndex(
+            url[len("sqlite:///"):] or ":memory:",
+            similarity_threshold=float(os.getenv("KEYWORD_SIMILARITY_THRESHOLD", "0.75")),
+        )
+    raise ValueError(f"Unsupported keyword index URL: {url}")
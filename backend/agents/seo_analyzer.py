@@ -0,0 +1,229 @@
+import re
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple
+
+WORD_RE = re.compile(r"[A-Za-z0-9']+")
+SENTENCE_END_RE = re.compile(r"[.!?]+(?:\s|$)")
+VOWEL_GROUP_RE = re.compile(r"[aeiouy]+")
+MARKDOWN_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$", re.MULTILINE)
+HTML_HEADING_RE = re.compile(r"<h([1-6])[^>]*>(.*?)</h\1>", re.IGNORECASE | re.DOTALL)
+HTML_TAG_RE = re.compile(r"<[^>]+>")
+LIST_ITEM_RE = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+|<li[\s>]", re.MULTILINE | re.IGNORECASE)
+QUESTION_WORDS = ("what", "how", "why", "when", "where", "who", "which", "can", "is", "are", "does", "do")
+
+def _ascii_table(chars: str) -> np.ndarray:
+    """Lookup table of the ASCII code points in `chars`, for classifying characters with NumPy"""
+    table = np.zeros(128, dtype=bool)
+    table[[ord(c) for c in chars]] = True
+    return table
+
+# The character classes of WORD_RE, VOWEL_GROUP_RE and SENTENCE_END_RE, which are all ASCII
+WORD_CHARS = _ascii_table("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789'")
+VOWELS = _ascii_table("aeiouyAEIOUY")
+SENTENCE_END_CHARS = _ascii_table(".!?")
+
+def count_syllables(word: str) -> int:
+    """Estimate syllables in an English word from its vowel groups"""
+    word = word.lower()
+    syllables = len(VOWEL_GROUP_RE.findall(word))
+    if word.endswith("e") and not word.endswith(("le", "ee")) and syllables > 1:
+        syllables -= 1
+    return max(1, syllables)
+
+def flesch_reading_ease(words, sentences, syllables):
+    """Flesch reading ease clamped to 0-100; works on scalars or NumPy arrays"""
+    words = np.maximum(words, 1)
+    sentences = np.maximum(sentences, 1)
+    score = 206.835 - 1.015 * (words / sentences) - 84.6 * (syllables / words)
+    return np.clip(score, 0, 100)
+
+class KeywordMatcher:
+    """Count occurrences of many keywords in one pass with a single compiled pattern"""
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = [k for k in dict.fromkeys(k.strip().lower() for k in keywords) if k]
+        self.pattern = None
+        # Matched text is mapped back to its keyword by casefolding, which
+        # also equates "ß" with "ẞ" and final with medial sigma
+        self._lookup: Dict[str, Optional[str]] = {}
+        for keyword in self.keywords:
+            self._lookup.setdefault(keyword.casefold(), keyword)
+        if self.keywords:
+            # Longest first so "seo tools" wins over "seo" at the same position.
+            # \b would need a word character at each end, which "c++" and ".net" lack
+            alternatives = sorted(self.keywords, key=len, reverse=True)
+            self.pattern = re.compile(
+                r"(?<!\w)(?:" + "|".join(re.escape(k) for k in alternatives) + r")(?!\w)",
+                re.IGNORECASE,
+            )
+
+    def _keyword_for(self, matched: str) -> Optional[str]:
+        keyword = self._lookup.get(matched.casefold())
+        if keyword is None:
+            # Casefolding can change a match's length, e.g. "İ" becomes "i" plus
+            # a combining dot; find the keyword the pattern matched and remember it
+            keyword = next((k for k in self.keywords if re.fullmatch(re.escape(k), matched, re.IGNORECASE)), None)
+            self._lookup[matched.casefold()] = keyword
+        return keyword
+
+    def count(self, text: str) -> Dict[str, int]:
+        counts = dict.fromkeys(self.keywords, 0)
+        if self.pattern:
+            for match in self.pattern.finditer(text):
+                keyword = self._keyword_for(match.group(0))
+                if keyword is not None:
+                    counts[keyword] += 1
+        return counts
+
+class SeoAnalyzer:
+    """Compute objective SEO metrics locally, without calling a model"""
+
+    def __init__(self, keywords: Optional[List[str]] = None):
+        self.matcher = KeywordMatcher(keywords or [])
+
+    @staticmethod
+    def _counts(text: str) -> Dict[str, Any]:
+        plain = HTML_TAG_RE.sub(" ", text)
+        words = WORD_RE.findall(plain)
+        return {
+            "plain": plain,
+            "words": len(words),
+            "sentences": max(1, len(SENTENCE_END_RE.findall(plain))),
+            "syllables": sum(count_syllables(w) for w in words),
+        }
+
+    @staticmethod
+    def headings(text: str) -> List[Dict[str, Any]]:
+        """Get the markdown and HTML headings of a document in order"""
+        found = [
+            (m.start(), len(m.group(1)), m.group(2).strip())
+            for m in MARKDOWN_HEADING_RE.finditer(text)
+        ]
+        found += [
+            (m.start(), int(m.group(1)), HTML_TAG_RE.sub("", m.group(2)).strip())
+            for m in HTML_HEADING_RE.finditer(text)
+        ]
+        return [{"level": level, "text": heading} for _, level, heading in sorted(found)]
+
+    @staticmethod
+    def _structure(headings: List[Dict[str, Any]]) -> Dict[str, Any]:
+        levels = [h["level"] for h in headings]
+        skipped = any(b - a > 1 for a, b in zip(levels, levels[1:]))
+        issues = []
+        if levels.count(1) == 0:
+            issues.append("missing H1 heading")
+        elif levels.count(1) > 1:
+            issues.append("multiple H1 headings")
+        if not any(level in (2, 3) for level in levels):
+            issues.append("no H2/H3 subheadings")
+        if skipped:
+            issues.append("heading levels are skipped")
+        return {
+            "heading_counts": {f"h{n}": levels.count(n) for n in range(1, 7) if n in levels},
+            "issues": issues,
+            "summary": "Heading structure is well formed" if not issues else "; ".join(issues).capitalize(),
+        }
+
+    @staticmethod
+    def _snippet_eligible(text: str, headings: List[Dict[str, Any]]) -> bool:
+        """Question headings answered by a short paragraph, or lists, suit featured snippets"""
+        if len(LIST_ITEM_RE.findall(text)) >= 3:
+            return True
+        if not any(h["text"].lower().startswith(QUESTION_WORDS) or h["text"].endswith("?") for h in headings):
+            return False
+        paragraphs = [p for p in re.split(r"\n\s*\n", HTML_TAG_RE.sub(" ", text)) if p.strip()]
+        return any(40 <= len(WORD_RE.findall(p)) <= 60 for p in paragraphs)
+
+    def analyze(self, text: str) -> Dict[str, Any]:
+        """Compute readability, keyword usage, structure and snippet eligibility of a document"""
+        counts = self._counts(text)
+        return self._result(
+            text,
+            counts,
+            float(flesch_reading_ease(counts["words"], counts["sentences"], counts["syllables"])),
+        )
+
+    @staticmethod
+    def _batch_counts(plains: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Words, sentences and syllables of each plain text, as _counts finds them
+
+        The texts are joined and every character classified at once with NumPy,
+        rather than matching each text's words in Python.
+        """
+        # A newline ends words and sentences, so none spans two texts
+        corpus = "\n".join(plains)
+        chars = np.frombuffer(corpus.encode("utf-32-le"), dtype=np.uint32)
+        ascii_chars = np.where(chars < 128, chars, 0)
+
+        def classify(table: np.ndarray) -> np.ndarray:
+            return table[ascii_chars] & (chars < 128)
+
+        def runs(flags: np.ndarray) -> np.ndarray:
+            """Whether each character starts a run of flagged characters"""
+            return flags & ~np.concatenate(([False], flags[:-1]))
+
+        in_word = classify(WORD_CHARS)
+        word_starts = np.flatnonzero(runs(in_word))
+        # Text of each character, and word of each character inside one
+        text_of = np.repeat(np.arange(len(plains)), [len(p) + 1 for p in plains])[:len(chars)]
+        word_of = np.cumsum(runs(in_word)) - 1
+
+        # One syllable per vowel group, less a final silent "e" as in count_syllables
+        vowel_groups = np.flatnonzero(runs(classify(VOWELS)))
+        syllables = np.bincount(word_of[vowel_groups], minlength=len(word_starts))
+        lower = ascii_chars | 0x20
+        ends_word = in_word & ~np.concatenate((in_word[1:], [False]))
+        before = np.concatenate(([0], lower[:-1]))
+        silent_e = np.flatnonzero(
+            ends_word & (lower == ord("e")) & np.concatenate(([False], in_word[:-1]))
+            & (before != ord("l")) & (before != ord("e"))
+        )
+        syllables[word_of[silent_e]] -= syllables[word_of[silent_e]] > 1
+        syllables = np.maximum(syllables, 1)
+
+        # A sentence ends at a run of .!? followed by whitespace or the end of the text
+        is_end = classify(SENTENCE_END_CHARS)
+        run_ends = np.flatnonzero(is_end & ~np.concatenate((is_end[1:], [False])))
+        followed = [i + 1 == len(corpus) or corpus[i + 1].isspace() for i in run_ends]
+        sentence_ends = run_ends[np.array(followed, dtype=bool)] if followed else run_ends
+
+        n = len(plains)
+        words = np.bincount(text_of[word_starts], minlength=n)
+        sentences = np.maximum(np.bincount(text_of[sentence_ends], minlength=n), 1)
+        syllable_totals = np.bincount(text_of[word_starts], weights=syllables, minlength=n)
+        return words, sentences, syllable_totals
+
+    def analyze_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Analyze many documents, counting and scoring readability for all of them at once"""
+        if not texts:
+            return []
+        plains = [HTML_TAG_RE.sub(" ", text) for text in texts]
+        words, sentences, syllables = self._batch_counts(plains)
+        scores = flesch_reading_ease(words.astype(float), sentences.astype(float), syllables)
+        return [
+            self._result(text, {"plain": plain, "words": int(w), "sentences": int(s)}, float(score))
+            for text, plain, w, s, score in zip(texts, plains, words, sentences, scores)
+        ]
+
+    def _result(self, text: str, counts: Dict[str, Any], readability: float) -> Dict[str, Any]:
+        keyword_counts = self.matcher.count(counts["plain"])
+        headings = self.headings(text)
+        structure = self._structure(headings)
+        words = max(counts["words"], 1)
+        return {
+            "readability_score": round(readability, 1),
+            "keyword_usage": [k for k, n in keyword_counts.items() if n],
+            "keyword_density": {
+                k: round(100.0 * n * len(k.split()) / words, 2) for k, n in keyword_counts.items()
+            },
+            "structure_analysis": structure["summary"],
+            "featured_snippet_potential": self._snippet_eligible(text, headings),
+            "metrics": {
+                "word_count": counts["words"],
+                "sentence_count": counts["sentences"],
+                "avg_sentence_length": round(counts["words"] / counts["sentences"], 1),
+                "headings": headings,
+                "heading_counts": structure["heading_counts"],
+                "structure_issues": structure["issues"],
+            },
+        }
@@ -1,19 +1,245 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional, Type
+import asyncio
+import hashlib
+import json
+import logging
+from pydantic import RootModel, ValidationError
+from .structured import ContentAnalysis, KeywordList, extract_json, validate_fields, validate_root
+
+logger = logging.getLogger(__name__)
+
+# Keys of an analysis result, with how the model is asked to fill each one
+ANALYSIS_FIELDS = {
+    "seo_score": "seo_score (0-100)",
+    "readability_score": "readability_score (0-100)",
+    "keyword_usage": "keyword_usage (list of found keywords)",
+    "structure_analysis": "structure_analysis (string)",
+    "engagement_score": "engagement_score (0-100)",
+    "featured_snippet_potential": "featured_snippet_potential (boolean)",
+}
+
+def analysis_field_list(fields: Optional[List[str]] = None, indent: str = "            ") -> str:
+    """Format the requested analysis keys as a prompt bullet list"""
+    return "\n".join(f"{indent}- {ANALYSIS_FIELDS[f]}" for f in (fields or ANALYSIS_FIELDS))
+
+def analysis_prompt(text: str, fields: Optional[List[str]] = None) -> str:
+    return f"""
+            Analyze this text for SEO effectiveness:
+            
+            {text}
+            
+            Provide analysis for:
+            1. SEO optimization
+            2. Readability
+            3. Keyword usage
+            4. Content structure
+            5. Engagement potential
+            6. Featured snippet optimization
+            
+            Format the response as a JSON object with these keys:
+{analysis_field_list(fields)}
+            """
+
+def optimization_prompt(text: str, target_keywords: List[str]) -> str:
+    return f"""
+            Optimize this content for SEO:
+            
+            Original content:
+            {text}
+            
+            Target keywords: {', '.join(target_keywords)}
+            
+            Provide optimized version that:
+            1. Maintains the original message
+            2. Improves SEO effectiveness
+            3. Enhances readability
+            4. Better incorporates target keywords
+            5. Optimizes for featured snippets
+            """
+
+def keyword_prompt(topic: str) -> str:
+    return f"""
+            Generate a list of relevant SEO keywords for the topic: {topic}
+            
+            Include:
+            1. Primary keywords
+            2. Long-tail keywords
+            3. Related terms
+            4. Question-based keywords
+            
+            Return the keywords as a JSON array of strings.
+            """
+
+class AIProviderError(Exception):
+    """Error raised by an AI provider call"""
+    pass
+
+class RateLimitError(AIProviderError):
+    """The provider rejected a call because a quota or rate limit was exceeded"""
+    pass
+
+class StructuredOutputError(AIProviderError):
+    """The model did not return valid JSON for a structured method, even when asked again"""
+    pass
 
 class BaseAIProvider(ABC):
     """Base class for AI providers"""
     
+    # Identify the provider and model, e.g. for cache keys
+    name: str = "base"
+    model_name: str = ""
+    
+    # Schema of the JSON each structured method asks the model for
+    output_schemas = {"analyze_text": ContentAnalysis, "generate_keywords": KeywordList}
+    
+    # How many times to ask again for fields missing from a structured response
+    max_reasks: int = 1
+    
+    # Provider chain wrapping this one, set by AIProviderFactory; re-asks go
+    # through it so they are rate limited and counted like first attempts
+    reask_via: Optional["BaseAIProvider"] = None
+    
     @abstractmethod
     async def generate_text(self, prompt: str, **kwargs) -> str:
         """Generate text based on the prompt"""
         pass
     
+    async def stream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Generate text based on the prompt, yielding chunks as they are produced"""
+        # Providers without a streaming mode yield the whole text as one chunk
+        yield await self.generate_text(prompt, **kwargs)
+    
+    async def generate_json(self, prompt: str, **kwargs) -> str:
+        """Generate a response that should be JSON - override to use the model's JSON mode"""
+        return await self.generate_text(prompt, **kwargs)
+    
+    async def _ask_json(self, prompt: str, attempt: int) -> str:
+        """generate_json for a structured method, sending re-asks through the wrapping chain"""
+        provider = self.reask_via if attempt and self.reask_via is not None else self
+        return await provider.generate_json(prompt)
+    
+    async def generate_structured(self, method: str, prompt_for: Callable[[Optional[List[str]]], str], fields: Optional[List[str]] = None) -> Any:
+        """Ask for the JSON declared for `method` in output_schemas and validate it
+        
+        `prompt_for(fields)` builds the prompt asking for those fields. When the
+        response is malformed, truncated or lacks some fields, the model is asked
+        again for the missing fields only, keeping the values already received.
+        """
+        schema = self.output_schemas[method]
+        if issubclass(schema, RootModel):
+            return await self._generate_root(method, schema, prompt_for)
+        
+        values: Dict[str, Any] = {}
+        requested = fields
+        missing = list(fields or schema.model_fields)
+        for attempt in range(self.max_reasks + 1):
+            response = await self._ask_json(prompt_for(requested), attempt)
+            try:
+                data = extract_json(response)
+            except ValueError:
+                data = None
+            received, missing = validate_fields(data, schema, missing)
+            values.update(received)
+            if not missing:
+                return values
+            requested = missing
+            logger.info(f"{self.name} {method} response lacked {', '.join(missing)}, asking again for those only")
+        raise StructuredOutputError(f"{self.name} {method} response lacked {', '.join(missing)}")
+    
+    async def _generate_root(self, method: str, schema: Type[RootModel], prompt_for: Callable[[Optional[List[str]]], str]) -> Any:
+        """generate_structured for results that are not objects, which can only be asked for whole"""
+        error: Optional[Exception] = None
+        for attempt in range(self.max_reasks + 1):
+            response = await self._ask_json(prompt_for(None), attempt)
+            try:
+                return validate_root(extract_json(response), schema)
+            except ValueError as e:
+                error = e
+                logger.info(f"{self.name} {method} response was not valid, asking again")
+        raise StructuredOutputError(f"{self.name} {method} response was not valid: {error}")
+    
     @abstractmethod
     async def analyze_text(self, text: str, **kwargs) -> Dict[str, Any]:
         """Analyze text and return insights"""
         pass
     
+    async def analyze_batch(self, texts: List[str], max_batch_tokens: int = 8000, **kwargs) -> List[Dict[str, Any]]:
+        """Analyze many texts, packing several into each model call"""
+        packs: List[List[int]] = []
+        pack_tokens = 0
+        for i, text in enumerate(texts):
+            tokens = estimate_tokens(text)
+            if not packs or pack_tokens + tokens > max_batch_tokens:
+                packs.append([])
+                pack_tokens = 0
+            packs[-1].append(i)
+            pack_tokens += tokens
+        
+        results: List[Dict[str, Any]] = [None] * len(texts)
+        pack_results = await asyncio.gather(*(
+            self._analyze_pack([texts[i] for i in pack], **kwargs) for pack in packs
+        ))
+        for pack, analyses in zip(packs, pack_results):
+            for i, analysis in zip(pack, analyses):
+                results[i] = analysis
+        return results
+    
+    async def _analyze_pack(self, texts: List[str], **kwargs) -> List[Dict[str, Any]]:
+        """Analyze texts in one call, splitting the pack if the response cannot be parsed
+        
+        Documents whose analysis comes back incomplete are asked about again
+        individually, for the missing fields only.
+        """
+        if len(texts) == 1:
+            return [await self.analyze_text(texts[0], **kwargs)]
+        
+        documents = "\n\n".join(
+            f"<document index=\"{i}\">\n{text}\n</document>" for i, text in enumerate(texts)
+        )
+        prompt = f"""
+            Analyze each of these {len(texts)} documents for SEO effectiveness:
+            
+            {documents}
+            
+            For each document provide analysis for SEO optimization, readability,
+            keyword usage, content structure, engagement potential and featured
+            snippet optimization.
+            
+            Format the response as a JSON array with one object per document, each with these keys:
+            - index (the document index)
+{analysis_field_list(kwargs.get("fields"))}
+            """
+        
+        # Provider errors, e.g. quota errors left after retries, would only fail again on smaller packs
+        response = await self.generate_json(prompt, **kwargs)
+        try:
+            parsed = extract_json(response)
+            if isinstance(parsed, dict):
+                # JSON modes that only return objects wrap the array, e.g. {"documents": [...]}
+                parsed = next((value for value in parsed.values() if isinstance(value, list)), [])
+            by_index = {int(item["index"]): item for item in parsed if isinstance(item, dict) and "index" in item}
+            if not by_index:
+                raise ValueError("Response has no document analyses")
+        except (ValueError, KeyError, TypeError, ValidationError):
+            # Halve the pack so one bad document or truncated response costs less
+            middle = len(texts) // 2
+            first, second = await asyncio.gather(
+                self._analyze_pack(texts[:middle], **kwargs),
+                self._analyze_pack(texts[middle:], **kwargs),
+            )
+            return first + second
+        
+        fields = kwargs.get("fields") or list(ANALYSIS_FIELDS)
+        
+        async def complete(i: int) -> Dict[str, Any]:
+            values, missing = validate_fields(by_index.get(i), ContentAnalysis, fields)
+            if missing:
+                values.update(await self.analyze_text(texts[i], **{**kwargs, "fields": missing}))
+            return values
+        
+        return list(await asyncio.gather(*(complete(i) for i in range(len(texts)))))
+    
     @abstractmethod
     async def optimize_text(self, text: str, **kwargs) -> str:
         """Optimize text based on given criteria"""
@@ -22,4 +248,58 @@ class BaseAIProvider(ABC):
     @abstractmethod
     async def generate_keywords(self, topic: str, **kwargs) -> List[str]:
         """Generate relevant keywords for a topic"""
-        pass 
\ No newline at end of file
+        pass
+
+class ProviderWrapper(BaseAIProvider):
+    """Base class for providers that add behaviour around another provider
+    
+    analyze_batch is inherited rather than delegated, so each packed call it
+    makes goes through this wrapper's generate_text and analyze_text.
+    """
+    
+    def __init__(self, provider: BaseAIProvider):
+        self.provider = provider
+    
+    @property
+    def name(self) -> str:
+        return self.provider.name
+    
+    @property
+    def model_name(self) -> str:
+        return self.provider.model_name
+    
+    async def _call(self, method: str, *args, **kwargs) -> Any:
+        """Invoke a method of the wrapped provider - override to add behaviour"""
+        return await getattr(self.provider, method)(*args, **kwargs)
+    
+    async def generate_text(self, prompt: str, **kwargs) -> str:
+        return await self._call("generate_text", prompt, **kwargs)
+    
+    async def generate_json(self, prompt: str, **kwargs) -> str:
+        return await self._call("generate_json", prompt, **kwargs)
+    
+    async def stream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        async for chunk in self.provider.stream_text(prompt, **kwargs):
+            yield chunk
+    
+    async def analyze_text(self, text: str, **kwargs) -> Dict[str, Any]:
+        return await self._call("analyze_text", text, **kwargs)
+    
+    async def optimize_text(self, text: str, **kwargs) -> str:
+        return await self._call("optimize_text", text, **kwargs)
+    
+    async def generate_keywords(self, topic: str, **kwargs) -> List[str]:
+        return await self._call("generate_keywords", topic, **kwargs)
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the token count of English text"""
+    return len(text) // 4 + 1
+
+def request_key(provider: BaseAIProvider, method: str, *args, **kwargs) -> str:
+    """Hash a provider call into a key identifying identical requests"""
+    payload = json.dumps(
+        [provider.name, provider.model_name, method, args, kwargs],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
@@ -0,0 +1,203 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from .base_provider import BaseAIProvider, ProviderWrapper, request_key
+
+logger = logging.getLogger(__name__)
+
+# Methods whose results depend only on their inputs
+DEFAULT_CACHED_METHODS = ("analyze_text", "optimize_text", "generate_keywords")
+
+class CacheTier(ABC):
+    """One level of the response cache, storing JSON-encoded values"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: float):
+        pass
+
+class MemoryCacheTier(CacheTier):
+    """In-process LRU cache bounded by entry count and total size"""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: float):
+        if key in self._entries:
+            self._remove(key)
+        if len(value) > self.max_bytes:
+            return
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self.size_bytes += len(value)
+        while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        value, _ = self._entries.pop(key)
+        self.size_bytes -= len(value)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLiteCacheTier(CacheTier):
+    """On-disk cache shared by agent processes on the same machine"""
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ai_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_expires ON ai_cache (expires_at)")
+        self._conn.commit()
+        self._lock = asyncio.Lock()
+        self._writes = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        def run():
+            return self._conn.execute(
+                "SELECT value FROM ai_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+
+        async with self._lock:
+            row = await asyncio.to_thread(run)
+        return row[0] if row else None
+
+    async def set(self, key: str, value: str, ttl: float):
+        self._writes += 1
+        prune = self._writes % 1000 == 0
+
+        def run():
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ai_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl),
+            )
+            if prune:
+                # Drop expired entries, then the soonest-expiring ones over the limit
+                self._conn.execute("DELETE FROM ai_cache WHERE expires_at <= ?", (time.time(),))
+                self._conn.execute(
+                    "DELETE FROM ai_cache WHERE key IN (SELECT key FROM ai_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+        async with self._lock:
+            await asyncio.to_thread(run)
+
+class RedisCacheTier(CacheTier):
+    """Cache shared by every agent process, evicted by Redis itself"""
+
+    def __init__(self, url: str, prefix: str = "ai_cache:"):
+        import redis.asyncio as redis
+        self.redis = redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.redis.get(self.prefix + key)
+
+    async def set(self, key: str, value: str, ttl: float):
+        await self.redis.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+class CachedAIProvider(ProviderWrapper):
+    """Serve repeated provider calls from a tiered cache"""
+
+    def __init__(
+        self,
+        provider: BaseAIProvider,
+        tiers: List[CacheTier],
+        ttl: float = 86400,
+        methods: Tuple[str, ...] = DEFAULT_CACHED_METHODS,
+    ):
+        super().__init__(provider)
+        self.tiers = tiers
+        self.ttl = ttl
+        self.methods = set(methods)
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "errors": 0}
+
+    async def _call(self, method: str, *args, **kwargs) -> Any:
+        if method not in self.methods:
+            return await super()._call(method, *args, **kwargs)
+
+        key = request_key(self.provider, method, *args, **kwargs)
+        for i, tier in enumerate(self.tiers):
+            try:
+                value = await tier.get(key)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"AI cache tier {type(tier).__name__} read failed: {e}")
+                continue
+            if value is not None:
+                self.stats["hits"] += 1
+                # Promote to the faster tiers in front of this one
+                await self._store(self.tiers[:i], key, value)
+                return json.loads(value)
+
+        self.stats["misses"] += 1
+        result = await super()._call(method, *args, **kwargs)
+        await self._store(self.tiers, key, json.dumps(result))
+        return result
+
+    async def _store(self, tiers: List[CacheTier], key: str, value: str):
+        for tier in tiers:
+            try:
+                await tier.set(key, value, self.ttl)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"AI cache tier {type(tier).__name__} write failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and memory tier usage"""
+        stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        for tier in self.tiers:
+            if isinstance(tier, MemoryCacheTier):
+                stats["memory_entries"] = len(tier)
+                stats["memory_bytes"] = tier.size_bytes
+                stats["memory_evictions"] = tier.evictions
+        return stats
+
+def create_cache_tiers() -> List[CacheTier]:
+    """Create cache tiers based on environment configuration"""
+    tiers: List[CacheTier] = [
+        MemoryCacheTier(
+            max_entries=int(os.getenv("AI_CACHE_MAX_ENTRIES", "1024")),
+            max_bytes=int(os.getenv("AI_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        )
+    ]
+    url = os.getenv("AI_CACHE_URL")
+    if url:
+        if url.startswith("sqlite:///"):
+            tiers.append(SQLiteCacheTier(url[len("sqlite:///"):]))
+        elif url.startswith(("redis://", "rediss://")):
+            tiers.append(RedisCacheTier(url))
+        else:
+            raise ValueError(f"Unsupported AI cache URL: {url}")
+    return tiers
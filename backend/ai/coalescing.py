@@ -0,0 +1,61 @@
+import asyncio
+import logging
+from typing import Dict, Any
+from .base_provider import BaseAIProvider, ProviderWrapper, request_key
+
+logger = logging.getLogger(__name__)
+
+class _LeaderCancelled(Exception):
+    """The call a follower joined was cancelled by the caller that started it"""
+    pass
+
+class CoalescingAIProvider(ProviderWrapper):
+    """Share one in-flight provider call between concurrent identical requests"""
+
+    def __init__(self, provider: BaseAIProvider):
+        super().__init__(provider)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        # A request is counted as coalesced once another call answered it, so
+        # calls - coalesced is the number of calls made to the provider
+        self.stats: Dict[str, int] = {"calls": 0, "coalesced": 0, "retried": 0}
+
+    async def _call(self, method: str, *args, **kwargs) -> Any:
+        self.stats["calls"] += 1
+        key = request_key(self.provider, method, *args, **kwargs)
+
+        while key in self._in_flight:
+            future = self._in_flight[key]
+            try:
+                # Shield so a cancelled follower does not cancel the leader's call
+                result = await asyncio.shield(future)
+            except _LeaderCancelled:
+                # The leader's task was cancelled, not ours; join a new call or make it ourselves
+                self.stats["retried"] += 1
+                continue
+            except Exception:
+                # The leader's error answers this request too
+                self.stats["coalesced"] += 1
+                raise
+            self.stats["coalesced"] += 1
+            return result
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await super()._call(method, *args, **kwargs)
+        except BaseException as e:
+            future.set_exception(_LeaderCancelled() if isinstance(e, asyncio.CancelledError) else e)
+            # Followers retrieve the exception; mark it seen for the loop
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._in_flight[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get how many calls were made, how many an in-flight call answered and how many retried"""
+        stats = dict(self.stats)
+        stats["in_flight"] = len(self._in_flight)
+        return stats
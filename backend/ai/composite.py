@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import math
+import random
+import time
+from collections import deque
+from typing import Dict, Any, AsyncIterator, List, Optional, Set
+from .base_provider import BaseAIProvider
+
+logger = logging.getLogger(__name__)
+
+class ProviderHealth:
+    """Recent latency and error history of one provider behind a CompositeAIProvider"""
+
+    def __init__(self, window: int = 200, alpha: float = 0.2, idle_decay: float = 10.0):
+        self.latencies = deque(maxlen=window)
+        self.alpha = alpha
+        self.idle_decay = idle_decay
+        self.ewma_latency: Optional[float] = None
+        self.last_sample = 0.0
+        self.error_rate = 0.0
+        self.consecutive_errors = 0
+        self.unavailable_until = 0.0
+
+    def record_latency(self, latency: float):
+        self.last_sample = time.monotonic()
+        self.latencies.append(latency)
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency = self.alpha * latency + (1 - self.alpha) * self.ewma_latency
+
+    def record_success(self, latency: Optional[float] = None):
+        if latency is not None:
+            self.record_latency(latency)
+        self.error_rate *= 1 - self.alpha
+        self.consecutive_errors = 0
+
+    def record_error(self, cooldown_base: float, cooldown_max: float):
+        self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+        self.consecutive_errors += 1
+        # Back off from a failing provider for longer each time it fails in a row
+        cooldown = min(cooldown_max, cooldown_base * 2 ** (self.consecutive_errors - 1))
+        self.unavailable_until = time.monotonic() + cooldown
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.unavailable_until
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def score(self, error_penalty: float) -> float:
+        """Expected cost of a call; providers not yet measured score 0 so they get tried
+
+        The latency estimate decays while a provider gets no traffic, so one
+        that lost out after a few slow calls is tried again before long.
+        """
+        if self.ewma_latency is None:
+            return 0.0
+        idle = time.monotonic() - self.last_sample
+        return self.ewma_latency * math.exp(-idle / self.idle_decay) * (1 + error_penalty * self.error_rate)
+
+class CompositeAIProvider(BaseAIProvider):
+    """Route calls across several providers by observed latency and error rate
+
+    Each call goes to the provider with the lowest expected latency, penalised
+    by its recent error rate, and fails over to the next one on error. With
+    hedging on, a call still running after the primary's `hedge_percentile`
+    latency is also sent to the next provider; the first success wins and the
+    other call is cancelled. Hedges are capped at `hedge_max_ratio` of calls so
+    an overall slowdown does not double the load.
+    """
+
+    def __init__(
+        self,
+        providers: List[BaseAIProvider],
+        hedge: bool = False,
+        hedge_percentile: float = 0.95,
+        hedge_min_delay: float = 0.05,
+        hedge_max_ratio: float = 0.1,
+        min_samples: int = 20,
+        explore_rate: float = 0.05,
+        error_penalty: float = 4.0,
+        cooldown_base: float = 1.0,
+        cooldown_max: float = 60.0,
+    ):
+        if not providers:
+            raise ValueError("CompositeAIProvider needs at least one provider")
+        self.providers = providers
+        self.health = [ProviderHealth() for _ in providers]
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_ratio = hedge_max_ratio
+        self.min_samples = min_samples
+        self.explore_rate = explore_rate
+        self.error_penalty = error_penalty
+        self.cooldown_base = cooldown_base
+        self.cooldown_max = cooldown_max
+        self.stats: Dict[str, int] = {"calls": 0, "failovers": 0, "hedged": 0, "hedge_wins": 0}
+
+    @property
+    def name(self) -> str:
+        return "+".join(p.name for p in self.providers)
+
+    @property
+    def model_name(self) -> str:
+        return "+".join(p.model_name for p in self.providers)
+
+    def _ranked(self) -> List[int]:
+        """Provider indexes in the order to try them; providers cooling down after errors go last"""
+        # Now and then try providers in random order so a recovered one gets measured again
+        explore = random.random() < self.explore_rate
+        return sorted(
+            range(len(self.providers)),
+            key=lambda i: (
+                not self.health[i].available,
+                random.random() if explore else self.health[i].score(self.error_penalty),
+            ),
+        )
+
+    def _hedge_delay(self, index: int) -> Optional[float]:
+        health = self.health[index]
+        if len(health.latencies) < self.min_samples:
+            return None
+        return max(self.hedge_min_delay, health.percentile(self.hedge_percentile))
+
+    async def _attempt(self, index: int, method: str, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        health = self.health[index]
+        started = time.perf_counter()
+        try:
+            result = await getattr(self.providers[index], method)(*args, **kwargs)
+        except asyncio.CancelledError:
+            # Lost a hedge: it took at least this long
+            health.record_latency(time.perf_counter() - started)
+            raise
+        except Exception:
+            health.record_error(self.cooldown_base, self.cooldown_max)
+            raise
+        health.record_success(time.perf_counter() - started)
+        return result
+
+    async def _hedged(self, primary: int, backup: int, tried: Set[int], method: str, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        """Call the primary, and the backup too if the primary is slow; return the first success"""
+        delay = self._hedge_delay(primary)
+        tasks = [asyncio.ensure_future(self._attempt(primary, method, args, kwargs))]
+        try:
+            if delay is not None:
+                await asyncio.wait(tasks, timeout=delay)
+            if tasks[0].done() or delay is None or self.stats["hedged"] >= self.hedge_max_ratio * self.stats["calls"]:
+                return await tasks[0]
+
+            tried.add(backup)
+            self.stats["hedged"] += 1
+            tasks.append(asyncio.ensure_future(self._attempt(backup, method, args, kwargs)))
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is tasks[1]:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _call(self, method: str, *args, **kwargs) -> Any:
+        self.stats["calls"] += 1
+        order = self._ranked()
+        tried: Set[int] = set()
+        last_error: Optional[Exception] = None
+        for index in order:
+            if index in tried:
+                continue
+            tried.add(index)
+            backup = next((i for i in order if i not in tried), None)
+            try:
+                if self.hedge and backup is not None:
+                    return await self._hedged(index, backup, tried, method, args, kwargs)
+                return await self._attempt(index, method, args, kwargs)
+            except Exception as e:
+                last_error = e
+                if len(tried) < len(order):
+                    self.stats["failovers"] += 1
+                    logger.warning(f"AI provider {self.providers[index].name} failed {method}, failing over: {e}")
+        raise last_error
+
+    async def generate_text(self, prompt: str, **kwargs) -> str:
+        return await self._call("generate_text", prompt, **kwargs)
+
+    async def generate_json(self, prompt: str, **kwargs) -> str:
+        return await self._call("generate_json", prompt, **kwargs)
+
+    async def stream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Stream from the best provider, failing over only before the first chunk"""
+        self.stats["calls"] += 1
+        order = self._ranked()
+        for position, index in enumerate(order):
+            started = False
+            try:
+                async for chunk in self.providers[index].stream_text(prompt, **kwargs):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                self.health[index].record_error(self.cooldown_base, self.cooldown_max)
+                if started or position == len(order) - 1:
+                    raise
+                self.stats["failovers"] += 1
+                logger.warning(f"AI provider {self.providers[index].name} failed stream_text, failing over: {e}")
+            else:
+                self.health[index].record_success()
+                return
+
+    async def analyze_text(self, text: str, **kwargs) -> Dict[str, Any]:
+        return await self._call("analyze_text", text, **kwargs)
+
+    async def optimize_text(self, text: str, **kwargs) -> str:
+        return await self._call("optimize_text", text, **kwargs)
+
+    async def generate_keywords(self, topic: str, **kwargs) -> List[str]:
+        return await self._call("generate_keywords", topic, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get routing counters and the health each provider is ranked by"""
+        return {
+            **self.stats,
+            "providers": {
+                provider.name: {
+                    "ewma_latency": health.ewma_latency,
+                    "p95_latency": health.percentile(0.95),
+                    "error_rate": round(health.error_rate, 4),
+                    "available": health.available,
+                }
+                for provider, health in zip(self.providers, self.health)
+            },
+        }
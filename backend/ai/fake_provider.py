@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional
+from .base_provider import AIProviderError, BaseAIProvider, RateLimitError, ANALYSIS_FIELDS
+
+WORDS = (
+    "search engine optimization content ranking keyword audience traffic page "
+    "results strategy marketing website links quality users readers guide best "
+    "practices title description heading structure mobile speed the a of and to "
+    "in is for that with on as your this can are be more"
+).split()
+
+DOCUMENT_RE = re.compile(r'<document index="(\d+)">')
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Parse a latency distribution in milliseconds into a sampler returning seconds
+
+    "fixed:<ms>", "uniform:<min>:<max>", "exponential:<mean>" or
+    "lognormal:<median>:<sigma>" (long-tailed, like real model latency).
+    """
+    kind, *params = spec.split(":")
+    try:
+        values = [float(p) for p in params]
+        if kind == "fixed":
+            (ms,) = values
+            return lambda rng: ms / 1000
+        if kind == "uniform":
+            low, high = values
+            return lambda rng: rng.uniform(low, high) / 1000
+        if kind == "exponential":
+            (mean,) = values
+            return lambda rng: rng.expovariate(1 / mean) / 1000 if mean > 0 else 0.0
+        if kind == "lognormal":
+            median, sigma = values
+            return lambda rng: rng.lognormvariate(math.log(median), sigma) / 1000 if median > 0 else 0.0
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid latency distribution: {spec}")
+
+class FakeAIProvider(BaseAIProvider):
+    """Offline provider with configurable latency, failures and output size, for benchmarks and load tests
+
+    Outputs are derived from a hash of the input, so the same request always
+    gets the same answer and response caching behaves as with a real model.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency: Optional[str] = None,
+        error_rate: Optional[float] = None,
+        rate_limit_rate: Optional[float] = None,
+        output_words: Optional[int] = None,
+        stream_chunks: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        self.model_name = "fake"
+        self.sample_latency = parse_latency(latency or os.getenv("FAKE_AI_LATENCY_MS", "lognormal:800:0.5"))
+        self.error_rate = error_rate if error_rate is not None else float(os.getenv("FAKE_AI_ERROR_RATE", "0"))
+        self.rate_limit_rate = rate_limit_rate if rate_limit_rate is not None else float(os.getenv("FAKE_AI_RATE_LIMIT_RATE", "0"))
+        self.output_words = output_words or int(os.getenv("FAKE_AI_OUTPUT_WORDS", "600"))
+        self.stream_chunks = stream_chunks or int(os.getenv("FAKE_AI_STREAM_CHUNKS", "20"))
+        seed = seed if seed is not None else os.getenv("FAKE_AI_SEED")
+        self.rng = random.Random(int(seed) if seed not in (None, "") else None)
+        self.calls = 0
+
+    async def _simulate_call(self, latency: Optional[float] = None):
+        """Wait like a model call would, then fail as often as configured"""
+        self.calls += 1
+        await asyncio.sleep(self.sample_latency(self.rng) if latency is None else latency)
+        roll = self.rng.random()
+        if roll < self.rate_limit_rate:
+            raise RateLimitError("Fake provider quota exceeded")
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise AIProviderError("Fake provider error")
+
+    @staticmethod
+    def _rng_for(*inputs: Any) -> random.Random:
+        digest = hashlib.sha256(json.dumps(inputs, default=str).encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _text(self, words: int, *inputs: Any) -> str:
+        rng = self._rng_for(*inputs)
+        sentences = []
+        while words > 0:
+            length = min(words, rng.randint(8, 20))
+            sentences.append(" ".join(rng.choices(WORDS, k=length)).capitalize() + ".")
+            words -= length
+        return " ".join(sentences)
+
+    def _analysis(self, text: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        rng = self._rng_for("analysis", text)
+        values = {
+            "seo_score": rng.randint(30, 95),
+            "readability_score": rng.randint(30, 95),
+            "keyword_usage": rng.sample(WORDS[:24], 3),
+            "structure_analysis": "Headings and paragraphs are reasonably structured",
+            "engagement_score": rng.randint(30, 95),
+            "featured_snippet_potential": rng.random() < 0.5,
+        }
+        return {field: values[field] for field in (fields or ANALYSIS_FIELDS)}
+
+    async def generate_text(self, prompt: str, **kwargs) -> str:
+        """Generate text, or a JSON array of analyses for a packed batch prompt"""
+        await self._simulate_call()
+        documents = DOCUMENT_RE.findall(prompt)
+        if documents:
+            # Packed analysis prompt from analyze_batch
+            return json.dumps([
+                {"index": int(i), **self._analysis(f"{prompt}:{i}", kwargs.get("fields"))} for i in documents
+            ])
+        return self._text(self.output_words, "generate", prompt)
+
+    async def stream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Stream the generated text in chunks spread over the sampled latency"""
+        latency = self.sample_latency(self.rng)
+        text = self._text(self.output_words, "generate", prompt)
+        words = text.split(" ")
+        size = max(1, math.ceil(len(words) / self.stream_chunks))
+        chunks = [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+        # The first chunk carries a third of the latency, like time to first token
+        await self._simulate_call(latency / 3)
+        for chunk in chunks:
+            yield chunk
+            await asyncio.sleep(latency * 2 / 3 / len(chunks))
+
+    async def analyze_text(self, text: str, **kwargs) -> Dict[str, Any]:
+        await self._simulate_call()
+        return self._analysis(text, kwargs.get("fields"))
+
+    async def optimize_text(self, text: str, **kwargs) -> str:
+        """Return a rewrite about as long as the original"""
+        await self._simulate_call()
+        return self._text(max(len(text.split()), 1), "optimize", text, kwargs.get("target_keywords", []))
+
+    async def generate_keywords(self, topic: str, **kwargs) -> List[str]:
+        await self._simulate_call()
+        rng = self._rng_for("keywords", topic)
+        return [f"{topic} {word}" for word in rng.sample(WORDS[:24], 10)]
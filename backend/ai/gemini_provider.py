@@ -1,16 +1,29 @@
 import google.generativeai as genai
-from typing import Dict, Any, List
+from typing import Dict, Any, AsyncIterator, List
 import os
-from .base_provider import BaseAIProvider
+from google.api_core.exceptions import ResourceExhausted, TooManyRequests
+from .base_provider import AIProviderError, BaseAIProvider, RateLimitError, analysis_prompt, keyword_prompt, optimization_prompt
 
 class GeminiProvider(BaseAIProvider):
+    name = "gemini"
+    
     def __init__(self):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("GEMINI_API_KEY environment variable is required")
         
         genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
+        self.model_name = os.getenv("GEMINI_MODEL", "gemini-pro")
+        self.model = genai.GenerativeModel(self.model_name)
+    
+    def _error(self, action: str, e: Exception) -> Exception:
+        """Wrap a Gemini error, keeping quota errors distinguishable for retries"""
+        if isinstance(e, AIProviderError):
+            return e
+        message = f"Error {action} with Gemini: {str(e)}"
+        if isinstance(e, (ResourceExhausted, TooManyRequests)) or "429" in str(e) or "quota" in str(e).lower():
+            return RateLimitError(message)
+        return AIProviderError(message)
     
     async def generate_text(self, prompt: str, **kwargs) -> str:
         """Generate text using Gemini"""
@@ -18,83 +31,38 @@ class GeminiProvider(BaseAIProvider):
             response = await self.model.generate_content_async(prompt)
             return response.text
         except Exception as e:
-            raise Exception(f"Error generating text with Gemini: {str(e)}")
+            raise self._error("generating text", e)
+    
+    async def stream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Generate text using Gemini's streaming mode"""
+        try:
+            response = await self.model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            raise self._error("streaming text", e)
     
     async def analyze_text(self, text: str, **kwargs) -> Dict[str, Any]:
-        """Analyze text using Gemini"""
+        """Analyze text using Gemini, asking only for `fields` if given"""
         try:
-            analysis_prompt = f"""
-            Analyze this text for SEO effectiveness:
-            
-            {text}
-            
-            Provide analysis for:
-            1. SEO optimization
-            2. Readability
-            3. Keyword usage
-            4. Content structure
-            5. Engagement potential
-            6. Featured snippet optimization
-            
-            Format the response as a JSON object with these keys:
-            - seo_score (0-100)
-            - readability_score (0-100)
-            - keyword_usage (list of found keywords)
-            - structure_analysis (string)
-            - engagement_score (0-100)
-            - featured_snippet_potential (boolean)
-            """
-            
-            response = await self.model.generate_content_async(analysis_prompt)
-            # Parse the response as JSON
-            import json
-            return json.loads(response.text)
+            return await self.generate_structured(
+                "analyze_text", lambda fields: analysis_prompt(text, fields), kwargs.get("fields"),
+            )
         except Exception as e:
-            raise Exception(f"Error analyzing text with Gemini: {str(e)}")
+            raise self._error("analyzing text", e)
     
     async def optimize_text(self, text: str, **kwargs) -> str:
         """Optimize text using Gemini"""
         try:
-            target_keywords = kwargs.get('target_keywords', [])
-            optimization_prompt = f"""
-            Optimize this content for SEO:
-            
-            Original content:
-            {text}
-            
-            Target keywords: {', '.join(target_keywords)}
-            
-            Provide optimized version that:
-            1. Maintains the original message
-            2. Improves SEO effectiveness
-            3. Enhances readability
-            4. Better incorporates target keywords
-            5. Optimizes for featured snippets
-            """
-            
-            response = await self.model.generate_content_async(optimization_prompt)
+            response = await self.model.generate_content_async(optimization_prompt(text, kwargs.get('target_keywords', [])))
             return response.text
         except Exception as e:
-            raise Exception(f"Error optimizing text with Gemini: {str(e)}")
+            raise self._error("optimizing text", e)
     
     async def generate_keywords(self, topic: str, **kwargs) -> List[str]:
         """Generate keywords using Gemini"""
         try:
-            keyword_prompt = f"""
-            Generate a list of relevant SEO keywords for the topic: {topic}
-            
-            Include:
-            1. Primary keywords
-            2. Long-tail keywords
-            3. Related terms
-            4. Question-based keywords
-            
-            Return the keywords as a JSON array of strings.
-            """
-            
-            response = await self.model.generate_content_async(keyword_prompt)
-            # Parse the response as JSON
-            import json
-            return json.loads(response.text)
+            return await self.generate_structured("generate_keywords", lambda fields: keyword_prompt(topic))
         except Exception as e:
-            raise Exception(f"Error generating keywords with Gemini: {str(e)}") 
\ No newline at end of file
+            raise self._error("generating keywords", e)
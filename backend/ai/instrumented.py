@@ -0,0 +1,137 @@
+import json
+import time
+from typing import Dict, Any, AsyncIterator, List, Optional
+from .base_provider import BaseAIProvider, ProviderWrapper, RateLimitError, estimate_tokens
+from .cache import CachedAIProvider
+from .coalescing import CoalescingAIProvider
+from .composite import CompositeAIProvider
+from .rate_limit import RateLimitedAIProvider
+from ..telemetry.metrics import REGISTRY, MetricsRegistry
+from ..telemetry.tracing import get_tracer
+
+class InstrumentedAIProvider(ProviderWrapper):
+    """Record latency, estimated tokens, errors and a trace span of every call to the wrapped provider"""
+
+    def __init__(self, provider: BaseAIProvider, registry: Optional[MetricsRegistry] = None):
+        super().__init__(provider)
+        self.tracer = get_tracer()
+        registry = registry or REGISTRY
+        self.latency = registry.histogram(
+            "ai_call_duration_seconds", "Latency of AI provider calls", ("provider", "method", "outcome"),
+        )
+        self.tokens = registry.counter(
+            "ai_tokens_total", "Estimated tokens sent to and received from the AI provider", ("provider", "direction"),
+        )
+        self.errors = registry.counter(
+            "ai_errors_total", "Failed AI provider calls", ("provider", "method", "error"),
+        )
+
+    def _record(self, method: str, started: float, outcome: str, tokens_in: int, output: Any = None):
+        self.latency.observe(time.perf_counter() - started, provider=self.name, method=method, outcome=outcome)
+        self.tokens.inc(tokens_in, provider=self.name, direction="in")
+        if output is not None:
+            text = output if isinstance(output, str) else json.dumps(output)
+            self.tokens.inc(estimate_tokens(text), provider=self.name, direction="out")
+
+    def _record_error(self, method: str, started: float, tokens_in: int, e: BaseException):
+        error = "rate_limited" if isinstance(e, RateLimitError) else type(e).__name__
+        self.errors.inc(provider=self.name, method=method, error=error)
+        self._record(method, started, "error", tokens_in)
+
+    @staticmethod
+    def _input_tokens(*args, **kwargs) -> int:
+        return estimate_tokens("".join(str(a) for a in args) + "".join(str(v) for v in kwargs.values()))
+
+    async def _call(self, method: str, *args, **kwargs) -> Any:
+        started = time.perf_counter()
+        tokens_in = self._input_tokens(*args, **kwargs)
+        with self.tracer.span(f"ai.{method}", attributes={"provider": self.name, "tokens_in": tokens_in}):
+            try:
+                result = await super()._call(method, *args, **kwargs)
+            except Exception as e:
+                self._record_error(method, started, tokens_in, e)
+                raise
+        self._record(method, started, "ok", tokens_in, result)
+        return result
+
+    async def stream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        started = time.perf_counter()
+        tokens_in = self._input_tokens(prompt, **kwargs)
+        # Not made current: the caller's code runs between chunks
+        span = self.tracer.start_span("ai.stream_text", attributes={"provider": self.name, "tokens_in": tokens_in})
+        chunks = []
+        try:
+            async for chunk in self.provider.stream_text(prompt, **kwargs):
+                if not chunks:
+                    span.set_attribute("first_chunk_ms", round((time.perf_counter() - started) * 1000, 1))
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            span.record_error(e)
+            self._record_error("stream_text", started, tokens_in, e)
+            raise
+        finally:
+            span.end()
+        self._record("stream_text", started, "ok", tokens_in, "".join(chunks))
+
+def _find_wrappers(provider: BaseAIProvider, found: Dict[type, List[BaseAIProvider]]):
+    """Collect the wrappers of each kind in a provider chain, including behind a composite"""
+    for kind in found:
+        if isinstance(provider, kind):
+            found[kind].append(provider)
+    if isinstance(provider, ProviderWrapper):
+        _find_wrappers(provider.provider, found)
+    elif isinstance(provider, CompositeAIProvider):
+        for child in provider.providers:
+            _find_wrappers(child, found)
+
+def register_wrapper_metrics(provider: BaseAIProvider, registry: Optional[MetricsRegistry] = None):
+    """Export the counters the cache, coalescing, rate limiting and routing wrappers already keep"""
+    registry = registry or REGISTRY
+    found: Dict[type, List[Any]] = {
+        CachedAIProvider: [], CoalescingAIProvider: [], RateLimitedAIProvider: [], CompositeAIProvider: [],
+    }
+    _find_wrappers(provider, found)
+
+    def total(wrappers: List[Any], key: str):
+        return lambda: sum(w.stats[key] for w in wrappers)
+
+    def per_provider(wrappers: List[Any], value):
+        return lambda: {w.name: value(w) for w in wrappers}
+
+    cached, coalescing, rate_limited, composite = found.values()
+    if cached:
+        registry.counter("ai_cache_hits_total", "AI responses served from the cache", func=total(cached, "hits"))
+        registry.counter("ai_cache_misses_total", "AI requests not found in the cache", func=total(cached, "misses"))
+    if coalescing:
+        registry.counter("ai_coalesced_total", "AI requests answered by an identical in-flight call", func=total(coalescing, "coalesced"))
+        registry.counter(
+            "ai_coalesce_retries_total", "AI requests that made their own call after the call they joined was cancelled",
+            func=total(coalescing, "retried"),
+        )
+    if rate_limited:
+        registry.counter(
+            "ai_rate_limited_total", "AI calls rejected by provider quotas", ("provider",),
+            func=per_provider(rate_limited, lambda w: w.stats["rate_limited"]),
+        )
+        registry.counter(
+            "ai_retries_total", "AI calls retried after a quota error", ("provider",),
+            func=per_provider(rate_limited, lambda w: w.stats["retries"]),
+        )
+        registry.gauge(
+            "ai_concurrency_limit", "Current adaptive limit on concurrent AI calls", ("provider",),
+            func=per_provider(rate_limited, lambda w: int(w.concurrency.limit)),
+        )
+    if composite:
+        registry.counter("ai_failovers_total", "AI calls retried on another provider after an error", func=total(composite, "failovers"))
+        registry.counter("ai_hedged_total", "AI calls also sent to a second provider because the first was slow", func=total(composite, "hedged"))
+        registry.counter("ai_hedge_wins_total", "Hedged AI calls answered first by the second provider", func=total(composite, "hedge_wins"))
+        health = lambda: {p.name: h for c in composite for p, h in zip(c.providers, c.health)}
+        registry.gauge(
+            "ai_provider_error_rate", "Recent error rate a composite provider routes by", ("provider",),
+            func=lambda: {name: h.error_rate for name, h in health().items()},
+        )
+        registry.gauge(
+            "ai_provider_latency_seconds", "Recent average latency a composite provider routes by", ("provider",),
+            func=lambda: {name: h.ewma_latency for name, h in health().items() if h.ewma_latency is not None},
+        )
@@ -0,0 +1,97 @@
+import openai
+from openai import AsyncOpenAI
+from typing import Dict, Any, AsyncIterator, List
+import os
+from .base_provider import AIProviderError, BaseAIProvider, RateLimitError, analysis_prompt, keyword_prompt, optimization_prompt
+
+class OpenAIProvider(BaseAIProvider):
+    """Provider for the OpenAI API or any server exposing an OpenAI-compatible chat API
+
+    Point OPENAI_BASE_URL at e.g. a vLLM, Ollama or Azure endpoint to use it instead.
+    """
+
+    name = "openai"
+
+    def __init__(self):
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY environment variable is required")
+
+        self.model_name = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            timeout=float(os.getenv("OPENAI_TIMEOUT_SECONDS", "120")),
+            # Retries are left to RateLimitedAIProvider and the composite provider's failover
+            max_retries=0,
+        )
+
+    def _error(self, action: str, e: Exception) -> Exception:
+        """Wrap an OpenAI error, keeping quota errors distinguishable for retries"""
+        if isinstance(e, AIProviderError):
+            return e
+        message = f"Error {action} with OpenAI: {str(e)}"
+        if isinstance(e, openai.RateLimitError):
+            return RateLimitError(message)
+        return AIProviderError(message)
+
+    async def _complete(self, prompt: str, **options) -> str:
+        response = await self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            **options,
+        )
+        return response.choices[0].message.content or ""
+
+    async def generate_text(self, prompt: str, **kwargs) -> str:
+        """Generate text using OpenAI"""
+        try:
+            return await self._complete(prompt)
+        except Exception as e:
+            raise self._error("generating text", e)
+
+    async def generate_json(self, prompt: str, **kwargs) -> str:
+        """Generate a JSON object using OpenAI's JSON mode"""
+        try:
+            return await self._complete(prompt, response_format={"type": "json_object"})
+        except Exception as e:
+            raise self._error("generating JSON", e)
+
+    async def stream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Generate text using OpenAI's streaming mode"""
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model_name,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise self._error("streaming text", e)
+
+    async def analyze_text(self, text: str, **kwargs) -> Dict[str, Any]:
+        """Analyze text using OpenAI, asking only for `fields` if given"""
+        try:
+            return await self.generate_structured(
+                "analyze_text", lambda fields: analysis_prompt(text, fields), kwargs.get("fields"),
+            )
+        except Exception as e:
+            raise self._error("analyzing text", e)
+
+    async def optimize_text(self, text: str, **kwargs) -> str:
+        """Optimize text using OpenAI"""
+        try:
+            return await self._complete(optimization_prompt(text, kwargs.get("target_keywords", [])))
+        except Exception as e:
+            raise self._error("optimizing text", e)
+
+    async def generate_keywords(self, topic: str, **kwargs) -> List[str]:
+        """Generate keywords using OpenAI"""
+        try:
+            # generate_json uses JSON mode, which only returns objects, so the
+            # array comes back wrapped, e.g. {"keywords": [...]}, and is unwrapped on validation
+            return await self.generate_structured("generate_keywords", lambda fields: keyword_prompt(topic))
+        except Exception as e:
+            raise self._error("generating keywords", e)
@@ -1,20 +1,116 @@
 import os
-from typing import Optional
+from typing import Callable, Dict, List, Optional
 from .base_provider import BaseAIProvider
-from .gemini_provider import GeminiProvider
+from .cache import CachedAIProvider, create_cache_tiers
+from .coalescing import CoalescingAIProvider
+from .composite import CompositeAIProvider
+from .fake_provider import FakeAIProvider
+from .instrumented import InstrumentedAIProvider, register_wrapper_metrics
+from .rate_limit import AdaptiveConcurrencyLimiter, RateLimitedAIProvider, create_bucket
+from ..telemetry.metrics import MetricsRegistry
+
+def _create_gemini() -> BaseAIProvider:
+    # Imported here so other providers work without the Gemini SDK
+    from .gemini_provider import GeminiProvider
+    return GeminiProvider()
+
+def _create_openai() -> BaseAIProvider:
+    from .openai_provider import OpenAIProvider
+    return OpenAIProvider()
 
 class AIProviderFactory:
+    # Provider name -> function creating an unwrapped provider
+    _registry: Dict[str, Callable[[], BaseAIProvider]] = {
+        "gemini": _create_gemini,
+        "openai": _create_openai,
+        "fake": FakeAIProvider,
+    }
+    
+    @classmethod
+    def register_provider(cls, name: str, create: Callable[[], BaseAIProvider]):
+        """Make a provider selectable by name in AI_PROVIDER"""
+        cls._registry[name.lower()] = create
+    
+    @classmethod
+    def create_base_provider(cls, name: str) -> BaseAIProvider:
+        """Create one registered provider without any wrappers"""
+        create = cls._registry.get(name.lower())
+        if create is None:
+            raise ValueError(f"Unsupported AI provider: {name}")
+        return create()
+    
     @staticmethod
-    def create_provider() -> BaseAIProvider:
-        """Create an AI provider based on environment configuration"""
-        provider = os.getenv("AI_PROVIDER", "gemini").lower()
+    def create_provider(metrics: Optional[MetricsRegistry] = None) -> BaseAIProvider:
+        """Create an AI provider based on environment configuration, reporting to `metrics`
+        
+        AI_PROVIDER may list several providers, e.g. "gemini,openai", to route
+        between them by latency and errors, with failover and optional hedging.
+        """
+        names = [name.strip() for name in os.getenv("AI_PROVIDER", "gemini").split(",") if name.strip()]
+        if not names:
+            raise ValueError("AI_PROVIDER names no provider")
         
-        if provider == "gemini":
-            return GeminiProvider()
-        else:
-            raise ValueError(f"Unsupported AI provider: {provider}")
+        if len(names) == 1:
+            return AIProviderFactory.wrap_provider(AIProviderFactory.create_base_provider(names[0]), metrics)
+        
+        # Each provider keeps its own quota; the cache and coalescing are shared
+        composite = CompositeAIProvider(
+            [AIProviderFactory.wrap_model(AIProviderFactory.create_base_provider(name), metrics) for name in names],
+            hedge=os.getenv("AI_HEDGE_ENABLED", "false").lower() == "true",
+            hedge_percentile=float(os.getenv("AI_HEDGE_PERCENTILE", "0.95")),
+            hedge_max_ratio=float(os.getenv("AI_HEDGE_MAX_RATIO", "0.1")),
+        )
+        return AIProviderFactory.wrap_shared(composite, metrics)
+    
+    @staticmethod
+    def wrap_provider(provider: BaseAIProvider, metrics: Optional[MetricsRegistry] = None) -> BaseAIProvider:
+        """Add the configured metrics, rate limiting and caching layers around a provider"""
+        return AIProviderFactory.wrap_shared(AIProviderFactory.wrap_model(provider, metrics), metrics)
     
     @staticmethod
-    def get_available_providers() -> list[str]:
+    def wrap_model(provider: BaseAIProvider, metrics: Optional[MetricsRegistry] = None) -> BaseAIProvider:
+        """Add the layers that belong to one model endpoint: metrics and rate limiting"""
+        model = provider
+        # Innermost, so latency and tokens are those of actual model calls
+        if os.getenv("AI_METRICS_ENABLED", "true").lower() == "true":
+            provider = InstrumentedAIProvider(provider, metrics)
+        if os.getenv("AI_RATE_LIMIT_ENABLED", "true").lower() == "true":
+            setting = lambda key, default: os.getenv(f"{key}_{provider.name.upper()}", os.getenv(key, default))
+            requests_per_minute = float(setting("AI_REQUESTS_PER_MINUTE", "60"))
+            tokens_per_minute = float(setting("AI_TOKENS_PER_MINUTE", "0"))
+            provider = RateLimitedAIProvider(
+                provider,
+                requests_per_minute=requests_per_minute,
+                tokens_per_minute=tokens_per_minute,
+                # The quotas are split between agents or shared through Redis
+                request_bucket=create_bucket(f"{provider.name}:requests", requests_per_minute),
+                token_bucket=create_bucket(f"{provider.name}:tokens", tokens_per_minute),
+                concurrency=AdaptiveConcurrencyLimiter(
+                    initial=int(setting("AI_INITIAL_CONCURRENCY", "4")),
+                    maximum=int(setting("AI_MAX_CONCURRENCY", "64")),
+                ),
+                max_retries=int(setting("AI_MAX_RETRIES", "5")),
+            )
+        model.reask_via = provider
+        return provider
+    
+    @staticmethod
+    def wrap_shared(provider: BaseAIProvider, metrics: Optional[MetricsRegistry] = None) -> BaseAIProvider:
+        """Add the layers shared by every model behind a provider: coalescing and caching"""
+        # Coalesce duplicates that miss the cache so only one reaches the model
+        if os.getenv("AI_COALESCE_ENABLED", "true").lower() == "true":
+            provider = CoalescingAIProvider(provider)
+        if os.getenv("AI_CACHE_ENABLED", "true").lower() == "true":
+            provider = CachedAIProvider(
+                provider,
+                create_cache_tiers(),
+                ttl=float(os.getenv("AI_CACHE_TTL_SECONDS", "86400")),
+            )
+        if os.getenv("AI_METRICS_ENABLED", "true").lower() == "true":
+            register_wrapper_metrics(provider, metrics)
+        return provider
+    
+    @classmethod
+    def get_available_providers(cls) -> List[str]:
         """Get list of available AI providers"""
-        return ["gemini"] 
\ No newline at end of file
+        return sorted(cls._registry)
@@ -0,0 +1,234 @@
+import asyncio
+import contextvars
+import logging
+import math
+import os
+import random
+import time
+from typing import Dict, Any, AsyncIterator, Optional, Union
+from .base_provider import BaseAIProvider, ProviderWrapper, RateLimitError, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate"""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, amount: float = 1.0):
+        """Wait until `amount` tokens are available and take them"""
+        # Requests larger than the bucket would wait forever; cap them
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+class RedisTokenBucket:
+    """Per-minute budget shared through Redis by every process that uses the same key
+
+    Usage is counted in fixed one-minute windows with INCRBY, which is atomic,
+    so agents in any process or on any host draw from one budget. A call that
+    does not fit gives its tokens back and waits for the next window.
+    """
+
+    def __init__(self, redis, key: str, per_minute: float, window: float = 60.0):
+        self.redis = redis
+        self.key = key
+        self.capacity = per_minute * window / 60.0
+        self.window = window
+
+    async def acquire(self, amount: float = 1.0):
+        """Wait until `amount` tokens fit in the current window and take them"""
+        amount = math.ceil(min(amount, self.capacity))
+        while True:
+            now = time.time()
+            window = int(now // self.window)
+            key = f"{self.key}:{window}"
+            used = await self.redis.incrby(key, amount)
+            if used == amount:
+                # Old windows are never read again
+                await self.redis.expire(key, math.ceil(self.window * 2))
+            if used <= self.capacity:
+                return
+            await self.redis.incrby(key, -amount)
+            await asyncio.sleep((window + 1) * self.window - now)
+
+_shared_clients: Dict[str, Any] = {}
+
+def _shared_client(url: str):
+    """One client per URL, so every bucket in a process shares its connections"""
+    if url not in _shared_clients:
+        if url.startswith(("redis://", "rediss://")):
+            import redis.asyncio as redis
+            _shared_clients[url] = redis.from_url(url, decode_responses=True)
+        elif url.startswith("fakeredis://"):
+            from ..mcp_server.fake_redis import FakeRedis
+            _shared_clients[url] = FakeRedis()
+        else:
+            raise ValueError(f"Unsupported AI rate limit URL: {url}")
+    return _shared_clients[url]
+
+def create_bucket(name: str, per_minute: float) -> Optional[Union[TokenBucket, RedisTokenBucket]]:
+    """Create the bucket for one provider quota based on environment configuration
+
+    With AI_RATE_LIMIT_URL set the quota is one budget shared through Redis.
+    Otherwise each agent gets an even share of it: the supervisor sets
+    AI_RATE_LIMIT_SHARES to the number of agents it runs.
+    """
+    if not per_minute:
+        return None
+    url = os.getenv("AI_RATE_LIMIT_URL")
+    if url:
+        return RedisTokenBucket(_shared_client(url), f"ai_rate:{name}", per_minute)
+    shares = max(1, int(os.getenv("AI_RATE_LIMIT_SHARES") or "1"))
+    return TokenBucket(per_minute / shares)
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit on concurrent calls: grow slowly on success, halve on overload"""
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 64, decrease_factor: float = 0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            while self.in_flight >= int(self.limit):
+                await self._condition.wait()
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        # Additive increase of roughly one slot per window of `limit` calls
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def on_overload(self):
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+        logger.warning(f"AI provider overloaded, concurrency limit reduced to {int(self.limit)}")
+
+class RateLimitedAIProvider(ProviderWrapper):
+    """Keep provider calls under request/token quotas and retry quota errors with backoff"""
+
+    def __init__(
+        self,
+        provider: BaseAIProvider,
+        requests_per_minute: float = 60,
+        tokens_per_minute: float = 0,
+        concurrency: Optional[AdaptiveConcurrencyLimiter] = None,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        expected_output_tokens: int = 1024,
+        request_bucket: Optional[Union[TokenBucket, RedisTokenBucket]] = None,
+        token_bucket: Optional[Union[TokenBucket, RedisTokenBucket]] = None,
+    ):
+        super().__init__(provider)
+        self.request_bucket = request_bucket or (TokenBucket(requests_per_minute) if requests_per_minute else None)
+        self.token_bucket = token_bucket or (TokenBucket(tokens_per_minute) if tokens_per_minute else None)
+        self.concurrency = concurrency or AdaptiveConcurrencyLimiter()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.expected_output_tokens = expected_output_tokens
+        self.stats: Dict[str, int] = {"calls": 0, "rate_limited": 0, "retries": 0}
+        # Set while a call holds a concurrency slot, so calls it makes through
+        # this wrapper, e.g. structured re-asks, do not wait for a second one
+        self._holding_slot = contextvars.ContextVar(f"rate_limit_slot_{id(self)}", default=False)
+
+    def _estimate_tokens(self, *args, **kwargs) -> int:
+        text = "".join(str(a) for a in args) + "".join(str(v) for v in kwargs.values())
+        return estimate_tokens(text) + self.expected_output_tokens
+
+    async def _acquire_quota(self, tokens: int):
+        if self.request_bucket:
+            await self.request_bucket.acquire(1)
+        if self.token_bucket:
+            await self.token_bucket.acquire(tokens)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # Full jitter keeps retrying agents from synchronising
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _call(self, method: str, *args, **kwargs) -> Any:
+        self.stats["calls"] += 1
+        tokens = self._estimate_tokens(*args, **kwargs)
+
+        nested = self._holding_slot.get()
+        for attempt in range(self.max_retries + 1):
+            await self._acquire_quota(tokens)
+            if not nested:
+                await self.concurrency.acquire()
+            holding = self._holding_slot.set(True)
+            try:
+                result = await super()._call(method, *args, **kwargs)
+            except RateLimitError:
+                self.stats["rate_limited"] += 1
+                self.concurrency.on_overload()
+                if attempt == self.max_retries:
+                    raise
+            else:
+                self.concurrency.on_success()
+                return result
+            finally:
+                self._holding_slot.reset(holding)
+                if not nested:
+                    await self.concurrency.release()
+
+            self.stats["retries"] += 1
+            delay = self._backoff_delay(attempt)
+            logger.info(f"Retrying {method} after rate limit in {delay:.1f}s (attempt {attempt + 1})")
+            await asyncio.sleep(delay)
+
+    async def stream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        self.stats["calls"] += 1
+        tokens = self._estimate_tokens(prompt, **kwargs)
+
+        for attempt in range(self.max_retries + 1):
+            await self._acquire_quota(tokens)
+            await self.concurrency.acquire()
+            started = False
+            try:
+                async for chunk in self.provider.stream_text(prompt, **kwargs):
+                    started = True
+                    yield chunk
+            except RateLimitError:
+                self.stats["rate_limited"] += 1
+                self.concurrency.on_overload()
+                # Chunks already yielded cannot be taken back, so only retry before the first
+                if started or attempt == self.max_retries:
+                    raise
+            else:
+                self.concurrency.on_success()
+                return
+            finally:
+                await self.concurrency.release()
+
+            self.stats["retries"] += 1
+            await asyncio.sleep(self._backoff_delay(attempt))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get call/retry counters and the current concurrency limit"""
+        stats = dict(self.stats)
+        stats["concurrency_limit"] = int(self.concurrency.limit)
+        stats["in_flight"] = self.concurrency.in_flight
+        return stats
@@ -0,0 +1,184 @@
+"""Parse and validate the JSON that AI providers are asked to return
+
+Models often wrap JSON in markdown fences, add prose around it, leave
+trailing commas or stop mid-object when they hit the output limit. Rather
+than failing the whole call, extract_json recovers whatever complete values
+the response holds, and validate_fields reports which requested fields are
+still missing so only those need to be asked for again.
+"""
+import json
+import re
+from typing import Dict, Any, List, Optional, Tuple, Type, Union
+from pydantic import BaseModel, ConfigDict, Field, RootModel, ValidationError
+
+FENCE_RE = re.compile(r"```[a-zA-Z]*\s*\n?(.*?)(?:```|$)", re.S)
+
+# Python literals models sometimes emit in place of their JSON equivalents
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+Score = Optional[Union[int, float]]
+
+class ContentAnalysis(BaseModel):
+    """Schema of an analyze_text result; every field is optional so a partial answer can be kept"""
+
+    model_config = ConfigDict(extra="ignore")
+
+    seo_score: Score = Field(None, ge=0, le=100)
+    readability_score: Score = Field(None, ge=0, le=100)
+    keyword_usage: Optional[List[str]] = None
+    structure_analysis: Optional[str] = None
+    engagement_score: Score = Field(None, ge=0, le=100)
+    featured_snippet_potential: Optional[bool] = None
+
+class KeywordList(RootModel[List[str]]):
+    """Schema of a generate_keywords result"""
+    pass
+
+def _scan(text: str, start: int) -> Tuple[str, bool, List[int]]:
+    """Copy the JSON value starting at `start`, normalizing it on the way
+
+    Trailing commas are dropped and Python literals replaced. Returns the
+    copied text, whether the value was closed, and for a truncated value the
+    positions in the copy of each comma at the innermost open level.
+    """
+    out: List[str] = []
+    closers: List[str] = []
+    # Comma positions in `out` for each open bracket, to cut a truncated value back to
+    commas: List[List[int]] = []
+    in_string = escape = False
+    i = start
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in "{[":
+            closers.append("}" if ch == "{" else "]")
+            commas.append([])
+            out.append(ch)
+        elif ch in "}]":
+            if not closers or ch != closers[-1]:
+                break
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            out.append(closers.pop())
+            commas.pop()
+            if not closers:
+                return "".join(out), True, []
+        elif ch == ",":
+            if commas:
+                commas[-1].append(len(out))
+            out.append(ch)
+        else:
+            literal = next((w for w in PYTHON_LITERALS if text.startswith(w, i)), None)
+            if literal:
+                out.extend(PYTHON_LITERALS[literal])
+                i += len(literal)
+                continue
+            out.append(ch)
+        i += 1
+
+    if not closers:
+        return "".join(out), True, []
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+    return "".join(out), False, commas[-1] if commas else []
+
+def _close(partial: str) -> str:
+    """Close every bracket left open in a truncated JSON value"""
+    closers: List[str] = []
+    in_string = escape = False
+    for ch in partial:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            closers.append("}" if ch == "{" else "]")
+        elif ch in "}]" and closers:
+            closers.pop()
+    partial = partial.rstrip().rstrip(",:").rstrip()
+    return partial + "".join(reversed(closers))
+
+def _parse_from(text: str, start: int) -> Tuple[Any, bool]:
+    copied, complete, commas = _scan(text, start)
+    if complete:
+        return json.loads(copied), True
+    # Truncated: keep the last member if it parses once closed, else cut back to the one before
+    try:
+        return json.loads(_close(copied)), False
+    except ValueError:
+        pass
+    for position in reversed(commas):
+        try:
+            return json.loads(_close(copied[:position])), False
+        except ValueError:
+            continue
+    # No complete member at the innermost level: drop it and close its parents
+    opening = max(copied.rfind("{"), copied.rfind("["))
+    return json.loads(_close(copied[:opening + 1])), False
+
+def parse_partial(text: str) -> Tuple[Any, bool]:
+    """Parse the first JSON object or array in a model response
+
+    Returns the value and whether it was complete; a value cut off
+    mid-response is returned with every member that had finished.
+    Raises ValueError if the response holds no JSON value.
+    """
+    text = text.strip()
+    try:
+        return json.loads(text), True
+    except ValueError:
+        pass
+
+    candidates = [m.group(1) for m in FENCE_RE.finditer(text)] if "```" in text else []
+    for candidate in candidates + [text]:
+        # The outermost value starts at the first bracket; later ones may be nested in it
+        starts = [i for i in (candidate.find("{"), candidate.find("[")) if i >= 0]
+        for start in sorted(starts):
+            try:
+                return _parse_from(candidate, start)
+            except ValueError:
+                continue
+    raise ValueError(f"No JSON value found in response: {text[:200]!r}")
+
+def extract_json(text: str) -> Any:
+    """Parse the first JSON value in a model response, recovering what it can from a truncated one"""
+    return parse_partial(text)[0]
+
+def validate_fields(data: Any, schema: Type[BaseModel], fields: List[str]) -> Tuple[Dict[str, Any], List[str]]:
+    """Split a parsed response into valid values for `fields` and the fields missing or invalid"""
+    if not isinstance(data, dict):
+        return {}, list(fields)
+    candidate = {field: data[field] for field in fields if data.get(field) is not None}
+    try:
+        model = schema.model_validate(candidate)
+    except ValidationError as e:
+        invalid = {error["loc"][0] for error in e.errors() if error["loc"]}
+        candidate = {k: v for k, v in candidate.items() if k not in invalid}
+        model = schema.model_validate(candidate)
+    values = model.model_dump(include=set(candidate))
+    return values, [field for field in fields if field not in values]
+
+def validate_root(data: Any, schema: Type[RootModel]) -> Any:
+    """Validate a non-object result, unwrapping e.g. {"keywords": [...]} from JSON-object modes"""
+    if isinstance(data, dict) and len(data) == 1:
+        data = next(iter(data.values()))
+    return schema.model_validate(data).root
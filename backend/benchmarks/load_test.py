@@ -0,0 +1,218 @@
+"""Drive the MCP Server and content agents in-process with the fake AI provider
+
+Starts the server and N ContentAgents in this process, submits tasks to
+/api/tasks at a target rate for a fixed time, and reports throughput,
+end-to-end latency percentiles and message counts. Run from the repository root:
+
+    python -m backend.benchmarks.load_test --agents 4 --rate 20 --duration 30
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from typing import Dict, Any, List, Optional
+from .wire_protocol import make_article
+
+TASK_TYPES = ("analyze_content", "optimize_content", "generate_content")
+
+def make_task(task_type: str, index: int, words: int) -> Dict[str, Any]:
+    """Task body with content unique to `index`, so responses are not served from the cache"""
+    keywords = ["seo", "content strategy"]
+    if task_type == "generate_content":
+        return {"type": task_type, "data": {"topic": f"SEO guide part {index}", "keywords": keywords, "target_length": words}}
+    if task_type == "optimize_content":
+        return {"type": task_type, "data": {"content": make_article(words, seed=index), "target_keywords": keywords}}
+    return {"type": task_type, "data": {"content": make_article(words, seed=index), "keywords": keywords}}
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def configure_environment(args: argparse.Namespace):
+    """Set up an isolated in-memory server and the fake provider before their modules are imported"""
+    os.environ["AI_PROVIDER"] = "fake"
+    os.environ["TASK_STORE_URL"] = args.task_store
+    os.environ["STATE_BACKEND_URL"] = "memory://"
+    os.environ["FAKE_AI_LATENCY_MS"] = args.latency
+    os.environ["FAKE_AI_ERROR_RATE"] = str(args.error_rate)
+    os.environ["FAKE_AI_OUTPUT_WORDS"] = str(args.words)
+    os.environ["FAKE_AI_SEED"] = str(args.seed)
+    os.environ["MAX_CONCURRENT_TASKS"] = str(args.concurrency)
+    os.environ["AGENT_METRICS_PUSH_SECONDS"] = "0"
+    # Measure the system rather than a quota meant for the real API
+    os.environ.setdefault("AI_RATE_LIMIT_ENABLED", "false")
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+    import uvicorn
+    from ..agents.base_agent import BaseAgent
+    from ..agents.content_agent import ContentAgent
+    from ..mcp_server.main import app
+    from ..telemetry.metrics import REGISTRY
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("backend").setLevel(logging.WARNING)
+
+    submitted: Dict[str, float] = {}
+    finished: Dict[str, float] = {}
+    statuses: Dict[str, str] = {}
+    all_done = asyncio.Event()
+    submitting = True
+
+    class Observer(BaseAgent):
+        """Follows task_update broadcasts to timestamp completions, taking no tasks itself"""
+
+        capabilities: List[str] = []
+        subscriptions = ["task_updates"]
+
+        async def _handle_message(self, message: Dict[str, Any]):
+            if message.get("type") == "task_update":
+                task_id = message["task_id"]
+                finished.setdefault(task_id, time.perf_counter())
+                statuses[task_id] = message["status"]
+                if not submitting and len(finished) >= len(submitted):
+                    all_done.set()
+            await super()._handle_message(message)
+
+        async def process_task(self, task: Dict[str, Any]) -> Any:
+            raise NotImplementedError
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    url = f"ws://127.0.0.1:{args.port}"
+    observer = Observer("load_test_observer", url)
+    agents = [ContentAgent(f"load_agent_{i}", url) for i in range(args.agents)]
+    for agent in [observer] + agents:
+        await agent.connect()
+
+    task_types = TASK_TYPES if args.task_type == "mixed" else (args.task_type,)
+    rng = random.Random(args.seed)
+    errors = 0
+    requests: List[asyncio.Task] = []
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=60) as client:
+        async def submit(task: Dict[str, Any]):
+            nonlocal errors
+            started = time.perf_counter()
+            try:
+                response = await client.post("/api/tasks", json=task)
+                response.raise_for_status()
+                submitted[response.json()["task_id"]] = started
+            except Exception:
+                errors += 1
+
+        # Open loop: tasks arrive on a Poisson schedule whether or not earlier ones finished
+        start = time.perf_counter()
+        next_at = start
+        for index in itertools.count():
+            next_at += rng.expovariate(args.rate)
+            if next_at - start >= args.duration:
+                break
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            task = make_task(task_types[index % len(task_types)], index, args.words)
+            requests.append(asyncio.create_task(submit(task)))
+        await asyncio.gather(*requests)
+        submit_end = time.perf_counter()
+        submitting = False
+        if len(finished) >= len(submitted):
+            all_done.set()
+        try:
+            await asyncio.wait_for(all_done.wait(), args.drain)
+        except asyncio.TimeoutError:
+            pass
+
+    latencies = [finished[task_id] - started for task_id, started in submitted.items() if task_id in finished]
+    completed = [task_id for task_id in submitted if statuses.get(task_id) == "completed"]
+    end = max(finished.values(), default=submit_end)
+    families = {family["name"]: family for family in REGISTRY.collect()}
+
+    def counts(name: str) -> Dict[str, int]:
+        family = families.get(name, {"samples": []})
+        return {labels.get("type", ""): int(value) for _, labels, value in family["samples"]}
+
+    # Calls that reached the fake model, i.e. not answered by the cache or a coalesced call
+    provider_calls = sum(
+        int(value)
+        for agent in agents
+        for family in agent.metrics.collect() if family["name"] == "ai_call_duration_seconds"
+        for name, _, value in family["samples"] if name.endswith("_count")
+    )
+
+    for agent in agents + [observer]:
+        await agent.disconnect()
+    server.should_exit = True
+    await serving
+
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "submitted": len(submitted),
+        "submit_errors": errors,
+        "offered_rate": len(submitted) / (submit_end - start),
+        "completed": len(completed),
+        "failed": sum(1 for task_id in submitted if statuses.get(task_id) not in (None, "completed")),
+        "unfinished": sum(1 for task_id in submitted if task_id not in finished),
+        "throughput": len(completed) / (end - start),
+        "latency_ms": {
+            "p50": percentile(latencies, 0.5) * 1000,
+            "p95": percentile(latencies, 0.95) * 1000,
+            "p99": percentile(latencies, 0.99) * 1000,
+            "max": max(latencies, default=float("nan")) * 1000,
+        },
+        "provider_calls": provider_calls,
+        "messages_received": counts("mcp_messages_received_total"),
+        "messages_sent": counts("mcp_messages_sent_total"),
+        "bytes_sent": int(sum(value for _, _, value in families.get("mcp_message_bytes_sent_total", {"samples": []})["samples"])),
+    }
+
+def print_report(report: Dict[str, Any]):
+    config = report["config"]
+    print(
+        f"{config['agents']} agents x {config['concurrency']} workers, {config['task_type']} tasks at "
+        f"{config['rate']}/s for {config['duration']}s, latency {config['latency']}, error rate {config['error_rate']}"
+    )
+    print(
+        f"submitted {report['submitted']} ({report['offered_rate']:.1f}/s, {report['submit_errors']} errors), "
+        f"completed {report['completed']}, failed {report['failed']}, unfinished {report['unfinished']}"
+    )
+    print(f"throughput {report['throughput']:.2f} tasks/s")
+    latency = report["latency_ms"]
+    print(f"latency ms p50 {latency['p50']:.0f}  p95 {latency['p95']:.0f}  p99 {latency['p99']:.0f}  max {latency['max']:.0f}")
+    print(f"provider calls {report['provider_calls']}")
+    print(f"messages received {sum(report['messages_received'].values())}: {report['messages_received']}")
+    print(f"messages sent {sum(report['messages_sent'].values())} ({report['bytes_sent']} bytes): {report['messages_sent']}")
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--agents", type=int, default=4, help="content agents to start")
+    parser.add_argument("--concurrency", type=int, default=5, help="concurrent tasks per agent")
+    parser.add_argument("--rate", type=float, default=20, help="tasks submitted per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to submit tasks for")
+    parser.add_argument("--drain", type=float, default=60, help="seconds to wait for outstanding tasks afterwards")
+    parser.add_argument("--task-type", default="analyze_content", choices=TASK_TYPES + ("mixed",))
+    parser.add_argument("--words", type=int, default=800, help="words per article and per generated output")
+    parser.add_argument("--latency", default="lognormal:800:0.5", help="fake provider latency distribution in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake provider calls that fail")
+    parser.add_argument("--seed", type=int, default=1, help="seed for arrivals and fake provider behaviour")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--task-store", default="sqlite:///", help="task store URL; the default is in memory")
+    parser.add_argument("--output", help="also write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    configure_environment(args)
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
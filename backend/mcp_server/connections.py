@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from typing import Dict, Any, Callable, Iterable, Optional, Set
+from fastapi import WebSocket
+from .protocol import WireCodec
+from ..telemetry.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+MESSAGES_SENT = REGISTRY.counter("mcp_messages_sent_total", "Messages written to agent sockets", ("type",))
+BYTES_SENT = REGISTRY.counter("mcp_message_bytes_sent_total", "Bytes of frames written to agent sockets")
+
+# Topics an agent receives until it subscribes explicitly, matching the old broadcast
+DEFAULT_TOPICS = ("task_updates", "context", "agent_status")
+
+class AgentConnection:
+    """An agent's websocket with a bounded outbound queue drained by its own writer
+
+    Sending never waits on the socket, so one slow agent cannot stall the
+    server. An agent that lets its queue fill up is a slow consumer and gets
+    evicted through `on_overflow`.
+    """
+
+    def __init__(
+        self,
+        agent_id: str,
+        websocket: WebSocket,
+        max_queue: int = 1000,
+        on_overflow: Optional[Callable[[str], None]] = None,
+        codec: Optional[WireCodec] = None,
+    ):
+        self.agent_id = agent_id
+        self.websocket = websocket
+        self.codec = codec or WireCodec("json")
+        self.subscriptions: Set[str] = set(DEFAULT_TOPICS)
+        self.on_overflow = on_overflow
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._writer = asyncio.create_task(self._write_loop())
+        self.closed = False
+
+    def subscribe(self, topics: Iterable[str], replace: bool = False):
+        if replace:
+            self.subscriptions = set()
+        self.subscriptions.update(topics)
+
+    def unsubscribe(self, topics: Iterable[str]):
+        self.subscriptions.difference_update(topics)
+
+    def send(self, message: Dict[str, Any]) -> bool:
+        """Queue a message for the agent without waiting; False if it could not be queued"""
+        if self.closed:
+            return False
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            logger.warning(f"Agent {self.agent_id} is not keeping up with its messages")
+            if self.on_overflow:
+                self.on_overflow(self.agent_id)
+            return False
+
+    async def _write_loop(self):
+        try:
+            while True:
+                message = await self._queue.get()
+                frame = self.codec.encode(message)
+                if isinstance(frame, str):
+                    await self.websocket.send_text(frame)
+                else:
+                    await self.websocket.send_bytes(frame)
+                MESSAGES_SENT.inc(type=message.get("type"))
+                BYTES_SENT.inc(len(frame))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error sending to agent {self.agent_id}: {e}")
+            await self.close()
+
+    async def close(self):
+        """Stop the writer and close the socket"""
+        if self.closed:
+            return
+        self.closed = True
+        if self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
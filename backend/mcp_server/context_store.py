@@ -0,0 +1,133 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, Any, Iterable, List, Optional
+from .state import StateBackend
+
+logger = logging.getLogger(__name__)
+
+class ContextStore:
+    """Server-owned shared context with a version on every key
+
+    Each change takes the next version from a counter shared by all nodes, so
+    agents can apply deltas in any order by keeping the newest version per key
+    and notice a missed delta when its `from_version` is ahead of theirs.
+    """
+
+    def __init__(
+        self,
+        state: StateBackend,
+        max_keys: Optional[int] = None,
+        max_value_bytes: Optional[int] = None,
+        default_ttl: Optional[float] = None,
+    ):
+        self.state = state
+        self.max_keys = max_keys or int(os.getenv("CONTEXT_MAX_KEYS", "1000"))
+        self.max_value_bytes = max_value_bytes or int(os.getenv("CONTEXT_MAX_VALUE_BYTES", "65536"))
+        self.default_ttl = default_ttl if default_ttl is not None else float(os.getenv("CONTEXT_TTL_SECONDS", "0"))
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _live(entries: Dict[str, Dict[str, Any]], now: float) -> Dict[str, Dict[str, Any]]:
+        return {
+            key: entry for key, entry in entries.items()
+            if not entry.get("expires_at") or entry["expires_at"] > now
+        }
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get one entry with its value, version and expiry, if it exists"""
+        entry = (await self.state.get_context_entries()).get(key)
+        if entry is None or not self._live({key: entry}, time.time()):
+            return None
+        return entry
+
+    async def snapshot(self) -> Dict[str, Any]:
+        """Get every live value with its version, and the context version it is current to"""
+        version = await self.state.context_version()
+        entries = self._live(await self.state.get_context_entries(), time.time())
+        return {
+            "version": version,
+            "context": {key: entry["value"] for key, entry in entries.items()},
+            "versions": {key: entry["version"] for key, entry in entries.items()},
+        }
+
+    async def apply_patch(
+        self,
+        set_values: Optional[Dict[str, Any]] = None,
+        delete: Iterable[str] = (),
+        ttl: Optional[float] = None,
+        source: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Set and delete keys, returning the delta to publish or None if nothing changed"""
+        set_values = dict(set_values or {})
+        for key, value in list(set_values.items()):
+            size = len(json.dumps(value))
+            if size > self.max_value_bytes:
+                logger.warning(f"Dropping context key {key} from {source}: {size} bytes exceeds {self.max_value_bytes}")
+                del set_values[key]
+        delete = [key for key in dict.fromkeys(delete) if key not in set_values]
+        ttl = self.default_ttl if ttl is None else ttl
+
+        async with self._lock:
+            now = time.time()
+            stored = await self.state.get_context_entries()
+            entries = self._live(stored, now)
+            delete = [key for key in delete if key in stored]
+            changed = list(set_values) + delete
+            if not changed:
+                return None
+
+            # Evict the least recently updated keys beyond the limit
+            remaining = {key: entry for key, entry in entries.items() if key not in changed}
+            overflow = len(remaining) + len(set_values) - self.max_keys
+            if overflow > 0:
+                evicted = sorted(remaining, key=lambda key: remaining[key]["updated_at"])[:overflow]
+                logger.info(f"Context over {self.max_keys} keys, evicting {len(evicted)}")
+                delete += evicted
+                changed += evicted
+
+            last = await self.state.next_context_version(len(changed))
+            versions = {key: last - len(changed) + 1 + i for i, key in enumerate(changed)}
+            await self.state.set_context_entries({
+                key: {
+                    "value": value,
+                    "version": versions[key],
+                    "updated_at": now,
+                    "expires_at": now + ttl if ttl else None,
+                    "source": source,
+                }
+                for key, value in set_values.items()
+            })
+            await self.state.delete_context_keys(delete)
+
+        return self._delta(last - len(changed), last, set_values, delete, versions, source)
+
+    async def expire(self) -> Optional[Dict[str, Any]]:
+        """Delete entries past their TTL, returning the delta to publish or None"""
+        now = time.time()
+        entries = await self.state.get_context_entries()
+        expired = [key for key in entries if key not in self._live(entries, now)]
+        if not expired:
+            return None
+        return await self.apply_patch(delete=expired, source="ttl")
+
+    @staticmethod
+    def _delta(
+        from_version: int,
+        version: int,
+        set_values: Dict[str, Any],
+        delete: List[str],
+        versions: Dict[str, int],
+        source: Optional[str],
+    ) -> Dict[str, Any]:
+        return {
+            "type": "context_delta",
+            "from_version": from_version,
+            "version": version,
+            "set": set_values,
+            "delete": delete,
+            "versions": versions,
+            "source_agent": source,
+        }
@@ -0,0 +1,182 @@
+import asyncio
+import time
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Optional, Set, Tuple
+
+class FakeRedis:
+    """In-process stand-in for the subset of redis.asyncio used by the state backend, task store and rate limits
+
+    Several state backends sharing one FakeRedis behave like several MCP Server
+    nodes sharing one Redis, which lets multi-node behaviour run in one process.
+    """
+
+    def __init__(self):
+        self._strings: Dict[str, str] = {}
+        self._hashes: Dict[str, Dict[str, str]] = {}
+        self._sets: Dict[str, Set[str]] = {}
+        self._zsets: Dict[str, Dict[str, float]] = {}
+        self._channels: Dict[str, Set["FakePubSub"]] = {}
+        self._expires: Dict[str, float] = {}
+
+    def _expire_string(self, name: str):
+        # Expiry is only supported for string keys, checked when they are read or written
+        if name in self._expires and self._expires[name] <= time.monotonic():
+            del self._expires[name]
+            self._strings.pop(name, None)
+
+    async def get(self, name: str) -> Optional[str]:
+        self._expire_string(name)
+        return self._strings.get(name)
+
+    async def set(self, name: str, value: str, nx: bool = False) -> Optional[bool]:
+        self._expire_string(name)
+        if nx and name in self._strings:
+            return None
+        self._strings[name] = str(value)
+        self._expires.pop(name, None)
+        return True
+
+    async def mget(self, names: List[str]) -> List[Optional[str]]:
+        for name in names:
+            self._expire_string(name)
+        return [self._strings.get(name) for name in names]
+
+    async def incrby(self, name: str, amount: int = 1) -> int:
+        self._expire_string(name)
+        value = int(self._strings.get(name, 0)) + amount
+        self._strings[name] = str(value)
+        return value
+
+    async def expire(self, name: str, seconds: int) -> bool:
+        if name not in self._strings:
+            return False
+        self._expires[name] = time.monotonic() + seconds
+        return True
+
+    async def hset(self, name: str, key: Optional[str] = None, value: Optional[str] = None, mapping: Optional[Dict[str, str]] = None) -> int:
+        values = dict(mapping or {})
+        if key is not None:
+            values[key] = value
+        hash_ = self._hashes.setdefault(name, {})
+        added = len(set(values) - set(hash_))
+        hash_.update(values)
+        return added
+
+    async def hget(self, name: str, key: str) -> Optional[str]:
+        return self._hashes.get(name, {}).get(key)
+
+    async def hgetall(self, name: str) -> Dict[str, str]:
+        return dict(self._hashes.get(name, {}))
+
+    async def hdel(self, name: str, *keys: str) -> int:
+        hash_ = self._hashes.get(name, {})
+        return sum(hash_.pop(k, None) is not None for k in keys)
+
+    async def sadd(self, name: str, *values: str) -> int:
+        set_ = self._sets.setdefault(name, set())
+        added = len(set(values) - set_)
+        set_.update(values)
+        return added
+
+    async def srem(self, name: str, *values: str) -> int:
+        set_ = self._sets.get(name, set())
+        removed = len(set_ & set(values))
+        set_.difference_update(values)
+        return removed
+
+    async def smembers(self, name: str) -> Set[str]:
+        return set(self._sets.get(name, set()))
+
+    async def scard(self, name: str) -> int:
+        return len(self._sets.get(name, set()))
+
+    async def zadd(self, name: str, mapping: Dict[str, float]) -> int:
+        zset = self._zsets.setdefault(name, {})
+        added = len(set(mapping) - set(zset))
+        zset.update({member: float(score) for member, score in mapping.items()})
+        return added
+
+    async def zrem(self, name: str, *members: str) -> int:
+        zset = self._zsets.get(name, {})
+        return sum(zset.pop(m, None) is not None for m in members)
+
+    async def zrange(self, name: str, start: int, end: int) -> List[str]:
+        members = sorted(self._zsets.get(name, {}).items(), key=lambda item: (item[1], item[0]))
+        return [m for m, _ in members][start:None if end == -1 else end + 1]
+
+    async def zcard(self, name: str) -> int:
+        return len(self._zsets.get(name, {}))
+
+    async def delete(self, *names: str) -> int:
+        deleted = 0
+        for name in names:
+            self._expire_string(name)
+            self._expires.pop(name, None)
+            deleted += self._strings.pop(name, None) is not None
+            deleted += self._hashes.pop(name, None) is not None
+            deleted += self._sets.pop(name, None) is not None
+            deleted += self._zsets.pop(name, None) is not None
+        return deleted
+
+    async def publish(self, channel: str, message: str) -> int:
+        subscribers = self._channels.get(channel, set())
+        for pubsub in subscribers:
+            pubsub._queue.put_nowait({"type": "message", "channel": channel, "data": message})
+        return len(subscribers)
+
+    def pubsub(self) -> "FakePubSub":
+        return FakePubSub(self)
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+    async def close(self):
+        pass
+
+class FakePipeline:
+    """Queues commands and runs them on execute; with no awaits in between they run atomically"""
+
+    def __init__(self, redis: FakeRedis):
+        self._redis = redis
+        self._commands: List[Tuple[Callable[..., Awaitable[Any]], tuple, dict]] = []
+
+    async def __aenter__(self) -> "FakePipeline":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._commands.clear()
+
+    def __getattr__(self, name: str) -> Callable[..., "FakePipeline"]:
+        command = getattr(self._redis, name)
+
+        def queue(*args, **kwargs) -> "FakePipeline":
+            self._commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self) -> List[Any]:
+        commands, self._commands = self._commands, []
+        return [await command(*args, **kwargs) for command, args, kwargs in commands]
+
+class FakePubSub:
+    def __init__(self, redis: FakeRedis):
+        self._redis = redis
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._channels: List[str] = []
+
+    async def subscribe(self, *channels: str):
+        for channel in channels:
+            self._redis._channels.setdefault(channel, set()).add(self)
+            self._channels.append(channel)
+
+    async def unsubscribe(self, *channels: str):
+        for channel in channels or list(self._channels):
+            self._redis._channels.get(channel, set()).discard(self)
+            if channel in self._channels:
+                self._channels.remove(channel)
+
+    async def listen(self) -> AsyncIterator[Dict[str, Any]]:
+        while True:
+            yield await self._queue.get()
+
+    async def close(self):
+        await self.unsubscribe()
@@ -1,16 +1,45 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, List
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from contextlib import asynccontextmanager
 import asyncio
 import json
 import logging
+import os
+import random
+import time
+import uuid
 from datetime import datetime
+from .connections import AgentConnection
+from .context_store import ContextStore
+from .protocol import Frame, WireCodec, negotiate
+from .state import StateBackend, create_state_backend
+from .task_events import TaskEventHub
+from .task_store import TaskStore, TaskPriority, TaskStatus, create_task_store
+from .workflows import WorkflowEngine, WorkflowError
+from ..telemetry.metrics import REGISTRY, render, with_labels
+from ..telemetry.tracing import get_tracer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="SEO Spark MCP Server")
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Open the task store and state backend for the server's lifetime, flushing traces on the way out"""
+    await agent_manager.task_store.initialize()
+    await agent_manager.state.initialize()
+    agent_manager.start_monitoring()
+    try:
+        yield
+    finally:
+        await agent_manager.stop()
+        await agent_manager.tracer.flush()
+        await agent_manager.state.close()
+        await agent_manager.task_store.close()
+
+app = FastAPI(title="SEO Spark MCP Server", lifespan=lifespan)
 
 # CORS middleware configuration
 app.add_middleware(
@@ -21,118 +50,764 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store active agent connections
-active_agents: Dict[str, WebSocket] = {}
-agent_tasks: Dict[str, List[str]] = {}
-
 class AgentManager:
-    def __init__(self):
-        self.agents = {}
-        self.tasks = {}
-        self.context = {}
-
-    async def register_agent(self, agent_id: str, websocket: WebSocket):
-        self.agents[agent_id] = websocket
-        self.tasks[agent_id] = []
+    """Coordinates agents connected to this node with the state shared by all nodes
+
+    `agents` holds only this node's connections. The registry, per-agent task
+    table and shared context live in the state backend, and messages for agents
+    connected elsewhere are relayed to the node that holds their connection.
+    """
+
+    def __init__(self, task_store: TaskStore, state: StateBackend, task_events: TaskEventHub):
+        self.agents: Dict[str, AgentConnection] = {}
+        self.task_store = task_store
+        self.state = state
+        self.task_events = task_events
+        self.context = ContextStore(state)
+        # Tasks carry the traceparent of their enqueue span so routing, the
+        # agent and the completion broadcast join the same trace
+        self.tracer = get_tracer()
+        self.workflows = WorkflowEngine(task_store, self.dispatch_queued, self.publish_task_event)
+        self.state.set_relay_handler(self._handle_relay)
+        self.routing_strategy = os.getenv("ROUTING_STRATEGY", "power_of_two").lower()
+        self.dispatch_scan_limit = int(os.getenv("DISPATCH_SCAN_LIMIT", "500"))
+        self._dispatch_lock = asyncio.Lock()
+
+        # Liveness tracking: agents silent for longer than agent_timeout are
+        # dropped, and a dropped agent's tasks are requeued after requeue_grace
+        # unless it reconnects first.
+        self.last_seen: Dict[str, float] = {}
+        self.agent_timeout = float(os.getenv("AGENT_TIMEOUT_SECONDS", "30"))
+        self.requeue_grace = float(os.getenv("AGENT_REQUEUE_GRACE_SECONDS", "5"))
+        self._requeue_timers: Dict[str, asyncio.Task] = {}
+        self._monitor: Optional[asyncio.Task] = None
+        self.outbound_queue_size = int(os.getenv("AGENT_OUTBOUND_QUEUE_SIZE", "1000"))
+
+        # Metrics of this node, plus the latest families each local agent pushed
+        self.agent_metrics: Dict[str, List[dict]] = {}
+        self._tasks_submitted = REGISTRY.counter("mcp_tasks_submitted_total", "Tasks accepted by the API", ("type", "priority"))
+        self._tasks_finished = REGISTRY.counter("mcp_tasks_finished_total", "Tasks that reached a final status", ("type", "status"))
+        self._task_duration = REGISTRY.histogram(
+            "mcp_task_duration_seconds", "Time from submission to a task's final status", ("type", "status"),
+        )
+        self._dispatch_duration = REGISTRY.histogram(
+            "mcp_dispatch_duration_seconds", "Time to route queued tasks to agents",
+            buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+        )
+        self._publish_duration = REGISTRY.histogram(
+            "mcp_publish_duration_seconds", "Time to fan a published message out to subscribed agents",
+            buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+        )
+        self._published = REGISTRY.counter("mcp_published_messages_total", "Messages queued for agents by publish")
+        self.messages_received = REGISTRY.counter("mcp_messages_received_total", "Messages received from agents", ("type",))
+        self._queued_tasks = REGISTRY.gauge("mcp_tasks_queued", "Tasks waiting for an agent")
+        self._inflight_tasks = REGISTRY.gauge("mcp_tasks_in_flight", "Tasks dispatched to an agent and not yet finished")
+        REGISTRY.gauge("mcp_agents_connected", "Agents connected to this node", func=lambda: len(self.agents))
+        REGISTRY.gauge(
+            "mcp_agent_outbound_queue_depth", "Messages waiting to be written to each agent's socket", ("agent",),
+            func=lambda: {agent_id: c.queue_depth for agent_id, c in self.agents.items()},
+        )
+
+    async def register_agent(self, agent_id: str, websocket: WebSocket, codec: Optional[WireCodec] = None) -> AgentConnection:
+        connection = AgentConnection(
+            agent_id,
+            websocket,
+            max_queue=self.outbound_queue_size,
+            on_overflow=self._evict_slow_consumer,
+            codec=codec,
+        )
+        previous = self.agents.get(agent_id)
+        if previous is not None:
+            await previous.close()
+        self.agents[agent_id] = connection
+        await self.state.set_agent(agent_id, {"node": self.state.node_id, "registered_at": time.time()})
+        await self.state.set_agent_tasks(agent_id, [])
+        self.touch(agent_id)
+        timer = self._requeue_timers.pop(agent_id, None)
+        if timer:
+            timer.cancel()
         logger.info(f"Agent {agent_id} registered")
+        return connection
+
+    async def resume_agent(self, agent_id: str, in_progress: Optional[List[str]] = None):
+        """Redeliver unfinished tasks an agent did not report as still in progress"""
+        in_progress = set(in_progress or ())
+        async with self._dispatch_lock:
+            pending = await self.task_store.pending_for_agent(agent_id)
+            redelivered = 0
+            for record in pending:
+                if record["task_id"] in in_progress:
+                    await self.state.add_agent_task(agent_id, record["task_id"])
+                elif record["status"] == TaskStatus.QUEUED:
+                    # Targeted tasks still queued may be dispatched by another node meanwhile
+                    if not await self.task_store.claim(record["task_id"], agent_id):
+                        continue
+                    if await self._send_task(agent_id, record["task"]):
+                        redelivered += 1
+                    else:
+                        await self.task_store.update(record["task_id"], status=TaskStatus.QUEUED, assigned_agent=None)
+                elif await self._send_task(agent_id, record["task"]):
+                    await self.task_store.mark_dispatched(record["task_id"], agent_id)
+                    redelivered += 1
+        if redelivered:
+            logger.info(f"Redelivered {redelivered} pending tasks to agent {agent_id}")
 
-    async def unregister_agent(self, agent_id: str):
+    async def unregister_agent(self, agent_id: str, connection: Optional[AgentConnection] = None):
+        # A stale connection closing must not unregister the agent's new connection
+        if connection is not None and self.agents.get(agent_id) is not connection:
+            return
         if agent_id in self.agents:
-            del self.agents[agent_id]
-            del self.tasks[agent_id]
+            await self.agents.pop(agent_id).close()
+            await self.state.remove_agent(agent_id, self.state.node_id)
+            self.last_seen.pop(agent_id, None)
+            self.agent_metrics.pop(agent_id, None)
+            self._requeue_timers[agent_id] = asyncio.create_task(self._requeue_after_grace(agent_id))
             logger.info(f"Agent {agent_id} unregistered")
 
+    async def _requeue_after_grace(self, agent_id: str):
+        """Give a dropped agent time to reconnect, then hand its tasks to others"""
+        await asyncio.sleep(self.requeue_grace)
+        self._requeue_timers.pop(agent_id, None)
+        if agent_id in await self.state.get_agents():
+            # Reconnected, possibly to another node, which resumed its tasks
+            return
+        requeued = await self.task_store.requeue_agent_tasks(agent_id)
+        if requeued:
+            logger.warning(f"Requeued {requeued} tasks of lost agent {agent_id}")
+            await self.dispatch_queued()
+
+    def touch(self, agent_id: str):
+        """Record that an agent was heard from"""
+        self.last_seen[agent_id] = time.monotonic()
+
+    async def stop(self):
+        """Cancel background work before the server shuts down"""
+        for timer in self._requeue_timers.values():
+            timer.cancel()
+        self._requeue_timers.clear()
+        if self._monitor:
+            self._monitor.cancel()
+
+    def start_monitoring(self):
+        self._monitor = asyncio.create_task(self.monitor_agents())
+
+    async def monitor_agents(self):
+        """Drop agents whose connection went silent, or whose node died, without closing"""
+        while True:
+            await self.check_agents()
+            await asyncio.sleep(self.agent_timeout / 3)
+
+    async def check_agents(self):
+        """One pass of monitor_agents, also expiring shared context entries"""
+        await self.state.touch_node(self.agent_timeout)
+        now = time.monotonic()
+        for agent_id, seen in list(self.last_seen.items()):
+            if now - seen > self.agent_timeout:
+                logger.warning(f"Agent {agent_id} missed heartbeats for {now - seen:.0f}s, dropping it")
+                await self.unregister_agent(agent_id)
+
+        live_nodes = await self.state.live_nodes()
+        requeued = 0
+        for agent_id, info in (await self.state.get_agents()).items():
+            if info.get("node") not in live_nodes:
+                logger.warning(f"Node {info.get('node')} of agent {agent_id} is gone, dropping agent")
+                await self.state.remove_agent(agent_id, info.get("node"))
+                requeued += await self.task_store.requeue_agent_tasks(agent_id)
+        if requeued:
+            # Hand the requeued tasks to live agents now rather than when the next task finishes
+            await self.dispatch_queued()
+
+        delta = await self.context.expire()
+        if delta:
+            await self.publish(["context"], delta)
+
+    def _evict_slow_consumer(self, agent_id: str):
+        logger.warning(f"Evicting slow agent {agent_id}")
+        asyncio.create_task(self.unregister_agent(agent_id, self.agents.get(agent_id)))
+
+    async def update_agent_status(self, agent_id: str, status: dict):
+        """Record the task types and concurrency an agent advertises"""
+        info = {}
+        if "capabilities" in status:
+            info["capabilities"] = list(status["capabilities"] or [])
+        if status.get("max_concurrent_tasks"):
+            info["max_concurrent_tasks"] = int(status["max_concurrent_tasks"])
+        if info:
+            await self.state.set_agent(agent_id, info)
+        if status.get("status") == "ready":
+            await self.send_context_snapshot(agent_id)
+            await self.resume_agent(agent_id, status.get("current_tasks"))
+            await self.dispatch_queued()
+
+    async def _handle_relay(self, message: dict):
+        """Handle a message another node relayed to this one"""
+        kind = message.get("kind")
+        if kind == "deliver":
+            connection = self.agents.get(message["agent_id"])
+            if connection is not None:
+                connection.send(message["message"])
+        elif kind == "publish":
+            self._publish_local(message["topics"], message["message"], message.get("exclude"))
+        elif kind == "task_event":
+            self.task_events.publish(message["task_id"], message["event"])
+
     async def broadcast_message(self, message: dict):
-        for agent_id, websocket in self.agents.items():
-            try:
-                await websocket.send_json(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting to agent {agent_id}: {e}")
+        for connection in list(self.agents.values()):
+            connection.send(message)
+
+    def _publish_local(self, topics: List[str], message: dict, exclude: Optional[str] = None) -> int:
+        started = time.perf_counter()
+        delivered = 0
+        for agent_id, connection in list(self.agents.items()):
+            if agent_id != exclude and not connection.subscriptions.isdisjoint(topics):
+                delivered += connection.send(message)
+        self._publish_duration.observe(time.perf_counter() - started)
+        self._published.inc(delivered)
+        return delivered
+
+    async def publish(self, topics: List[str], message: dict, exclude: Optional[str] = None) -> int:
+        """Queue a message for every agent, on any node, subscribed to any of the topics"""
+        await self.state.relay({"kind": "publish", "topics": topics, "message": message, "exclude": exclude})
+        return self._publish_local(topics, message, exclude)
+
+    async def publish_task_event(self, task_id: str, event: dict):
+        """Deliver a task event to API clients watching the task on any node"""
+        await self.state.relay({"kind": "task_event", "task_id": task_id, "event": event})
+        self.task_events.publish(task_id, event)
+
+    async def update_context(self, agent_id: str, message: dict):
+        """Apply a context patch from an agent and publish the resulting delta"""
+        if message["type"] == "context_update":
+            # Older agents send the keys they changed as a whole context dict
+            delta = await self.context.apply_patch(message.get("context"), source=agent_id)
+        else:
+            delta = await self.context.apply_patch(
+                message.get("set"),
+                message.get("delete", ()),
+                ttl=message.get("ttl"),
+                source=agent_id,
+            )
+        if delta:
+            # The sender gets it too, to learn the versions of its own keys
+            await self.publish(["context"], {**delta, "timestamp": datetime.utcnow().isoformat()})
 
-    async def route_task(self, task: dict):
+    async def send_context_snapshot(self, agent_id: str):
+        """Send the whole context to an agent that just joined or fell behind"""
+        connection = self.agents.get(agent_id)
+        if connection is not None and "context" in connection.subscriptions:
+            connection.send({"type": "context_snapshot", **await self.context.snapshot()})
+
+    def update_subscriptions(self, agent_id: str, message: dict):
+        """Apply a subscribe/unsubscribe request from an agent"""
+        connection = self.agents.get(agent_id)
+        if connection is None:
+            return
+        if message["type"] == "unsubscribe":
+            connection.unsubscribe(message.get("topics", []))
+        else:
+            connection.subscribe(message.get("topics", []), replace=message.get("replace", False))
+
+    async def agent_capacity(self) -> Tuple[Dict[str, dict], Dict[str, int]]:
+        """Get the registered agents and the number of tasks outstanding on each"""
+        agents = await self.state.get_agents()
+        outstanding = {
+            agent_id: len(task_ids)
+            for agent_id, task_ids in (await self.state.get_agent_tasks(agents)).items()
+        }
+        return agents, outstanding
+
+    @staticmethod
+    def has_free_capacity(info: dict, outstanding: int) -> bool:
+        return outstanding < info.get("max_concurrent_tasks", float("inf"))
+
+    def choose_agent(self, task: dict, agents: Dict[str, dict], outstanding: Dict[str, int]) -> Optional[str]:
+        """Pick the agent that should run a task from a snapshot of agents and their load"""
         target_agent = task.get("target_agent")
-        if target_agent in self.agents:
-            try:
-                await self.agents[target_agent].send_json(task)
-                self.tasks[target_agent].append(task["task_id"])
-            except Exception as e:
-                logger.error(f"Error routing task to agent {target_agent}: {e}")
+        if target_agent:
+            candidates = [target_agent] if target_agent in agents else []
+        else:
+            task_type = task.get("type")
+            candidates = [
+                agent_id for agent_id, info in agents.items()
+                if task_type in info.get("capabilities", ())
+            ]
+        candidates = [
+            agent_id for agent_id in candidates
+            if self.has_free_capacity(agents[agent_id], outstanding.get(agent_id, 0))
+        ]
+        if not candidates:
+            return None
+        if self.routing_strategy == "power_of_two" and len(candidates) > 2:
+            candidates = random.sample(candidates, 2)
+        return min(candidates, key=lambda agent_id: outstanding.get(agent_id, 0))
+
+    async def send_to_agent(self, agent_id: str, message: dict, info: Optional[dict] = None) -> bool:
+        """Queue a message for an agent on this node or relay it to the agent's node
+
+        `info` is the agent's registry entry, when the caller already has it.
+        """
+        connection = self.agents.get(agent_id)
+        if connection is not None:
+            return connection.send(message)
+        info = info or (await self.state.get_agents()).get(agent_id)
+        if info is None:
+            return False
+        await self.state.relay({"kind": "deliver", "agent_id": agent_id, "message": message}, info["node"])
+        return True
+
+    async def _send_task(self, agent_id: str, task: dict, traceparent: Optional[str] = None, info: Optional[dict] = None) -> bool:
+        """Deliver a task message to an agent on this node or relay it to the agent's node"""
+        message = {**task, "type": "task", "task_type": task.get("type")}
+        if traceparent:
+            message["traceparent"] = traceparent
+        if not await self.send_to_agent(agent_id, message, info):
+            logger.error(f"Error routing task to agent {agent_id}")
+            return False
+        await self.state.add_agent_task(agent_id, task["task_id"])
+        return True
+
+    async def expire_task(self, task_id: str):
+        """Drop a queued task whose deadline passed so it never reaches an agent"""
+        record = await self.task_store.expire(task_id)
+        if record is None:
+            # Cancelled since the scan read it
+            return
+        self.record_finished(record)
+        logger.info(f"Task {task_id} expired before dispatch")
+        await self.publish_task_event(task_id, {"event": "expired", "task_id": task_id, "error": record["error"]})
+        if record["task"].get("workflow_id"):
+            await self.workflows.step_finished(record)
+
+    async def _dispatch(self, task: dict, capacity: Optional[Tuple[Dict[str, dict], Dict[str, int]]] = None) -> Optional[str]:
+        """Route one task; `capacity` is a snapshot from agent_capacity, updated as tasks are sent"""
+        if task.get("deadline") and time.time() >= task["deadline"]:
+            await self.expire_task(task["task_id"])
+            return None
+        started = time.time()
+        agents, outstanding = capacity or await self.agent_capacity()
+        agent_id = self.choose_agent(task, agents, outstanding)
+        if agent_id is None:
+            return None
+        # Only routing attempts that found an agent get a span, so a long
+        # queue scanned on every dispatch does not flood the trace
+        span = self.tracer.start_span(
+            "task.route", parent=task.get("traceparent"),
+            attributes={"task_id": task["task_id"], "agent_id": agent_id}, start_time=started,
+        )
+        try:
+            # Claim first so two nodes never dispatch the same queued task
+            if not await self.task_store.claim(task["task_id"], agent_id):
+                span.set_attribute("claimed", False)
+                return None
+            if not await self._send_task(agent_id, task, span.traceparent, agents[agent_id]):
+                span.record_error("send failed")
+                await self.task_store.update(task["task_id"], status=TaskStatus.QUEUED, assigned_agent=None)
+                return None
+            outstanding[agent_id] = outstanding.get(agent_id, 0) + 1
+            return agent_id
+        finally:
+            span.end()
+
+    async def route_task(self, task: dict) -> Optional[str]:
+        """Send a task to the best available agent, leaving it queued if none can take it"""
+        async with self._dispatch_lock:
+            return await self._dispatch(task)
+
+    async def dispatch_queued(self) -> int:
+        """Route queued tasks to agents that have free capacity"""
+        dispatched = 0
+        async with self._dispatch_lock:
+            with self._dispatch_duration.time():
+                # Agents and their load are read once per scan, not once per queued task
+                agents, outstanding = capacity = await self.agent_capacity()
+                for record in await self.task_store.list_queued(self.dispatch_scan_limit):
+                    if not any(self.has_free_capacity(info, outstanding.get(a, 0)) for a, info in agents.items()):
+                        break
+                    if await self._dispatch(record["task"], capacity):
+                        dispatched += 1
+        return dispatched
+
+    async def cancel_task(self, task_id: str) -> Optional[dict]:
+        """Cancel a queued or running task, or every unfinished step of a workflow"""
+        record = await self.task_store.get(task_id)
+        if record is None or record["status"] in TaskStatus.FINAL:
+            return record
+
+        if record["type"] == "workflow":
+            # Stop the workflow first so cancelled steps do not start their dependents
+            if await self.task_store.cancel(task_id) is None:
+                return await self.task_store.get(task_id)
+            for step in record["task"]["steps"]:
+                await self.cancel_task(self.workflows.step_task_id(task_id, step["id"]))
+            await self.publish_task_event(task_id, {"event": "cancelled", "task_id": task_id, "error": "Cancelled"})
+            return await self.task_store.get(task_id)
 
-agent_manager = AgentManager()
+        async with self._dispatch_lock:
+            record = await self.task_store.get(task_id)
+            if record["status"] in TaskStatus.FINAL:
+                return record
+            agent_id = record["assigned_agent"] if record["status"] == TaskStatus.DISPATCHED else None
+            cancelled = await self.task_store.cancel(task_id)
+            if cancelled is None:
+                # The agent's outcome was recorded first
+                return await self.task_store.get(task_id)
+            record = cancelled
+            self.record_finished(record)
+            if agent_id:
+                # Free the agent's slot now rather than when it notices the cancel
+                await self.send_to_agent(agent_id, {"type": "cancel", "task_id": task_id})
+                await self.state.remove_agent_task(agent_id, task_id)
+        logger.info(f"Task {task_id} cancelled")
+
+        await self.publish_task_event(task_id, {"event": "cancelled", "task_id": task_id, "error": record["error"]})
+        if record["task"].get("workflow_id"):
+            await self.workflows.step_finished(record)
+        if agent_id:
+            await self.dispatch_queued()
+        return record
+
+    async def finish_task(self, agent_id: str, task_id: str, result=None, error: Optional[str] = None, expired: bool = False) -> bool:
+        """Record the outcome of a task reported by an agent; False if it was already final"""
+        await self.state.remove_agent_task(agent_id, task_id)
+        # The store only records the outcome if the task is not final yet, so
+        # a cancel that lands while this runs is never overwritten
+        if error is None:
+            record = await self.task_store.complete(task_id, result)
+        elif expired:
+            record = await self.task_store.expire(task_id, error)
+        else:
+            record = await self.task_store.fail(task_id, error)
+        if record is None:
+            # Cancelled or expired while the agent was working on it
+            await self.dispatch_queued()
+            return False
+        self.record_finished(record)
+        if record["task"].get("workflow_id"):
+            await self.workflows.step_finished(record)
+        await self.dispatch_queued()
+        return True
+
+    def record_submitted(self, task: dict):
+        self._tasks_submitted.inc(type=task.get("type"), priority=task.get("priority"))
+
+    def record_finished(self, record: Optional[dict]):
+        if record is None:
+            return
+        self._tasks_finished.inc(type=record["type"], status=record["status"])
+        self._task_duration.observe(time.time() - record["created_at"], type=record["type"], status=record["status"])
+
+    async def collect_metrics(self) -> List[dict]:
+        """Get this node's metric families and those its agents pushed, labelled with the agent"""
+        agents = await self.state.get_agents()
+        self._queued_tasks.set(await self.task_store.count_queued())
+        self._inflight_tasks.set(sum(len(t) for t in (await self.state.get_agent_tasks(agents)).values()))
+        families = REGISTRY.collect()
+        for agent_id, agent_families in list(self.agent_metrics.items()):
+            families += with_labels(agent_families, agent=agent_id)
+        return families
+
+task_events = TaskEventHub()
+agent_manager = AgentManager(create_task_store(), create_state_backend(), task_events)
+
+async def _receive_frame(websocket: WebSocket) -> Frame:
+    """Receive one text or binary frame"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    return message["text"] if message.get("text") is not None else message["bytes"]
 
 @app.websocket("/ws/agent/{agent_id}")
 async def websocket_endpoint(websocket: WebSocket, agent_id: str):
-    await websocket.accept()
-    await agent_manager.register_agent(agent_id, websocket)
+    # Agents offer wire encodings as subprotocols; those offering none speak JSON
+    subprotocol, codec = negotiate(websocket.scope.get("subprotocols", []))
+    await websocket.accept(subprotocol=subprotocol)
+    connection = await agent_manager.register_agent(agent_id, websocket, codec)
     
     try:
         while True:
-            data = await websocket.receive_json()
+            data = codec.decode(await _receive_frame(websocket))
+            agent_manager.touch(agent_id)
+            agent_manager.messages_received.inc(type=data.get("type"))
             
             # Handle different message types
-            if data["type"] == "task_complete":
+            if data["type"] == "heartbeat":
+                continue
+            
+            elif data["type"] == "task_complete":
                 # Handle task completion
                 task_id = data["task_id"]
-                if agent_id in agent_tasks and task_id in agent_tasks[agent_id]:
-                    agent_tasks[agent_id].remove(task_id)
+                # The span continues the agent's trace and covers the completion broadcast
+                with agent_manager.tracer.span("task.complete", parent=data.get("traceparent"), attributes={"task_id": task_id, "status": "completed"}):
+                    if not await agent_manager.finish_task(agent_id, task_id, result=data.get("result")):
+                        continue
+                    await agent_manager.publish_task_event(task_id, {"event": "completed", "task_id": task_id, "result": data.get("result")})
                 
-                # Broadcast task completion to relevant agents
-                await agent_manager.broadcast_message({
-                    "type": "task_update",
-                    "task_id": task_id,
-                    "status": "completed",
-                    "agent_id": agent_id,
-                    "timestamp": datetime.utcnow().isoformat()
+                    # Notify agents following task updates or this task
+                    await agent_manager.publish(["task_updates", f"task:{task_id}"], {
+                        "type": "task_update",
+                        "task_id": task_id,
+                        "status": "completed",
+                        "agent_id": agent_id,
+                        "timestamp": datetime.utcnow().isoformat()
+                    })
+            
+            elif data["type"] == "task_error":
+                # Handle task failure
+                task_id = data["task_id"]
+                # Agents report tasks whose deadline passed before they started as expired
+                status = TaskStatus.EXPIRED if data.get("expired") else TaskStatus.FAILED
+                with agent_manager.tracer.span("task.complete", parent=data.get("traceparent"), attributes={"task_id": task_id, "status": status}):
+                    if not await agent_manager.finish_task(agent_id, task_id, error=data.get("error", "Unknown error"), expired=data.get("expired", False)):
+                        continue
+                    await agent_manager.publish_task_event(task_id, {"event": status, "task_id": task_id, "error": data.get("error")})
+                
+                    await agent_manager.publish(["task_updates", f"task:{task_id}"], {
+                        "type": "task_update",
+                        "task_id": task_id,
+                        "status": status,
+                        "agent_id": agent_id,
+                        "timestamp": datetime.utcnow().isoformat()
+                    })
+            
+            elif data["type"] == "task_progress":
+                # Relay output chunks straight to clients watching the task
+                await agent_manager.publish_task_event(data["task_id"], {
+                    "event": "progress",
+                    "task_id": data["task_id"],
+                    "chunk": data.get("chunk"),
+                    "sequence": data.get("sequence")
                 })
             
-            elif data["type"] == "context_update":
+            elif data["type"] in ("context_patch", "context_update"):
                 # Handle context sharing between agents
-                await agent_manager.broadcast_message({
-                    "type": "context_update",
-                    "context": data["context"],
-                    "source_agent": agent_id,
-                    "timestamp": datetime.utcnow().isoformat()
-                })
+                await agent_manager.update_context(agent_id, data)
+            
+            elif data["type"] == "context_sync":
+                await agent_manager.send_context_snapshot(agent_id)
+            
+            elif data["type"] == "metrics":
+                # Kept on the node holding the connection, which serves them on /metrics
+                agent_manager.agent_metrics[agent_id] = data.get("families", [])
+            
+            elif data["type"] in ("subscribe", "unsubscribe"):
+                agent_manager.update_subscriptions(agent_id, data)
             
             elif data["type"] == "agent_status":
                 # Handle agent status updates
-                await agent_manager.broadcast_message({
+                if "subscriptions" in data:
+                    connection.subscribe(data["subscriptions"] or [], replace=True)
+                await agent_manager.update_agent_status(agent_id, data)
+                await agent_manager.publish(["agent_status"], {
                     "type": "agent_status",
                     "agent_id": agent_id,
                     "status": data["status"],
                     "timestamp": datetime.utcnow().isoformat()
-                })
+                }, exclude=agent_id)
     
     except WebSocketDisconnect:
-        await agent_manager.unregister_agent(agent_id)
         logger.info(f"Agent {agent_id} disconnected")
+    except Exception as e:
+        logger.error(f"Connection to agent {agent_id} failed: {e}")
+    finally:
+        await agent_manager.unregister_agent(agent_id, connection)
+
+def _new_task_id() -> str:
+    return f"task_{uuid.uuid4().hex}"
+
+def _prepare_task(task: dict, default_priority: str = TaskPriority.NORMAL) -> dict:
+    """Validate a submitted task's priority and turn a relative deadline into an absolute one"""
+    task.setdefault("priority", default_priority)
+    if task["priority"] not in TaskPriority.BOOSTS:
+        raise HTTPException(status_code=400, detail=f"Unknown priority {task['priority']}; use one of {', '.join(TaskPriority.BOOSTS)}")
+    if task.get("deadline_seconds") is not None:
+        task["deadline"] = time.time() + float(task.pop("deadline_seconds"))
+    return task
 
 @app.post("/api/tasks")
 async def create_task(task: dict):
     """
-    Create and route a new task to the appropriate agent
+    Persist a new task and route it to the appropriate agent
     """
-    task_id = f"task_{datetime.utcnow().timestamp()}"
+    task_id = _new_task_id()
     task["task_id"] = task_id
+    _prepare_task(task)
     
-    await agent_manager.route_task(task)
+    with agent_manager.tracer.span("task.enqueue", attributes={"task_id": task_id, "type": task.get("type")}) as span:
+        if span.traceparent:
+            task["traceparent"] = span.traceparent
+        await agent_manager.task_store.enqueue(task)
+    agent_manager.record_submitted(task)
+    agent_id = await agent_manager.route_task(task)
     
     return {
         "status": "success",
         "task_id": task_id,
-        "message": f"Task routed to agent {task['target_agent']}"
+        "message": (
+            f"Task routed to agent {agent_id}" if agent_id
+            else "Task queued until an agent is available"
+        )
+    }
+
+@app.post("/api/tasks/batch")
+async def create_tasks(tasks: List[dict]):
+    """
+    Persist a batch of tasks in one write and route each to its agent
+    """
+    # Batches are bulk work unless they say otherwise
+    spans = []
+    for task in tasks:
+        task["task_id"] = _new_task_id()
+        _prepare_task(task, TaskPriority.BULK)
+        # One trace per task, so each can be followed on its own
+        span = agent_manager.tracer.start_span("task.enqueue", attributes={"task_id": task["task_id"], "type": task.get("type"), "batch_size": len(tasks)})
+        if span.traceparent:
+            task["traceparent"] = span.traceparent
+        spans.append(span)
+    
+    await agent_manager.task_store.enqueue_many(tasks)
+    for task, span in zip(tasks, spans):
+        span.end()
+        agent_manager.record_submitted(task)
+    dispatched = await agent_manager.dispatch_queued()
+    
+    return {
+        "status": "success",
+        "task_ids": [task["task_id"] for task in tasks],
+        "dispatched": dispatched
     }
 
+@app.get("/api/tasks/{task_id}")
+async def get_task(task_id: str):
+    """
+    Get the state and, once finished, the result of a task
+    """
+    record = await agent_manager.task_store.get(task_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+    return record
+
+@app.post("/api/workflows")
+async def create_workflow(workflow: dict):
+    """
+    Run a DAG of task steps, each starting once the steps it depends on complete
+    """
+    _prepare_task(workflow)
+    try:
+        # Steps join the workflow's trace
+        with agent_manager.tracer.span("workflow.submit") as span:
+            if span.traceparent:
+                workflow["traceparent"] = span.traceparent
+            return await agent_manager.workflows.submit(workflow)
+    except WorkflowError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/workflows/{workflow_id}")
+async def get_workflow(workflow_id: str):
+    """
+    Get the state of a workflow and each of its steps
+    """
+    status = await agent_manager.workflows.status(workflow_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Workflow {workflow_id} not found")
+    return status
+
+@app.delete("/api/tasks/{task_id}")
+async def cancel_task(task_id: str):
+    """
+    Cancel a task or workflow, stopping it on its agent if it is running
+    """
+    record = await agent_manager.cancel_task(task_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+    if record["status"] != TaskStatus.CANCELLED:
+        raise HTTPException(status_code=409, detail=f"Task {task_id} already {record['status']}")
+    return {"status": "success", "task_id": task_id, "message": "Task cancelled"}
+
+async def _watch_task(task_id: str):
+    """Get an iterator over a task's events, or just its outcome if it already finished"""
+    # Subscribe before reading the record so no event falls between the two
+    queue = task_events.subscribe(task_id)
+    record = await agent_manager.task_store.get(task_id)
+    if record is None or record["status"] in TaskStatus.FINAL:
+        task_events.unsubscribe(task_id, queue)
+        if record is None:
+            raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+        queue = asyncio.Queue()
+        queue.put_nowait({
+            "event": record["status"],
+            "task_id": task_id,
+            "result": record["result"],
+            "error": record["error"]
+        })
+    return task_events.events(task_id, queue)
+
+@app.get("/api/tasks/{task_id}/stream")
+async def stream_task(task_id: str):
+    """
+    Stream a task's output chunks and final result as server-sent events
+    """
+    events = await _watch_task(task_id)
+
+    async def sse():
+        async for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(sse(), media_type="text/event-stream")
+
+@app.websocket("/ws/tasks/{task_id}")
+async def task_websocket(websocket: WebSocket, task_id: str):
+    """Relay a task's output chunks and final result over a websocket"""
+    await websocket.accept()
+    try:
+        events = await _watch_task(task_id)
+    except HTTPException as e:
+        await websocket.close(code=4404, reason=e.detail)
+        return
+    try:
+        async for event in events:
+            await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
 @app.get("/api/agents")
 async def get_agents():
     """
     Get list of active agents and their current tasks
     """
+    agents = await agent_manager.state.get_agents()
     return {
-        "agents": list(agent_manager.agents.keys()),
-        "tasks": agent_manager.tasks
+        "agents": list(agents.keys()),
+        "tasks": await agent_manager.state.get_agent_tasks(agents),
+        "capabilities": {k: sorted(v.get("capabilities", [])) for k, v in agents.items()},
+        "concurrency_limits": {k: v["max_concurrent_tasks"] for k, v in agents.items() if "max_concurrent_tasks" in v},
+        "nodes": {k: v["node"] for k, v in agents.items()}
     }
 
+@app.get("/api/context")
+async def get_context():
+    """
+    Get the shared context with the version of each key
+    """
+    return await agent_manager.context.snapshot()
+
+@app.get("/api/context/{key}")
+async def get_context_key(key: str):
+    """
+    Get one shared context entry
+    """
+    entry = await agent_manager.context.get(key)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Context key not found")
+    return {"key": key, **entry}
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Metrics of this node and its agents in the Prometheus text format
+    """
+    return PlainTextResponse(render(await agent_manager.collect_metrics()), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
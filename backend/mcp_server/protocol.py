@@ -0,0 +1,119 @@
+import json
+import logging
+import os
+import zlib
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Binary frames start with one byte naming the compression of the msgpack body
+FLAG_RAW = 0
+FLAG_ZLIB = 1
+FLAG_ZSTD = 2
+
+SUBPROTOCOL_PREFIX = "mcp."
+
+Frame = Union[str, bytes]
+
+def available_compressions() -> List[str]:
+    return (["zstd"] if zstandard else []) + ["zlib"]
+
+class WireCodec:
+    """Encode agent/server messages as JSON text frames or msgpack binary frames
+
+    Binary frames larger than `compress_min_bytes` are compressed. Text frames
+    are always read as JSON, so a binary codec still understands peers that
+    fell back to JSON.
+    """
+
+    def __init__(self, encoding: str = "json", compression: Optional[str] = None, compress_min_bytes: Optional[int] = None):
+        if encoding == "msgpack" and msgpack is None:
+            logger.warning("msgpack is not installed, falling back to JSON frames")
+            encoding = "json"
+        if compression == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed, falling back to zlib compression")
+            compression = "zlib"
+        self.encoding = encoding
+        self.compression = compression if encoding == "msgpack" else None
+        self.compress_min_bytes = (
+            compress_min_bytes if compress_min_bytes is not None
+            else int(os.getenv("WIRE_COMPRESS_MIN_BYTES", "1024"))
+        )
+        if self.compression == "zstd":
+            self._zstd_compressor = zstandard.ZstdCompressor(level=3)
+        self._zstd_decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+    @property
+    def subprotocol(self) -> str:
+        """The websocket subprotocol naming this codec, e.g. "mcp.msgpack.zlib\""""
+        return SUBPROTOCOL_PREFIX + ".".join(filter(None, [self.encoding, self.compression]))
+
+    def encode(self, message: Dict[str, Any]) -> Frame:
+        if self.encoding == "json":
+            return json.dumps(message)
+        body = msgpack.packb(message, use_bin_type=True)
+        if self.compression and len(body) >= self.compress_min_bytes:
+            if self.compression == "zstd":
+                return bytes([FLAG_ZSTD]) + self._zstd_compressor.compress(body)
+            return bytes([FLAG_ZLIB]) + zlib.compress(body, 6)
+        return bytes([FLAG_RAW]) + body
+
+    def decode(self, frame: Frame) -> Dict[str, Any]:
+        if isinstance(frame, str):
+            return json.loads(frame)
+        flag, body = frame[0], frame[1:]
+        if flag == FLAG_ZLIB:
+            body = zlib.decompress(body)
+        elif flag == FLAG_ZSTD:
+            if self._zstd_decompressor is None:
+                raise ValueError("Received a zstd frame but zstandard is not installed")
+            body = self._zstd_decompressor.decompress(body)
+        elif flag != FLAG_RAW:
+            raise ValueError(f"Unknown frame flag {flag}")
+        return msgpack.unpackb(body, raw=False)
+
+def parse_subprotocol(name: str) -> Optional[Tuple[str, Optional[str]]]:
+    """Split "mcp.<encoding>[.<compression>]" into its parts, or None if unsupported"""
+    if not name.startswith(SUBPROTOCOL_PREFIX):
+        return None
+    encoding, _, compression = name[len(SUBPROTOCOL_PREFIX):].partition(".")
+    if encoding == "json" and not compression:
+        return encoding, None
+    if encoding == "msgpack" and msgpack is not None and (not compression or compression in available_compressions()):
+        return encoding, compression or None
+    return None
+
+def offered_subprotocols(encoding: str = "json", compression: Optional[str] = None) -> List[str]:
+    """Subprotocols a client offers, best first, ending with plain JSON"""
+    offered = []
+    if encoding == "msgpack":
+        if compression:
+            offered.append(f"{SUBPROTOCOL_PREFIX}msgpack.{compression}")
+            if compression == "zstd":
+                offered.append(f"{SUBPROTOCOL_PREFIX}msgpack.zlib")
+        offered.append(f"{SUBPROTOCOL_PREFIX}msgpack")
+    offered.append(f"{SUBPROTOCOL_PREFIX}json")
+    return offered
+
+def negotiate(offered: List[str]) -> Tuple[Optional[str], WireCodec]:
+    """Pick the first offered subprotocol this side supports; JSON if none or none offered"""
+    for name in offered:
+        parsed = parse_subprotocol(name)
+        if parsed:
+            return name, WireCodec(*parsed)
+    return None, WireCodec("json")
+
+def codec_for_subprotocol(name: Optional[str]) -> WireCodec:
+    """The codec for the subprotocol a server accepted; JSON if it accepted none"""
+    parsed = parse_subprotocol(name) if name else None
+    return WireCodec(*parsed) if parsed else WireCodec("json")
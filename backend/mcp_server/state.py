@@ -0,0 +1,293 @@
+from abc import ABC, abstractmethod
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Dict, Any, Awaitable, Callable, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+RelayHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+class StateBackend(ABC):
+    """State shared by every MCP Server node: agent registry, per-agent task
+    table, shared context, node liveness and a relay for messages between nodes"""
+
+    def __init__(self, node_id: Optional[str] = None):
+        self.node_id = node_id or f"node_{uuid.uuid4().hex[:8]}"
+        self._relay_handler: Optional[RelayHandler] = None
+
+    async def initialize(self):
+        """Connect to the backing store and start receiving relayed messages"""
+        pass
+
+    async def close(self):
+        """Stop receiving relayed messages and release the backing store"""
+        pass
+
+    def set_relay_handler(self, handler: RelayHandler):
+        """Set the coroutine called with each message relayed to this node"""
+        self._relay_handler = handler
+
+    @abstractmethod
+    async def set_agent(self, agent_id: str, info: Dict[str, Any]):
+        """Create or update fields of an agent's registry entry"""
+        pass
+
+    @abstractmethod
+    async def remove_agent(self, agent_id: str, node_id: Optional[str] = None):
+        """Remove an agent's registry entry and task table, if `node_id` still owns it"""
+        pass
+
+    @abstractmethod
+    async def get_agents(self) -> Dict[str, Dict[str, Any]]:
+        """Get the registry entries of all connected agents"""
+        pass
+
+    @abstractmethod
+    async def set_agent_tasks(self, agent_id: str, task_ids: Iterable[str]):
+        """Replace the tasks recorded as outstanding on an agent"""
+        pass
+
+    @abstractmethod
+    async def add_agent_task(self, agent_id: str, task_id: str):
+        pass
+
+    @abstractmethod
+    async def remove_agent_task(self, agent_id: str, task_id: str):
+        pass
+
+    @abstractmethod
+    async def get_agent_tasks(self, agent_ids: Iterable[str]) -> Dict[str, List[str]]:
+        """Get the outstanding tasks of each agent"""
+        pass
+
+    @abstractmethod
+    async def get_context_entries(self) -> Dict[str, Dict[str, Any]]:
+        """Get every shared context entry, keyed by context key"""
+        pass
+
+    @abstractmethod
+    async def set_context_entries(self, entries: Dict[str, Dict[str, Any]]):
+        pass
+
+    @abstractmethod
+    async def delete_context_keys(self, keys: Iterable[str]):
+        pass
+
+    @abstractmethod
+    async def next_context_version(self, count: int = 1) -> int:
+        """Atomically reserve `count` context versions and return the last one"""
+        pass
+
+    @abstractmethod
+    async def context_version(self) -> int:
+        """Get the last context version handed out"""
+        pass
+
+    @abstractmethod
+    async def touch_node(self, ttl: float):
+        """Mark this node alive for the next `ttl` seconds"""
+        pass
+
+    @abstractmethod
+    async def live_nodes(self) -> Set[str]:
+        pass
+
+    @abstractmethod
+    async def relay(self, message: Dict[str, Any], node_id: Optional[str] = None):
+        """Send a message to one other node, or to every other node if `node_id` is None"""
+        pass
+
+class InMemoryStateBackend(StateBackend):
+    """State kept in this process, for a server running as a single worker"""
+
+    def __init__(self, node_id: Optional[str] = None):
+        super().__init__(node_id)
+        self._agents: Dict[str, Dict[str, Any]] = {}
+        self._agent_tasks: Dict[str, List[str]] = {}
+        self._context: Dict[str, Dict[str, Any]] = {}
+        self._context_version = 0
+
+    async def set_agent(self, agent_id: str, info: Dict[str, Any]):
+        self._agents.setdefault(agent_id, {}).update(info)
+
+    async def remove_agent(self, agent_id: str, node_id: Optional[str] = None):
+        entry = self._agents.get(agent_id)
+        if entry is not None and (node_id is None or entry.get("node") == node_id):
+            del self._agents[agent_id]
+            self._agent_tasks.pop(agent_id, None)
+
+    async def get_agents(self) -> Dict[str, Dict[str, Any]]:
+        return {agent_id: dict(info) for agent_id, info in self._agents.items()}
+
+    async def set_agent_tasks(self, agent_id: str, task_ids: Iterable[str]):
+        self._agent_tasks[agent_id] = list(dict.fromkeys(task_ids))
+
+    async def add_agent_task(self, agent_id: str, task_id: str):
+        tasks = self._agent_tasks.setdefault(agent_id, [])
+        if task_id not in tasks:
+            tasks.append(task_id)
+
+    async def remove_agent_task(self, agent_id: str, task_id: str):
+        tasks = self._agent_tasks.get(agent_id, [])
+        if task_id in tasks:
+            tasks.remove(task_id)
+
+    async def get_agent_tasks(self, agent_ids: Iterable[str]) -> Dict[str, List[str]]:
+        return {agent_id: list(self._agent_tasks.get(agent_id, [])) for agent_id in agent_ids}
+
+    async def get_context_entries(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self._context)
+
+    async def set_context_entries(self, entries: Dict[str, Dict[str, Any]]):
+        self._context.update(entries)
+
+    async def delete_context_keys(self, keys: Iterable[str]):
+        for key in keys:
+            self._context.pop(key, None)
+
+    async def next_context_version(self, count: int = 1) -> int:
+        self._context_version += count
+        return self._context_version
+
+    async def context_version(self) -> int:
+        return self._context_version
+
+    async def touch_node(self, ttl: float):
+        pass
+
+    async def live_nodes(self) -> Set[str]:
+        return {self.node_id}
+
+    async def relay(self, message: Dict[str, Any], node_id: Optional[str] = None):
+        # There are no other nodes to relay to
+        pass
+
+class RedisStateBackend(StateBackend):
+    """State kept in Redis so several workers or hosts can share it"""
+
+    PREFIX = "mcp:"
+
+    def __init__(self, redis, node_id: Optional[str] = None):
+        super().__init__(node_id)
+        self.redis = redis
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    def _key(self, *parts: str) -> str:
+        return self.PREFIX + ":".join(parts)
+
+    async def initialize(self):
+        self._pubsub = self.redis.pubsub()
+        await self._pubsub.subscribe(self._key("relay", "all"), self._key("relay", self.node_id))
+        self._listener = asyncio.create_task(self._listen())
+        logger.info(f"Redis state backend ready as {self.node_id}")
+
+    async def close(self):
+        if self._listener:
+            self._listener.cancel()
+        if self._pubsub:
+            await self._pubsub.close()
+        await self.redis.close()
+
+    async def _listen(self):
+        async for item in self._pubsub.listen():
+            if item.get("type") != "message":
+                continue
+            try:
+                message = json.loads(item["data"])
+                # Broadcasts reach the sender too; it already handled them locally
+                if message.get("origin") == self.node_id or self._relay_handler is None:
+                    continue
+                await self._relay_handler(message)
+            except Exception as e:
+                logger.error(f"Error handling relayed message: {e}")
+
+    async def set_agent(self, agent_id: str, info: Dict[str, Any]):
+        current = await self.redis.hget(self._key("agents"), agent_id)
+        entry = json.loads(current) if current else {}
+        entry.update(info)
+        await self.redis.hset(self._key("agents"), agent_id, json.dumps(entry))
+
+    async def remove_agent(self, agent_id: str, node_id: Optional[str] = None):
+        if node_id is not None:
+            current = await self.redis.hget(self._key("agents"), agent_id)
+            if current is None or json.loads(current).get("node") != node_id:
+                return
+        await self.redis.hdel(self._key("agents"), agent_id)
+        await self.redis.delete(self._key("agent_tasks", agent_id))
+
+    async def get_agents(self) -> Dict[str, Dict[str, Any]]:
+        entries = await self.redis.hgetall(self._key("agents"))
+        return {agent_id: json.loads(entry) for agent_id, entry in entries.items()}
+
+    async def set_agent_tasks(self, agent_id: str, task_ids: Iterable[str]):
+        key = self._key("agent_tasks", agent_id)
+        await self.redis.delete(key)
+        task_ids = list(task_ids)
+        if task_ids:
+            await self.redis.sadd(key, *task_ids)
+
+    async def add_agent_task(self, agent_id: str, task_id: str):
+        await self.redis.sadd(self._key("agent_tasks", agent_id), task_id)
+
+    async def remove_agent_task(self, agent_id: str, task_id: str):
+        await self.redis.srem(self._key("agent_tasks", agent_id), task_id)
+
+    async def get_agent_tasks(self, agent_ids: Iterable[str]) -> Dict[str, List[str]]:
+        return {
+            agent_id: sorted(await self.redis.smembers(self._key("agent_tasks", agent_id)))
+            for agent_id in agent_ids
+        }
+
+    async def get_context_entries(self) -> Dict[str, Dict[str, Any]]:
+        entries = await self.redis.hgetall(self._key("context"))
+        return {key: json.loads(entry) for key, entry in entries.items()}
+
+    async def set_context_entries(self, entries: Dict[str, Dict[str, Any]]):
+        if entries:
+            await self.redis.hset(
+                self._key("context"),
+                mapping={key: json.dumps(entry) for key, entry in entries.items()},
+            )
+
+    async def delete_context_keys(self, keys: Iterable[str]):
+        keys = list(keys)
+        if keys:
+            await self.redis.hdel(self._key("context"), *keys)
+
+    async def next_context_version(self, count: int = 1) -> int:
+        return await self.redis.incrby(self._key("context_version"), count)
+
+    async def context_version(self) -> int:
+        return int(await self.redis.get(self._key("context_version")) or 0)
+
+    async def touch_node(self, ttl: float):
+        await self.redis.hset(self._key("nodes"), self.node_id, str(time.time() + ttl))
+
+    async def live_nodes(self) -> Set[str]:
+        now = time.time()
+        nodes = await self.redis.hgetall(self._key("nodes"))
+        return {node for node, expires_at in nodes.items() if float(expires_at) > now}
+
+    async def relay(self, message: Dict[str, Any], node_id: Optional[str] = None):
+        channel = self._key("relay", node_id or "all")
+        await self.redis.publish(channel, json.dumps({**message, "origin": self.node_id}))
+
+def create_state_backend(url: Optional[str] = None) -> StateBackend:
+    """Create a state backend based on environment configuration"""
+    url = url or os.getenv("STATE_BACKEND_URL", "memory://")
+
+    if url.startswith("memory://"):
+        return InMemoryStateBackend()
+    elif url.startswith(("redis://", "rediss://")):
+        import redis.asyncio as redis
+        return RedisStateBackend(redis.from_url(url, decode_responses=True))
+    elif url.startswith("fakeredis://"):
+        from .fake_redis import FakeRedis
+        return RedisStateBackend(FakeRedis())
+    else:
+        raise ValueError(f"Unsupported state backend URL: {url}")
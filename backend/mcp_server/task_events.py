@@ -0,0 +1,42 @@
+import asyncio
+import logging
+from typing import Dict, Any, AsyncIterator, Set
+
+logger = logging.getLogger(__name__)
+
+class TaskEventHub:
+    """Relay progress and completion events of tasks to API clients watching them"""
+
+    FINAL_EVENTS = ("completed", "failed", "expired", "cancelled")
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def publish(self, task_id: str, event: Dict[str, Any]):
+        """Deliver an event to every client watching a task"""
+        for queue in self._subscribers.get(task_id, ()):
+            queue.put_nowait(event)
+
+    def subscribe(self, task_id: str) -> asyncio.Queue:
+        """Start collecting events for a task"""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(task_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(task_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[task_id]
+
+    async def events(self, task_id: str, queue: asyncio.Queue) -> AsyncIterator[Dict[str, Any]]:
+        """Yield collected events until the task reaches a final state"""
+        try:
+            while True:
+                event = await queue.get()
+                yield event
+                if event["event"] in self.FINAL_EVENTS:
+                    break
+        finally:
+            self.unsubscribe(task_id, queue)
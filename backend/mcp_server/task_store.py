@@ -0,0 +1,569 @@
+from abc import ABC, abstractmethod
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class TaskStatus:
+    QUEUED = "queued"
+    DISPATCHED = "dispatched"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    # Deadline passed before an agent started the task
+    EXPIRED = "expired"
+    CANCELLED = "cancelled"
+    # Workflow records are running until their last step finishes; they are never dispatched
+    RUNNING = "running"
+    # Reported for workflow steps that have no task yet, never stored
+    WAITING = "waiting"
+    SKIPPED = "skipped"
+
+    PENDING = (QUEUED, DISPATCHED)
+    FINAL = (COMPLETED, FAILED, EXPIRED, CANCELLED)
+    UNSUCCESSFUL = (FAILED, EXPIRED, CANCELLED)
+
+class TaskPriority:
+    """Priority classes, as a head start in seconds over bulk tasks in the queue
+
+    Queued tasks are dispatched in order of created_at minus their boost, so an
+    interactive task overtakes bulk work queued up to BOOSTS[INTERACTIVE]
+    seconds before it, while bulk tasks that waited longer still go first and
+    cannot starve.
+    """
+    INTERACTIVE = "interactive"
+    NORMAL = "normal"
+    BULK = "bulk"
+
+    BOOSTS = {
+        INTERACTIVE: float(os.getenv("PRIORITY_BOOST_INTERACTIVE_SECONDS", "600")),
+        NORMAL: float(os.getenv("PRIORITY_BOOST_NORMAL_SECONDS", "60")),
+        BULK: 0.0,
+    }
+
+    @classmethod
+    def sort_key(cls, priority: str, created_at: float) -> float:
+        if priority not in cls.BOOSTS:
+            raise ValueError(f"Unknown task priority: {priority}")
+        return created_at - cls.BOOSTS[priority]
+
+class TaskStore(ABC):
+    """Persistent queue of tasks and their results"""
+
+    async def initialize(self):
+        """Prepare the backing storage"""
+        pass
+
+    async def close(self):
+        """Release the backing storage"""
+        pass
+
+    @abstractmethod
+    async def enqueue_many(self, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Persist new tasks in the queued state and return their records"""
+        pass
+
+    @abstractmethod
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Get a task record by id"""
+        pass
+
+    @abstractmethod
+    async def update(self, task_id: str, **fields) -> Optional[Dict[str, Any]]:
+        """Update fields of a task record and return the new record"""
+        pass
+
+    @abstractmethod
+    async def finish(self, task_id: str, status: str, **fields) -> Optional[Dict[str, Any]]:
+        """Atomically move an unfinished task to a final status and return the new record
+
+        Returns None if the task is missing or already final, e.g. cancelled
+        while its agent was completing it, so only one outcome is recorded.
+        """
+        pass
+
+    @abstractmethod
+    async def pending_for_agent(self, agent_id: str) -> List[Dict[str, Any]]:
+        """Get unfinished tasks targeted at or dispatched to an agent"""
+        pass
+
+    @abstractmethod
+    async def list_queued(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Get queued tasks in dispatch order: oldest first, after priority boosts"""
+        pass
+
+    @abstractmethod
+    async def count_queued(self) -> int:
+        """Get the number of tasks waiting for an agent"""
+        pass
+
+    async def enqueue(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """Persist a single new task"""
+        records = await self.enqueue_many([task])
+        return records[0]
+
+    @abstractmethod
+    async def claim(self, task_id: str, agent_id: str) -> bool:
+        """Atomically move a queued task to dispatched; False if another node got it first"""
+        pass
+
+    async def mark_dispatched(self, task_id: str, agent_id: str) -> Optional[Dict[str, Any]]:
+        """Record that a task was sent to an agent"""
+        record = await self.get(task_id)
+        if not record or record["status"] in TaskStatus.FINAL:
+            return record
+        return await self.update(
+            task_id,
+            status=TaskStatus.DISPATCHED,
+            assigned_agent=agent_id,
+            attempts=record["attempts"] + 1,
+        )
+
+    async def requeue_agent_tasks(self, agent_id: str) -> int:
+        """Put tasks dispatched to an agent back in the queue, e.g. when the agent died"""
+        requeued = 0
+        for record in await self.pending_for_agent(agent_id):
+            if record["status"] == TaskStatus.DISPATCHED and record["assigned_agent"] == agent_id:
+                await self.update(record["task_id"], status=TaskStatus.QUEUED, assigned_agent=None)
+                requeued += 1
+        return requeued
+
+    async def complete(self, task_id: str, result: Any) -> Optional[Dict[str, Any]]:
+        """Store the result of a finished task; None if it was already final"""
+        return await self.finish(task_id, TaskStatus.COMPLETED, result=result)
+
+    async def fail(self, task_id: str, error: str) -> Optional[Dict[str, Any]]:
+        """Store the error of a failed task; None if it was already final"""
+        return await self.finish(task_id, TaskStatus.FAILED, error=error)
+
+    async def expire(self, task_id: str, error: str = "Deadline exceeded") -> Optional[Dict[str, Any]]:
+        """Record that a task's deadline passed before it ran; None if it was already final"""
+        return await self.finish(task_id, TaskStatus.EXPIRED, error=error)
+
+    async def cancel(self, task_id: str, error: str = "Cancelled") -> Optional[Dict[str, Any]]:
+        """Record that a task was cancelled by its client; None if it was already final"""
+        return await self.finish(task_id, TaskStatus.CANCELLED, error=error)
+
+    @staticmethod
+    def new_record(task: Dict[str, Any]) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "task_id": task["task_id"],
+            "type": task.get("type"),
+            "target_agent": task.get("target_agent"),
+            "assigned_agent": None,
+            "status": TaskStatus.QUEUED,
+            "task": task,
+            "result": None,
+            "error": None,
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+            "sort_key": TaskPriority.sort_key(task.get("priority", TaskPriority.NORMAL), now),
+        }
+
+class SQLiteTaskStore(TaskStore):
+    """Task store backed by a local SQLite database"""
+
+    COLUMNS = (
+        "task_id", "type", "target_agent", "assigned_agent", "status",
+        "task", "result", "error", "attempts", "created_at", "updated_at", "sort_key",
+    )
+    JSON_COLUMNS = ("task", "result")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = asyncio.Lock()
+
+    async def initialize(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        await self._execute("PRAGMA journal_mode=WAL")
+        await self._execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                type TEXT,
+                target_agent TEXT,
+                assigned_agent TEXT,
+                status TEXT NOT NULL,
+                task TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                sort_key REAL
+            )
+        """)
+        # Databases created before priorities existed lack the sort_key column
+        columns = {row["name"] for row in await self._execute("PRAGMA table_info(tasks)")}
+        if "sort_key" not in columns:
+            await self._execute("ALTER TABLE tasks ADD COLUMN sort_key REAL")
+            await self._execute("UPDATE tasks SET sort_key = created_at")
+        await self._execute("DROP INDEX IF EXISTS idx_tasks_status")
+        await self._execute("CREATE INDEX IF NOT EXISTS idx_tasks_queue ON tasks (status, sort_key)")
+        await self._execute("CREATE INDEX IF NOT EXISTS idx_tasks_agent ON tasks (assigned_agent, status)")
+        logger.info(f"SQLite task store ready at {self.path}")
+
+    async def close(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    async def _execute(self, sql: str, params: tuple = (), many: bool = False) -> List[sqlite3.Row]:
+        def run():
+            try:
+                if many:
+                    self._conn.executemany(sql, params)
+                    rows = []
+                else:
+                    rows = self._conn.execute(sql, params).fetchall()
+            except sqlite3.Error:
+                # Drop the rows a failed batch inserted before the error
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+            return rows
+
+        async with self._lock:
+            return await asyncio.to_thread(run)
+
+    def _to_row(self, record: Dict[str, Any]) -> tuple:
+        return tuple(
+            json.dumps(record[c]) if c in self.JSON_COLUMNS else record[c]
+            for c in self.COLUMNS
+        )
+
+    def _from_row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        record = dict(row)
+        for c in self.JSON_COLUMNS:
+            if record[c] is not None:
+                record[c] = json.loads(record[c])
+        return record
+
+    async def enqueue_many(self, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        records = [self.new_record(task) for task in tasks]
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        await self._execute(
+            f"INSERT INTO tasks ({', '.join(self.COLUMNS)}) VALUES ({placeholders})",
+            [self._to_row(r) for r in records],
+            many=True,
+        )
+        return records
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        rows = await self._execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,))
+        return self._from_row(rows[0]) if rows else None
+
+    async def update(self, task_id: str, **fields) -> Optional[Dict[str, Any]]:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        values = tuple(json.dumps(v) if k in self.JSON_COLUMNS else v for k, v in fields.items())
+        await self._execute(f"UPDATE tasks SET {assignments} WHERE task_id = ?", values + (task_id,))
+        return await self.get(task_id)
+
+    async def finish(self, task_id: str, status: str, **fields) -> Optional[Dict[str, Any]]:
+        fields.update(status=status, updated_at=time.time())
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        values = tuple(json.dumps(v) if k in self.JSON_COLUMNS else v for k, v in fields.items())
+        final = ", ".join("?" for _ in TaskStatus.FINAL)
+        rows = await self._execute(
+            f"UPDATE tasks SET {assignments} WHERE task_id = ? AND status NOT IN ({final}) RETURNING *",
+            values + (task_id,) + TaskStatus.FINAL,
+        )
+        return self._from_row(rows[0]) if rows else None
+
+    async def claim(self, task_id: str, agent_id: str) -> bool:
+        rows = await self._execute(
+            """
+            UPDATE tasks SET status = ?, assigned_agent = ?, attempts = attempts + 1, updated_at = ?
+            WHERE task_id = ? AND status = ?
+            RETURNING task_id
+            """,
+            (TaskStatus.DISPATCHED, agent_id, time.time(), task_id, TaskStatus.QUEUED),
+        )
+        return bool(rows)
+
+    async def pending_for_agent(self, agent_id: str) -> List[Dict[str, Any]]:
+        rows = await self._execute(
+            """
+            SELECT * FROM tasks
+            WHERE status IN (?, ?) AND (assigned_agent = ? OR (assigned_agent IS NULL AND target_agent = ?))
+            ORDER BY created_at
+            """,
+            (TaskStatus.QUEUED, TaskStatus.DISPATCHED, agent_id, agent_id),
+        )
+        return [self._from_row(r) for r in rows]
+
+    async def list_queued(self, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = await self._execute(
+            "SELECT * FROM tasks WHERE status = ? ORDER BY sort_key LIMIT ?",
+            (TaskStatus.QUEUED, limit),
+        )
+        return [self._from_row(r) for r in rows]
+
+    async def count_queued(self) -> int:
+        rows = await self._execute("SELECT COUNT(*) FROM tasks WHERE status = ?", (TaskStatus.QUEUED,))
+        return rows[0][0]
+
+class RedisTaskStore(TaskStore):
+    """Task store backed by Redis hashes and sorted sets"""
+
+    QUEUED_KEY = "tasks:queued"
+
+    def __init__(self, redis):
+        self.redis = redis
+
+    async def close(self):
+        await self.redis.close()
+
+    @staticmethod
+    def _task_key(task_id: str) -> str:
+        return f"task:{task_id}"
+
+    @staticmethod
+    def _agent_key(agent_id: str) -> str:
+        return f"tasks:agent:{agent_id}"
+
+    @staticmethod
+    def _final_key(task_id: str) -> str:
+        return f"task:{task_id}:final"
+
+    async def enqueue_many(self, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        records = [self.new_record(task) for task in tasks]
+        # SET NX rejects ids that already exist, like the SQL stores' primary key
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for record in records:
+                pipe.set(self._task_key(record["task_id"]), json.dumps(record), nx=True)
+            created = await pipe.execute()
+        if not all(created):
+            # Roll back only the records this call created, then reject the batch
+            ours = [self._task_key(r["task_id"]) for r, ok in zip(records, created) if ok]
+            if ours:
+                await self.redis.delete(*ours)
+            existing = [r["task_id"] for r, ok in zip(records, created) if not ok]
+            raise ValueError(f"Tasks already exist: {', '.join(existing)}")
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for record in records:
+                pipe.zadd(self.QUEUED_KEY, {record["task_id"]: record["sort_key"]})
+                if record["target_agent"]:
+                    pipe.sadd(self._agent_key(record["target_agent"]), record["task_id"])
+            await pipe.execute()
+        return records
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        data = await self.redis.get(self._task_key(task_id))
+        return json.loads(data) if data else None
+
+    async def update(self, task_id: str, **fields) -> Optional[Dict[str, Any]]:
+        record = await self.get(task_id)
+        if record is None:
+            return None
+        previous_agent = record["assigned_agent"] or record["target_agent"]
+        record.update(fields, updated_at=time.time())
+        agent = record["assigned_agent"] or record["target_agent"]
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self._task_key(task_id), json.dumps(record))
+            if record["status"] == TaskStatus.QUEUED:
+                pipe.zadd(self.QUEUED_KEY, {task_id: record.get("sort_key", record["created_at"])})
+            else:
+                pipe.zrem(self.QUEUED_KEY, task_id)
+            if previous_agent and previous_agent != agent:
+                pipe.srem(self._agent_key(previous_agent), task_id)
+            if agent:
+                if record["status"] in TaskStatus.PENDING:
+                    pipe.sadd(self._agent_key(agent), task_id)
+                else:
+                    pipe.srem(self._agent_key(agent), task_id)
+            await pipe.execute()
+        return record
+
+    async def finish(self, task_id: str, status: str, **fields) -> Optional[Dict[str, Any]]:
+        record = await self.get(task_id)
+        if record is None or record["status"] in TaskStatus.FINAL:
+            return None
+        # Setting the final marker is the atomic step: only the first final status is written
+        if not await self.redis.set(self._final_key(task_id), status, nx=True):
+            return None
+        return await self.update(task_id, status=status, **fields)
+
+    async def claim(self, task_id: str, agent_id: str) -> bool:
+        # Removing the task from the queued set is the atomic step
+        if not await self.redis.zrem(self.QUEUED_KEY, task_id):
+            return False
+        record = await self.get(task_id)
+        await self.update(
+            task_id,
+            status=TaskStatus.DISPATCHED,
+            assigned_agent=agent_id,
+            attempts=record["attempts"] + 1,
+        )
+        return True
+
+    async def _get_many(self, task_ids: List[str]) -> List[Dict[str, Any]]:
+        if not task_ids:
+            return []
+        values = await self.redis.mget([self._task_key(t) for t in task_ids])
+        return [json.loads(v) for v in values if v]
+
+    async def pending_for_agent(self, agent_id: str) -> List[Dict[str, Any]]:
+        records = await self._get_many(list(await self.redis.smembers(self._agent_key(agent_id))))
+        return sorted(
+            (r for r in records if r["status"] in TaskStatus.PENDING),
+            key=lambda r: r["created_at"],
+        )
+
+    async def list_queued(self, limit: int = 100) -> List[Dict[str, Any]]:
+        task_ids = await self.redis.zrange(self.QUEUED_KEY, 0, limit - 1)
+        return await self._get_many(task_ids)
+
+    async def count_queued(self) -> int:
+        return await self.redis.zcard(self.QUEUED_KEY)
+
+class PostgresTaskStore(TaskStore):
+    """Task store backed by a PostgreSQL table"""
+
+    COLUMNS = SQLiteTaskStore.COLUMNS
+    JSON_COLUMNS = SQLiteTaskStore.JSON_COLUMNS
+
+    def __init__(self, url: str):
+        self.url = url
+        self.pool = None
+
+    async def initialize(self):
+        import asyncpg
+        self.pool = await asyncpg.create_pool(self.url)
+        async with self.pool.acquire() as conn:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    task_id TEXT PRIMARY KEY,
+                    type TEXT,
+                    target_agent TEXT,
+                    assigned_agent TEXT,
+                    status TEXT NOT NULL,
+                    task JSONB NOT NULL,
+                    result JSONB,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at DOUBLE PRECISION NOT NULL,
+                    updated_at DOUBLE PRECISION NOT NULL,
+                    sort_key DOUBLE PRECISION
+                )
+            """)
+            await conn.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS sort_key DOUBLE PRECISION")
+            await conn.execute("UPDATE tasks SET sort_key = created_at WHERE sort_key IS NULL")
+            await conn.execute("DROP INDEX IF EXISTS idx_tasks_status")
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_queue ON tasks (status, sort_key)")
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_agent ON tasks (assigned_agent, status)")
+        logger.info("Postgres task store ready")
+
+    async def close(self):
+        if self.pool:
+            await self.pool.close()
+
+    def _to_row(self, record: Dict[str, Any]) -> tuple:
+        return tuple(
+            json.dumps(record[c]) if c in self.JSON_COLUMNS else record[c]
+            for c in self.COLUMNS
+        )
+
+    def _from_row(self, row) -> Dict[str, Any]:
+        record = dict(row)
+        for c in self.JSON_COLUMNS:
+            if record[c] is not None:
+                record[c] = json.loads(record[c])
+        return record
+
+    async def enqueue_many(self, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        records = [self.new_record(task) for task in tasks]
+        placeholders = ", ".join(f"${i + 1}" for i in range(len(self.COLUMNS)))
+        async with self.pool.acquire() as conn:
+            await conn.executemany(
+                f"INSERT INTO tasks ({', '.join(self.COLUMNS)}) VALUES ({placeholders})",
+                [self._to_row(r) for r in records],
+            )
+        return records
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = await self.pool.fetchrow("SELECT * FROM tasks WHERE task_id = $1", task_id)
+        return self._from_row(row) if row else None
+
+    async def update(self, task_id: str, **fields) -> Optional[Dict[str, Any]]:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{k} = ${i + 1}" for i, k in enumerate(fields))
+        values = [json.dumps(v) if k in self.JSON_COLUMNS else v for k, v in fields.items()]
+        row = await self.pool.fetchrow(
+            f"UPDATE tasks SET {assignments} WHERE task_id = ${len(values) + 1} RETURNING *",
+            *values, task_id,
+        )
+        return self._from_row(row) if row else None
+
+    async def finish(self, task_id: str, status: str, **fields) -> Optional[Dict[str, Any]]:
+        fields.update(status=status, updated_at=time.time())
+        assignments = ", ".join(f"{k} = ${i + 1}" for i, k in enumerate(fields))
+        values = [json.dumps(v) if k in self.JSON_COLUMNS else v for k, v in fields.items()]
+        row = await self.pool.fetchrow(
+            f"""
+            UPDATE tasks SET {assignments}
+            WHERE task_id = ${len(values) + 1} AND status <> ALL(${len(values) + 2}::text[])
+            RETURNING *
+            """,
+            *values, task_id, list(TaskStatus.FINAL),
+        )
+        return self._from_row(row) if row else None
+
+    async def claim(self, task_id: str, agent_id: str) -> bool:
+        row = await self.pool.fetchrow(
+            """
+            UPDATE tasks SET status = $1, assigned_agent = $2, attempts = attempts + 1, updated_at = $3
+            WHERE task_id = $4 AND status = $5
+            RETURNING task_id
+            """,
+            TaskStatus.DISPATCHED, agent_id, time.time(), task_id, TaskStatus.QUEUED,
+        )
+        return row is not None
+
+    async def pending_for_agent(self, agent_id: str) -> List[Dict[str, Any]]:
+        rows = await self.pool.fetch(
+            """
+            SELECT * FROM tasks
+            WHERE status = ANY($1::text[]) AND (assigned_agent = $2 OR (assigned_agent IS NULL AND target_agent = $2))
+            ORDER BY created_at
+            """,
+            list(TaskStatus.PENDING), agent_id,
+        )
+        return [self._from_row(r) for r in rows]
+
+    async def list_queued(self, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = await self.pool.fetch(
+            "SELECT * FROM tasks WHERE status = $1 ORDER BY sort_key LIMIT $2",
+            TaskStatus.QUEUED, limit,
+        )
+        return [self._from_row(r) for r in rows]
+
+    async def count_queued(self) -> int:
+        return await self.pool.fetchval("SELECT COUNT(*) FROM tasks WHERE status = $1", TaskStatus.QUEUED)
+
+def create_task_store(url: Optional[str] = None) -> TaskStore:
+    """Create a task store based on environment configuration"""
+    url = url or os.getenv("TASK_STORE_URL", "sqlite:///tasks.db")
+
+    if url.startswith("sqlite:///"):
+        return SQLiteTaskStore(url[len("sqlite:///"):] or ":memory:")
+    elif url.startswith(("redis://", "rediss://")):
+        import redis.asyncio as redis
+        return RedisTaskStore(redis.from_url(url, decode_responses=True))
+    elif url.startswith("fakeredis://"):
+        from .fake_redis import FakeRedis
+        return RedisTaskStore(FakeRedis())
+    elif url.startswith(("postgres://", "postgresql://")):
+        return PostgresTaskStore(url)
+    else:
+        raise ValueError(f"Unsupported task store URL: {url}")
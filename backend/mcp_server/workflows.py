@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import re
+import uuid
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+from .task_store import TaskStore, TaskPriority, TaskStatus
+
+logger = logging.getLogger(__name__)
+
+STEP_ID_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+# A string value "$steps.<step>.result[.<key>...]" is replaced by that step's output
+STEP_REF_RE = re.compile(r"^\$steps\.([A-Za-z0-9_-]+)\.result((?:\.[^.]+)*)$")
+
+class WorkflowError(ValueError):
+    """Raised for an invalid workflow definition"""
+    pass
+
+def _references(value: Any) -> List[str]:
+    """Get the steps whose output a step's data refers to"""
+    if isinstance(value, str):
+        match = STEP_REF_RE.match(value)
+        return [match.group(1)] if match else []
+    if isinstance(value, dict):
+        return [ref for v in value.values() for ref in _references(v)]
+    if isinstance(value, list):
+        return [ref for v in value for ref in _references(v)]
+    return []
+
+def resolve_references(value: Any, results: Dict[str, Any]) -> Any:
+    """Replace step references in a step's data with the outputs of finished steps"""
+    if isinstance(value, str):
+        match = STEP_REF_RE.match(value)
+        if not match:
+            return value
+        resolved = results[match.group(1)]
+        for key in filter(None, match.group(2).split(".")):
+            resolved = resolved[int(key)] if isinstance(resolved, list) else resolved[key]
+        return resolved
+    if isinstance(value, dict):
+        return {k: resolve_references(v, results) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_references(v, results) for v in value]
+    return value
+
+def parse_workflow(definition: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Validate a workflow definition and return its steps in dependency order
+
+    Steps depend on the steps listed in `depends_on` and on any step whose
+    output their data refers to.
+    """
+    steps = definition.get("steps")
+    if not isinstance(steps, list) or not steps:
+        raise WorkflowError("A workflow needs a non-empty list of steps")
+
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for step in steps:
+        step_id = step.get("id")
+        if not isinstance(step_id, str) or not STEP_ID_RE.match(step_id):
+            raise WorkflowError(f"Invalid step id: {step_id!r}")
+        if step_id in by_id:
+            raise WorkflowError(f"Duplicate step id: {step_id}")
+        if not step.get("type"):
+            raise WorkflowError(f"Step {step_id} has no task type")
+        data = step.get("data", {})
+        by_id[step_id] = {
+            "id": step_id,
+            "type": step["type"],
+            "data": data,
+            "depends_on": list(dict.fromkeys(list(step.get("depends_on", [])) + _references(data))),
+        }
+        if step.get("target_agent"):
+            by_id[step_id]["target_agent"] = step["target_agent"]
+
+    for step in by_id.values():
+        unknown = [dep for dep in step["depends_on"] if dep not in by_id]
+        if unknown:
+            raise WorkflowError(f"Step {step['id']} depends on unknown steps: {', '.join(unknown)}")
+
+    # Kahn's algorithm, keeping the submitted order among ready steps
+    ordered = []
+    remaining = dict(by_id)
+    while remaining:
+        ready = [s for s in remaining.values() if all(dep not in remaining for dep in s["depends_on"])]
+        if not ready:
+            raise WorkflowError(f"Steps form a cycle: {', '.join(remaining)}")
+        for step in ready:
+            ordered.append(remaining.pop(step["id"]))
+    return ordered
+
+class WorkflowEngine:
+    """Run workflows: DAGs of tasks whose steps start as soon as their dependencies complete
+
+    A workflow is a task record of type "workflow" that is never dispatched.
+    Each step becomes an ordinary task with the id "<workflow_id>.<step_id>",
+    so step state lives in the task store and any node can advance a workflow
+    when one of its steps finishes.
+    """
+
+    def __init__(
+        self,
+        task_store: TaskStore,
+        dispatch: Callable[[], Awaitable[int]],
+        publish_event: Callable[[str, Dict[str, Any]], Awaitable[None]],
+    ):
+        self.task_store = task_store
+        self.dispatch = dispatch
+        self.publish_event = publish_event
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def step_task_id(workflow_id: str, step_id: str) -> str:
+        return f"{workflow_id}.{step_id}"
+
+    async def submit(self, definition: Dict[str, Any]) -> Dict[str, Any]:
+        """Persist a workflow, queue its first steps and return its status"""
+        steps = parse_workflow(definition)
+        workflow_id = f"workflow_{uuid.uuid4().hex}"
+        await self.task_store.enqueue({
+            "task_id": workflow_id,
+            "type": "workflow",
+            "steps": steps,
+            "priority": definition.get("priority", TaskPriority.NORMAL),
+            "deadline": definition.get("deadline"),
+            "traceparent": definition.get("traceparent"),
+        })
+        await self.task_store.update(workflow_id, status=TaskStatus.RUNNING)
+        await self.advance(workflow_id)
+        await self.dispatch()
+        return await self.status(workflow_id)
+
+    async def step_finished(self, record: Dict[str, Any]):
+        """Advance the workflow a finished step belongs to"""
+        task = record["task"]
+        await self.publish_event(task["workflow_id"], {
+            "event": "step",
+            "task_id": task["workflow_id"],
+            "step": task["workflow_step"],
+            "status": record["status"],
+        })
+        await self.advance(task["workflow_id"])
+
+    async def _step_records(self, workflow: Dict[str, Any]) -> Dict[str, Optional[Dict[str, Any]]]:
+        return {
+            step["id"]: await self.task_store.get(self.step_task_id(workflow["task_id"], step["id"]))
+            for step in workflow["task"]["steps"]
+        }
+
+    @staticmethod
+    def _step_states(steps: List[Dict[str, Any]], records: Dict[str, Optional[Dict[str, Any]]]) -> Dict[str, str]:
+        """Status of each step; steps not yet created are "waiting" or, behind a failure, "skipped\""""
+        states = {}
+        for step in steps:
+            record = records[step["id"]]
+            if record is not None:
+                states[step["id"]] = record["status"]
+            elif any(states[dep] in TaskStatus.UNSUCCESSFUL + (TaskStatus.SKIPPED,) for dep in step["depends_on"]):
+                states[step["id"]] = TaskStatus.SKIPPED
+            else:
+                states[step["id"]] = TaskStatus.WAITING
+        return states
+
+    async def advance(self, workflow_id: str) -> int:
+        """Queue every step whose dependencies have completed, and finish the workflow
+        once no step can run any more; returns the number of steps queued"""
+        async with self._lock:
+            workflow = await self.task_store.get(workflow_id)
+            if workflow is None or workflow["status"] != TaskStatus.RUNNING:
+                return 0
+            steps = workflow["task"]["steps"]
+            records = await self._step_records(workflow)
+            states = self._step_states(steps, records)
+            results = {
+                step_id: record["result"] for step_id, record in records.items()
+                if record is not None and record["status"] == TaskStatus.COMPLETED
+            }
+
+            ready = []
+            for step in steps:
+                if states[step["id"]] == TaskStatus.WAITING and all(dep in results for dep in step["depends_on"]):
+                    try:
+                        data = resolve_references(step["data"], results)
+                    except (KeyError, IndexError, TypeError, ValueError) as e:
+                        error = f"step {step['id']} refers to missing output {e}"
+                        # A workflow cancelled meanwhile stays cancelled
+                        if await self.task_store.finish(workflow_id, TaskStatus.FAILED, result={"steps": results}, error=error):
+                            await self.publish_event(workflow_id, {"event": "failed", "task_id": workflow_id, "error": error})
+                        return 0
+                    task = {
+                        "task_id": self.step_task_id(workflow_id, step["id"]),
+                        "type": step["type"],
+                        "data": data,
+                        "workflow_id": workflow_id,
+                        "workflow_step": step["id"],
+                        # Steps inherit the workflow's priority and deadline
+                        "priority": workflow["task"].get("priority", TaskPriority.NORMAL),
+                    }
+                    if workflow["task"].get("deadline"):
+                        task["deadline"] = workflow["task"]["deadline"]
+                    if workflow["task"].get("traceparent"):
+                        task["traceparent"] = workflow["task"]["traceparent"]
+                    if step.get("target_agent"):
+                        task["target_agent"] = step["target_agent"]
+                    ready.append(task)
+            if ready:
+                try:
+                    await self.task_store.enqueue_many(ready)
+                except Exception as e:
+                    # Another node queued these steps first
+                    logger.warning(f"Could not queue steps of workflow {workflow_id}: {e}")
+                    return 0
+                logger.info(f"Workflow {workflow_id} queued steps {', '.join(t['workflow_step'] for t in ready)}")
+                return len(ready)
+
+            if any(state in TaskStatus.PENDING or state == TaskStatus.WAITING for state in states.values()):
+                return 0
+
+            failed = [step_id for step_id, state in states.items() if state in TaskStatus.UNSUCCESSFUL]
+            if failed:
+                error = "; ".join(f"step {step_id} {states[step_id]}: {records[step_id]['error']}" for step_id in failed)
+                if await self.task_store.finish(workflow_id, TaskStatus.FAILED, result={"steps": results}, error=error):
+                    await self.publish_event(workflow_id, {"event": "failed", "task_id": workflow_id, "error": error})
+            elif await self.task_store.finish(workflow_id, TaskStatus.COMPLETED, result={"steps": results}):
+                await self.publish_event(workflow_id, {"event": "completed", "task_id": workflow_id, "result": {"steps": results}})
+            logger.info(f"Workflow {workflow_id} finished")
+            return 0
+
+    async def status(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        """Get a workflow's status with the state, task id and outcome of each step"""
+        workflow = await self.task_store.get(workflow_id)
+        if workflow is None or workflow["type"] != "workflow":
+            return None
+        records = await self._step_records(workflow)
+        states = self._step_states(workflow["task"]["steps"], records)
+        return {
+            "workflow_id": workflow_id,
+            "status": workflow["status"],
+            "error": workflow["error"],
+            "steps": {
+                step_id: {
+                    "status": state,
+                    "task_id": records[step_id]["task_id"] if records[step_id] else None,
+                    "assigned_agent": records[step_id]["assigned_agent"] if records[step_id] else None,
+                    "result": records[step_id]["result"] if records[step_id] else None,
+                    "error": records[step_id]["error"] if records[step_id] else None,
+                }
+                for step_id, state in states.items()
+            },
+        }
@@ -1,49 +1,15 @@
-import asyncio
-import os
-from dotenv import load_dotenv
-from agents.content_agent import ContentAgent
-import logging
-
-# Load environment variables
-load_dotenv()
+"""Start the SEO agents; kept for scripts that run it directly
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+The agents now run under backend/supervisor.py, which starts AGENT_PROCESSES
+worker processes of AGENTS_PER_PROCESS agents each and restarts them if they
+crash. Arguments are passed on to the supervisor.
+"""
+import os
+import sys
 
-async def main():
-    # Get configuration from environment variables
-    mcp_server_url = os.getenv("MCP_SERVER_URL", "ws://localhost:8000")
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    
-    if not openai_api_key:
-        raise ValueError("OPENAI_API_KEY environment variable is required")
-    
-    # Initialize agents
-    content_agent = ContentAgent(
-        agent_id="content_agent_1",
-        mcp_server_url=mcp_server_url,
-        openai_api_key=openai_api_key
-    )
-    
-    # Connect agents to MCP Server
-    try:
-        await content_agent.connect()
-        
-        # Keep the script running
-        while True:
-            await asyncio.sleep(1)
-            
-    except KeyboardInterrupt:
-        logger.info("Shutting down agents...")
-    except Exception as e:
-        logger.error(f"Error running agents: {e}")
-    finally:
-        # Disconnect agents
-        await content_agent.disconnect()
+# The backend is a package; the supervisor runs from the repository root
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    os.chdir(ROOT_DIR)
+    os.execv(sys.executable, [sys.executable, "-m", "backend.supervisor", *sys.argv[1:]])
@@ -1,17 +1,32 @@
 import subprocess
 import sys
 import os
+import time
 from dotenv import load_dotenv
 
-def start_mcp_server():
+# The backend is a package; its services run from the repository root
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def start_mcp_server() -> subprocess.Popen:
     """Start the MCP Server"""
-    print("Starting MCP Server...")
-    subprocess.Popen([sys.executable, "-m", "uvicorn", "mcp_server.main:app", "--reload", "--host", "0.0.0.0", "--port", "8000"])
+    workers = int(os.getenv("MCP_WORKERS", "1"))
+    state_backend = os.getenv("STATE_BACKEND_URL", "memory://")
+    if workers > 1 and not state_backend.startswith(("redis://", "rediss://")):
+        print("Warning: MCP_WORKERS > 1 requires a redis:// STATE_BACKEND_URL, starting 1 worker")
+        workers = 1
+    
+    print(f"Starting MCP Server with {workers} worker(s)...")
+    command = [sys.executable, "-m", "uvicorn", "backend.mcp_server.main:app", "--host", "0.0.0.0", "--port", "8000"]
+    if os.getenv("MCP_RELOAD", "false").lower() == "true":
+        command.append("--reload")
+    else:
+        command += ["--workers", str(workers)]
+    return subprocess.Popen(command, cwd=ROOT_DIR)
 
-def start_agents():
-    """Start the SEO agents"""
+def start_agents() -> subprocess.Popen:
+    """Start the SEO agents under the supervisor, which runs AGENT_PROCESSES worker processes"""
     print("Starting SEO agents...")
-    subprocess.Popen([sys.executable, "run_agents.py"])
+    return subprocess.Popen([sys.executable, "-m", "backend.supervisor"], cwd=ROOT_DIR)
 
 if __name__ == "__main__":
     # Load environment variables
@@ -24,19 +39,28 @@ if __name__ == "__main__":
         sys.exit(1)
     
     # Start MCP Server
-    start_mcp_server()
+    server = start_mcp_server()
     
     # Start agents
-    start_agents()
+    agents = start_agents()
     
     print("\nSEO Spark Automator is running!")
     print("MCP Server: http://localhost:8000")
     print("Press Ctrl+C to stop all services")
     
     try:
-        # Keep the script running
-        while True:
-            input()
+        # Keep the script running until a service exits
+        while server.poll() is None and agents.poll() is None:
+            time.sleep(1)
     except KeyboardInterrupt:
         print("\nShutting down services...")
-        sys.exit(0) 
\ No newline at end of file
+    finally:
+        # Stop the agents first so they can finish their tasks while the server is up
+        for process in (agents, server):
+            if process.poll() is None:
+                process.terminate()
+            try:
+                process.wait(timeout=60)
+            except (subprocess.TimeoutExpired, KeyboardInterrupt):
+                process.kill()
+    sys.exit(0)
@@ -0,0 +1,222 @@
+"""Run the SEO agents in several worker processes and keep them running
+
+Each worker process runs AGENTS_PER_PROCESS agents with ids that stay the
+same across restarts. The AI rate limits are split evenly between all the
+agents unless AI_RATE_LIMIT_URL shares them through Redis. Crashed workers are restarted with exponential
+backoff; SIGHUP restarts the workers one at a time, each draining its tasks
+first; SIGINT or SIGTERM stops them all. Run from the repository root:
+
+    python -m backend.supervisor --processes 4 --agents-per-process 2
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+from typing import List, Optional
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+async def _run_agents(agent_ids: List[str], mcp_server_url: str) -> bool:
+    """Run agents until SIGTERM, then drain them; returns False if an agent stopped by itself"""
+    from .agents.content_agent import ContentAgent
+
+    agents = [ContentAgent(agent_id=agent_id, mcp_server_url=mcp_server_url) for agent_id in agent_ids]
+    stopping = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+
+    # Each agent reconnects on its own whenever its connection drops
+    runners = [asyncio.create_task(agent.run()) for agent in agents]
+    stopped = asyncio.create_task(stopping.wait())
+    done, _ = await asyncio.wait(runners + [stopped], return_when=asyncio.FIRST_COMPLETED)
+    for task in done:
+        if task is not stopped and task.exception():
+            logger.error(f"Agent stopped unexpectedly: {task.exception()}")
+
+    logger.info(f"Shutting down agents {', '.join(agent_ids)}...")
+    await asyncio.gather(*(agent.disconnect() for agent in agents), return_exceptions=True)
+    for task in runners + [stopped]:
+        task.cancel()
+    await asyncio.gather(*runners, return_exceptions=True)
+    return stopped in done
+
+def run_worker(agent_ids: List[str], mcp_server_url: str, rate_limit_shares: int = 1):
+    """Entry point of a worker process"""
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    # Each agent's AI provider takes this share of the configured rate limits
+    os.environ["AI_RATE_LIMIT_SHARES"] = str(rate_limit_shares)
+    # The supervisor handles Ctrl+C and SIGHUP for the terminal's process
+    # group; workers stop when it sends SIGTERM, after draining their tasks
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    if not asyncio.run(_run_agents(agent_ids, mcp_server_url)):
+        sys.exit(1)
+
+class WorkerSlot:
+    """One worker process position, keeping its agent ids and restart history"""
+
+    def __init__(self, index: int, agent_ids: List[str]):
+        self.index = index
+        self.agent_ids = agent_ids
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at = 0.0
+        self.failures = 0
+        self.restart_at: Optional[float] = None
+
+class Supervisor:
+    """Start agent worker processes, restart the ones that exit and stop them on request"""
+
+    def __init__(
+        self,
+        processes: int,
+        agents_per_process: int,
+        mcp_server_url: str,
+        id_prefix: str,
+        restart_base_delay: float = 1.0,
+        restart_max_delay: float = 60.0,
+        stable_after: float = 30.0,
+        stop_timeout: float = 45.0,
+        rate_limit_shares: Optional[int] = None,
+    ):
+        self.mcp_server_url = mcp_server_url
+        # Agents on other hosts also count when AI_RATE_LIMIT_SHARES is set higher
+        self.rate_limit_shares = rate_limit_shares or processes * agents_per_process
+        self.restart_base_delay = restart_base_delay
+        self.restart_max_delay = restart_max_delay
+        self.stable_after = stable_after
+        self.stop_timeout = stop_timeout
+        self.slots = [
+            WorkerSlot(i, [f"{id_prefix}_{i + 1}_{j + 1}" for j in range(agents_per_process)])
+            for i in range(processes)
+        ]
+        # Spawn rather than fork so workers do not inherit this process's state
+        self._context = multiprocessing.get_context("spawn")
+        self._stopping = False
+        self._rolling_restart = False
+
+    def _start(self, slot: WorkerSlot):
+        slot.process = self._context.Process(
+            target=run_worker,
+            args=(slot.agent_ids, self.mcp_server_url, self.rate_limit_shares),
+            name=f"agent-worker-{slot.index + 1}",
+        )
+        slot.process.start()
+        slot.started_at = time.monotonic()
+        slot.restart_at = None
+        logger.info(f"Started worker {slot.index + 1} (pid {slot.process.pid}) with agents {', '.join(slot.agent_ids)}")
+
+    def _stop(self, slot: WorkerSlot):
+        """Ask a worker to drain and exit, killing it if it takes longer than stop_timeout"""
+        process = slot.process
+        if process is None:
+            return
+        if process.is_alive():
+            process.terminate()
+            process.join(self.stop_timeout)
+        if process.is_alive():
+            logger.warning(f"Worker {slot.index + 1} did not stop within {self.stop_timeout}s, killing it")
+            process.kill()
+            process.join()
+        process.close()
+        slot.process = None
+
+    def _check(self, slot: WorkerSlot):
+        """Schedule a restart for a worker that exited, backing off if it keeps failing"""
+        now = time.monotonic()
+        if slot.restart_at is not None:
+            if now >= slot.restart_at:
+                self._start(slot)
+            return
+        if slot.process is None or slot.process.is_alive():
+            return
+
+        exitcode = slot.process.exitcode
+        slot.process.close()
+        slot.process = None
+        # A worker that ran for a while before exiting is not crash-looping
+        if now - slot.started_at >= self.stable_after:
+            slot.failures = 0
+        slot.failures += 1
+        delay = min(self.restart_max_delay, self.restart_base_delay * 2 ** (slot.failures - 1))
+        slot.restart_at = now + delay
+        logger.warning(f"Worker {slot.index + 1} exited with code {exitcode}, restarting in {delay:.1f}s")
+
+    def _restart_all(self):
+        """Restart workers one at a time so the other workers keep serving tasks"""
+        logger.info("Rolling restart of agent workers")
+        for slot in self.slots:
+            if self._stopping:
+                return
+            self._stop(slot)
+            slot.failures = 0
+            self._start(slot)
+
+    def _handle_stop(self, signum, frame):
+        logger.info(f"Received signal {signum}, stopping agent workers...")
+        self._stopping = True
+
+    def _handle_hangup(self, signum, frame):
+        self._rolling_restart = True
+
+    def run(self, poll_interval: float = 0.5):
+        """Supervise the workers until SIGINT or SIGTERM"""
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self._handle_hangup)
+
+        for slot in self.slots:
+            self._start(slot)
+        while not self._stopping:
+            if self._rolling_restart:
+                self._rolling_restart = False
+                self._restart_all()
+            for slot in self.slots:
+                if not self._stopping:
+                    self._check(slot)
+            time.sleep(poll_interval)
+
+        # Signal every worker first so they drain in parallel
+        for slot in self.slots:
+            if slot.process is not None and slot.process.is_alive():
+                slot.process.terminate()
+        for slot in self.slots:
+            self._stop(slot)
+        logger.info("All agent workers stopped")
+
+def create_supervisor(processes: Optional[int] = None, agents_per_process: Optional[int] = None) -> Supervisor:
+    """Create a supervisor based on environment configuration"""
+    return Supervisor(
+        processes=processes or int(os.getenv("AGENT_PROCESSES", "0")) or os.cpu_count() or 1,
+        agents_per_process=agents_per_process or int(os.getenv("AGENTS_PER_PROCESS", "1")),
+        mcp_server_url=os.getenv("MCP_SERVER_URL", "ws://localhost:8000"),
+        id_prefix=os.getenv("AGENT_ID_PREFIX") or f"content_agent_{socket.gethostname()}",
+        restart_base_delay=float(os.getenv("AGENT_RESTART_BASE_SECONDS", "1")),
+        restart_max_delay=float(os.getenv("AGENT_RESTART_MAX_SECONDS", "60")),
+        stable_after=float(os.getenv("AGENT_RESTART_STABLE_SECONDS", "30")),
+        # Workers get the agents' drain timeout plus time to disconnect
+        stop_timeout=float(os.getenv("AGENT_DRAIN_TIMEOUT_SECONDS", "30")) + 15,
+        rate_limit_shares=int(os.getenv("AI_RATE_LIMIT_SHARES") or "0") or None,
+    )
+
+def main(argv: Optional[List[str]] = None):
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, help="worker processes; defaults to AGENT_PROCESSES or the CPU count")
+    parser.add_argument("--agents-per-process", type=int, help="agents in each worker; defaults to AGENTS_PER_PROCESS")
+    args = parser.parse_args(argv)
+
+    create_supervisor(args.processes, args.agents_per_process).run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+from abc import ABC, abstractmethod
+import bisect
+import math
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+# Seconds, from a fast cache hit to a slow model call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+LabelValues = Tuple[str, ...]
+# One exported sample: (sample name, labels, value)
+Sample = Tuple[str, Dict[str, str], float]
+
+class Metric(ABC):
+    """A named family of values, one per combination of label values
+
+    Updates are plain dict operations so instrumenting a hot path costs little;
+    everything here runs on one event loop and needs no locking.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str = "", labels: Tuple[str, ...] = (), func: Optional[Callable[[], Any]] = None):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        # A function computing the value at collection time, for values
+        # another object already tracks, e.g. a queue's depth
+        self.func = func
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _labels(self, key: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.label_names, key))
+
+    def _func_samples(self) -> List[Sample]:
+        value = self.func()
+        if isinstance(value, dict):
+            # Label values -> value, for a function covering several series
+            return [
+                (self.name, self._labels(key if isinstance(key, tuple) else (key,)), float(v))
+                for key, v in value.items()
+            ]
+        return [(self.name, {}, float(value))]
+
+    @abstractmethod
+    def samples(self) -> List[Sample]:
+        """Get the current (sample name, labels, value) of every series"""
+        pass
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Sample]:
+        if self.func:
+            return self._func_samples()
+        return [(self.name, self._labels(key), value) for key, value in self._values.items()]
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[Sample]:
+        if self.func:
+            return self._func_samples()
+        return [(self.name, self._labels(key), value) for key, value in self._values.items()]
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: [count per bucket..., count above the last bucket], sum
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[Sample]:
+        samples = []
+        for key, (counts, total) in self._series.items():
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else f"{bound:g}"
+                samples.append((f"{self.name}_bucket", {**labels, "le": le}, cumulative))
+            samples.append((f"{self.name}_sum", labels, total[0]))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+class MetricsRegistry:
+    """A set of metrics that can be rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs) -> Metric:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, *args, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.type}")
+        elif kwargs.get("func"):
+            # A new owner of the value, e.g. a recreated provider
+            metric.func = kwargs["func"]
+        return metric
+
+    def counter(self, name: str, help: str = "", labels: Tuple[str, ...] = (), func: Optional[Callable[[], Any]] = None) -> Counter:
+        return self._get_or_create(Counter, name, help, labels, func=func)
+
+    def gauge(self, name: str, help: str = "", labels: Tuple[str, ...] = (), func: Optional[Callable[[], Any]] = None) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labels, func=func)
+
+    def histogram(self, name: str, help: str = "", labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labels, buckets=buckets)
+
+    def collect(self) -> List[Dict[str, Any]]:
+        """Get every metric family with its current samples, in a JSON-friendly form"""
+        return [
+            {"name": m.name, "type": m.type, "help": m.help, "samples": [list(s) for s in m.samples()]}
+            for m in self._metrics.values()
+        ]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+def render(families: List[Dict[str, Any]]) -> str:
+    """Render metric families in the Prometheus text exposition format
+
+    Families with the same name, e.g. one pushed by each agent, are merged.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for family in families:
+        target = merged.setdefault(family["name"], {**family, "samples": []})
+        target["samples"].extend(family["samples"])
+
+    lines = []
+    for family in merged.values():
+        if family["help"]:
+            lines.append(f"# HELP {family['name']} {family['help']}")
+        lines.append(f"# TYPE {family['name']} {family['type']}")
+        for name, labels, value in family["samples"]:
+            label_text = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {_format_value(value)}" if label_text else f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+def with_labels(families: List[Dict[str, Any]], **labels: str) -> List[Dict[str, Any]]:
+    """Add labels to every sample, e.g. the agent that pushed them"""
+    return [
+        {**family, "samples": [[name, {**labels, **sample_labels}, value] for name, sample_labels, value in family["samples"]]}
+        for family in families
+    ]
+
+# Metrics of this process not tied to one agent
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,307 @@
+"""Trace tasks across the MCP Server, agents and AI providers
+
+Spans are propagated between processes as W3C `traceparent` strings carried
+in task messages, and exported in batches to a JSONL file or an OTLP/HTTP
+collector. Summarize a trace file with:
+
+    python -m backend.telemetry.tracing traces.jsonl
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import time
+import urllib.request
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+class Span:
+    """One timed stage of a task; ended spans are handed to the tracer for export"""
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str], sampled: bool, attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self.end_time: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_error(self, error: Any):
+        self.error = str(error) or type(error).__name__
+
+    def end(self, end_time: Optional[float] = None):
+        if self.end_time is None:
+            self.end_time = end_time or time.time()
+            if self.sampled:
+                self.tracer._finished(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": self.tracer.service_name,
+            "start": self.start,
+            "end": self.end_time,
+            "duration_ms": round((self.end_time - self.start) * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+class _NoopSpan(Span):
+    """Stands in for a span when tracing is disabled, so callers need no checks"""
+
+    def __init__(self):
+        pass
+
+    @property
+    def traceparent(self) -> Optional[str]:
+        return None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def record_error(self, error: Any):
+        pass
+
+    def end(self, end_time: Optional[float] = None):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+# The span the running code belongs to; asyncio tasks inherit it from their creator
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def parse_traceparent(traceparent: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """Split a traceparent into trace id, parent span id and sampled flag"""
+    match = TRACEPARENT_RE.match(traceparent or "")
+    if not match:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+class JsonlSpanExporter:
+    """Append each span as one JSON line to a local file"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(span.to_dict()) + "\n" for span in spans)
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+class OtlpSpanExporter:
+    """Post spans to an OpenTelemetry collector using OTLP/HTTP with JSON bodies"""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 10):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def _span(self, span: Span) -> Dict[str, Any]:
+        otlp = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(int(span.start * 1e9)),
+            "endTimeUnixNano": str(int(span.end_time * 1e9)),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            otlp["parentSpanId"] = span.parent_id
+        return otlp
+
+    def export(self, spans: List[Span]):
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{"scope": {"name": "seo-spark"}, "spans": [self._span(s) for s in spans]}],
+            }]
+        }
+        request = urllib.request.Request(
+            self.url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"}, method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+class Tracer:
+    """Create spans and export the sampled ones in the background
+
+    Ending a span only appends it to a list; spans are written by a task that
+    runs at most every `flush_interval` seconds, off the event loop.
+    """
+
+    def __init__(self, service_name: str, exporter=None, sample_rate: float = 1.0, flush_interval: float = 1.0, max_batch: int = 512):
+        self.service_name = service_name
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending: List[Span] = []
+        self._flusher: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def start_span(self, name: str, parent: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None, start_time: Optional[float] = None) -> Span:
+        """Start a span under the traceparent given, else under the current span, else a new trace"""
+        if not self.enabled:
+            return NOOP_SPAN
+        parsed = parse_traceparent(parent)
+        current = _current_span.get()
+        if parsed:
+            trace_id, parent_id, sampled = parsed
+        elif current is not None and current is not NOOP_SPAN:
+            trace_id, parent_id, sampled = current.trace_id, current.span_id, current.sampled
+        else:
+            trace_id, parent_id, sampled = os.urandom(16).hex(), None, random.random() < self.sample_rate
+        span = Span(self, name, trace_id, parent_id, sampled, attributes)
+        if start_time is not None:
+            span.start = start_time
+        return span
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None) -> Iterator[Span]:
+        """Run the block in a new span, which is current inside it"""
+        span = self.start_span(name, parent, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def current_traceparent(self) -> Optional[str]:
+        span = _current_span.get()
+        return span.traceparent if span is not None else None
+
+    def _finished(self, span: Span):
+        self._pending.append(span)
+        if self._flusher is None or self._flusher.done():
+            try:
+                self._flusher = asyncio.get_running_loop().create_task(self._flush_later())
+            except RuntimeError:
+                # No event loop, e.g. a script; export right away
+                self._export(self._take())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    def _take(self) -> List[Span]:
+        spans, self._pending = self._pending, []
+        return spans
+
+    def _export(self, spans: List[Span]):
+        for i in range(0, len(spans), self.max_batch):
+            try:
+                self.exporter.export(spans[i:i + self.max_batch])
+            except Exception as e:
+                logger.warning(f"Could not export {len(spans[i:i + self.max_batch])} spans: {e}")
+
+    async def flush(self):
+        """Export every ended span now"""
+        spans = self._take()
+        if spans:
+            await asyncio.to_thread(self._export, spans)
+
+def create_tracer() -> Tracer:
+    """Create a tracer based on environment configuration"""
+    service_name = os.getenv("TRACE_SERVICE_NAME", "seo-spark")
+    exporter_name = os.getenv("TRACE_EXPORTER", "none").lower()
+    if exporter_name == "jsonl":
+        exporter = JsonlSpanExporter(os.getenv("TRACE_FILE", "traces.jsonl"))
+    elif exporter_name == "otlp":
+        exporter = OtlpSpanExporter(os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318"), service_name)
+    elif exporter_name == "none":
+        exporter = None
+    else:
+        raise ValueError(f"Unsupported trace exporter: {exporter_name}")
+    return Tracer(
+        service_name,
+        exporter,
+        sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1.0")),
+        flush_interval=float(os.getenv("TRACE_FLUSH_SECONDS", "1")),
+    )
+
+_tracer: Optional[Tracer] = None
+
+def get_tracer() -> Tracer:
+    """Get the process-wide tracer, configured on first use so .env files are loaded by then"""
+    global _tracer
+    if _tracer is None:
+        _tracer = create_tracer()
+    return _tracer
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize span durations in a JSONL trace file")
+    parser.add_argument("path", help="file written with TRACE_EXPORTER=jsonl")
+    parser.add_argument("--slowest", type=int, default=5, help="traces to break down by stage")
+    args = parser.parse_args()
+
+    spans = [json.loads(line) for line in open(args.path, encoding="utf-8") if line.strip()]
+    by_name: Dict[str, List[float]] = defaultdict(list)
+    by_trace: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for span in spans:
+        by_name[span["name"]].append(span["duration_ms"])
+        by_trace[span["trace_id"]].append(span)
+
+    print(f"{'span':<28} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for name, durations in sorted(by_name.items()):
+        print(
+            f"{name:<28} {len(durations):>7} {_percentile(durations, 0.5):>10.1f} "
+            f"{_percentile(durations, 0.95):>10.1f} {_percentile(durations, 0.99):>10.1f} {max(durations):>10.1f}"
+        )
+
+    def trace_duration(trace: List[Dict[str, Any]]) -> float:
+        return (max(s["end"] for s in trace) - min(s["start"] for s in trace)) * 1000
+
+    for trace_id, trace in sorted(by_trace.items(), key=lambda t: -trace_duration(t[1]))[:args.slowest]:
+        print(f"\ntrace {trace_id} {trace_duration(trace):.1f} ms")
+        first = min(s["start"] for s in trace)
+        for span in sorted(trace, key=lambda s: s["start"]):
+            offset = (span["start"] - first) * 1000
+            error = f" error={span['error']}" if span["error"] else ""
+            print(f"  +{offset:>9.1f} ms {span['duration_ms']:>9.1f} ms  {span['name']}{error}")
+
+if __name__ == "__main__":
+    main()
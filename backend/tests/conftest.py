@@ -0,0 +1,60 @@
+import asyncio
+import sys
+from pathlib import Path
+import pytest
+
+# The backend modules import each other relatively, so they are imported as
+# the `backend` package from the repository root, as start.py runs them
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.ai.base_provider import BaseAIProvider
+
+class RecordingProvider(BaseAIProvider):
+    """Provider that records its calls and can hold or fail them on demand"""
+
+    model_name = "test-model"
+
+    def __init__(self, name: str = "recording"):
+        self.name = name
+        self.calls = []
+        self.errors = []
+        self.gate = None
+        self.cancelled = 0
+
+    async def _respond(self, method: str, value, result):
+        self.calls.append((method, value))
+        if self.gate is not None:
+            try:
+                await self.gate.wait()
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+        if self.errors:
+            raise self.errors.pop(0)
+        return result
+
+    async def generate_text(self, prompt: str, **kwargs) -> str:
+        return await self._respond("generate_text", prompt, f"text for {prompt}")
+
+    async def analyze_text(self, text: str, **kwargs):
+        return await self._respond("analyze_text", text, {"length": len(text)})
+
+    async def optimize_text(self, text: str, **kwargs) -> str:
+        return await self._respond("optimize_text", text, text.upper())
+
+    async def generate_keywords(self, topic: str, **kwargs):
+        return await self._respond("generate_keywords", topic, [topic, f"{topic} tips"])
+
+@pytest.fixture
+def provider():
+    return RecordingProvider()
+
+@pytest.fixture
+def make_provider():
+    """Build further recording providers, e.g. to route between"""
+    return RecordingProvider
+
+@pytest.fixture
+def fake_provider():
+    from backend.ai.fake_provider import FakeAIProvider
+    return FakeAIProvider(latency="fixed:0", seed=1)
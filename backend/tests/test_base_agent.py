@@ -0,0 +1,172 @@
+import asyncio
+import json
+import time
+from backend.agents.base_agent import BaseAgent
+
+class FakeSocket:
+    """Records what an agent sends and feeds it messages as the MCP Server would"""
+
+    def __init__(self):
+        self.sent = []
+        self.incoming = asyncio.Queue()
+        self.closed = False
+
+    async def send(self, data):
+        self.sent.append(json.loads(data))
+
+    async def recv(self):
+        return await self.incoming.get()
+
+    async def close(self):
+        self.closed = True
+
+class SlowAgent(BaseAgent):
+    """Agent whose tasks wait for the test to release them"""
+
+    def __init__(self, **kwargs):
+        super().__init__("agent_1", "ws://unused", **kwargs)
+        self.release = asyncio.Event()
+        self.running = 0
+        self.peak = 0
+
+    async def process_task(self, task):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await self.release.wait()
+        self.running -= 1
+        return {"done": task["task_id"]}
+
+def connect(agent):
+    agent.websocket = FakeSocket()
+    agent.is_connected = True
+    agent._start_workers()
+    return agent.websocket
+
+def completed(socket):
+    return sorted(m["task_id"] for m in socket.sent if m["type"] == "task_complete")
+
+def test_tasks_run_concurrently_up_to_the_worker_count():
+    async def scenario():
+        agent = SlowAgent(max_concurrent_tasks=3)
+        socket = connect(agent)
+        for i in range(5):
+            await agent._handle_message({"type": "task", "task_id": f"t{i}"})
+        await asyncio.sleep(0.01)
+        running = agent.running
+        agent.release.set()
+        await agent.disconnect()
+        return agent, socket, running
+
+    agent, socket, running = asyncio.run(scenario())
+    assert running == 3
+    assert agent.peak == 3
+    assert completed(socket) == [f"t{i}" for i in range(5)]
+
+def test_context_updates_are_handled_while_tasks_run():
+    async def scenario():
+        agent = SlowAgent(max_concurrent_tasks=1)
+        socket = connect(agent)
+        listener = asyncio.create_task(agent._listen_for_messages())
+        socket.incoming.put_nowait(json.dumps({"type": "task", "task_id": "slow"}))
+        socket.incoming.put_nowait(json.dumps({"type": "context_update", "context": {"topic": "seo"}}))
+        await asyncio.sleep(0.01)
+        context = dict(agent.context)
+        agent.release.set()
+        listener.cancel()
+        await agent.disconnect()
+        return context
+
+    assert asyncio.run(scenario()) == {"topic": "seo"}
+
+def test_full_queue_does_not_block_the_receive_loop():
+    async def scenario():
+        agent = SlowAgent(max_concurrent_tasks=1)
+        agent.task_queue_size = 1
+        socket = connect(agent)
+        listener = asyncio.create_task(agent._listen_for_messages())
+        for task_id in ("running", "queued", "overflow", "cancelled"):
+            socket.incoming.put_nowait(json.dumps({"type": "task", "task_id": task_id}))
+        # Frames behind the tasks that do not fit are still read
+        socket.incoming.put_nowait(json.dumps({"type": "cancel", "task_id": "cancelled"}))
+        socket.incoming.put_nowait(json.dumps({"type": "context_update", "context": {"topic": "seo"}}))
+        await asyncio.sleep(0.01)
+        context = dict(agent.context)
+        agent.release.set()
+        listener.cancel()
+        await agent.disconnect()
+        return context, socket
+
+    context, socket = asyncio.run(scenario())
+    assert context == {"topic": "seo"}
+    assert completed(socket) == ["overflow", "queued", "running"]
+
+def test_disconnect_drains_queued_tasks_before_closing():
+    async def scenario():
+        agent = SlowAgent(max_concurrent_tasks=1)
+        socket = connect(agent)
+        for i in range(3):
+            await agent._handle_message({"type": "task", "task_id": f"t{i}"})
+        asyncio.get_running_loop().call_later(0.01, agent.release.set)
+        await agent.disconnect()
+        return socket
+
+    socket = asyncio.run(scenario())
+    assert completed(socket) == ["t0", "t1", "t2"]
+    assert socket.closed
+
+def test_task_past_its_deadline_is_reported_expired_without_running():
+    async def scenario():
+        agent = SlowAgent()
+        socket = connect(agent)
+        agent.release.set()
+        await agent._handle_message({"type": "task", "task_id": "late", "deadline": time.time() - 1})
+        await agent.disconnect()
+        return agent, socket
+
+    agent, socket = asyncio.run(scenario())
+    assert agent.peak == 0
+    assert [(m["type"], m.get("expired")) for m in socket.sent] == [("task_error", True)]
+
+def test_cancel_stops_running_and_queued_tasks():
+    async def scenario():
+        agent = SlowAgent(max_concurrent_tasks=1)
+        socket = connect(agent)
+        await agent._handle_message({"type": "task", "task_id": "running"})
+        await agent._handle_message({"type": "task", "task_id": "queued"})
+        await agent._handle_message({"type": "task", "task_id": "kept"})
+        await asyncio.sleep(0.01)
+        await agent._handle_message({"type": "cancel", "task_id": "running"})
+        await agent._handle_message({"type": "cancel", "task_id": "queued"})
+        await asyncio.sleep(0.01)
+        agent.release.set()
+        await agent.disconnect()
+        return agent, socket
+
+    agent, socket = asyncio.run(scenario())
+    assert [m["type"] for m in socket.sent] == ["task_complete"]
+    assert completed(socket) == ["kept"]
+    assert agent.current_tasks == []
+
+def test_tasks_time_out_by_type_unless_they_set_their_own():
+    async def scenario():
+        agent = SlowAgent()
+        agent.task_timeouts = {"slow": 0.01}
+        socket = connect(agent)
+        await agent._handle_message({"type": "task", "task_id": "by_type", "task_type": "slow"})
+        await agent._handle_message({"type": "task", "task_id": "own", "task_type": "slow", "timeout_seconds": 60})
+        await asyncio.sleep(0.05)
+        agent.release.set()
+        await agent.disconnect()
+        return socket
+
+    socket = asyncio.run(scenario())
+    errors = [(m["task_id"], m["error"]) for m in socket.sent if m["type"] == "task_error"]
+    assert [task_id for task_id, _ in errors] == ["by_type"]
+    assert errors[0][1].startswith("Task timed out")
+    assert completed(socket) == ["own"]
+
+def test_timeout_overrides_are_parsed():
+    assert BaseAgent._parse_timeouts("optimize_content=60, analyze_content_batch=900,") == {
+        "optimize_content": 60.0,
+        "analyze_content_batch": 900.0,
+    }
@@ -0,0 +1,54 @@
+import asyncio
+import json
+import pytest
+
+def test_packed_documents_map_back_by_index(provider):
+    prompts = []
+
+    async def generate_text(prompt, **kwargs):
+        prompts.append(prompt)
+        return json.dumps([{"index": 1, "seo_score": 20}, {"index": 0, "seo_score": 10}])
+
+    provider.generate_text = generate_text
+    results = asyncio.run(provider.analyze_batch(["first", "second"], fields=["seo_score"]))
+
+    assert results == [{"seo_score": 10}, {"seo_score": 20}]
+    assert len(prompts) == 1
+    assert provider.calls == []
+
+def test_unparseable_pack_is_split_down_to_single_analyses(provider):
+    async def generate_text(prompt, **kwargs):
+        return "not json"
+
+    provider.generate_text = generate_text
+    results = asyncio.run(provider.analyze_batch(["a", "bb", "ccc"]))
+
+    assert results == [{"length": 1}, {"length": 2}, {"length": 3}]
+    assert sorted(v for _, v in provider.calls) == ["a", "bb", "ccc"]
+
+def test_documents_are_packed_up_to_the_token_budget(provider):
+    prompts = []
+
+    async def generate_text(prompt, **kwargs):
+        prompts.append(prompt)
+        count = prompt.count("<document index=")
+        return json.dumps([{"index": i} for i in range(count)])
+
+    provider.generate_text = generate_text
+    asyncio.run(provider.analyze_batch(["word " * 300] * 6, max_batch_tokens=1000))
+
+    assert len(prompts) == 3
+
+def test_provider_errors_fail_the_pack_without_splitting(provider):
+    prompts = []
+
+    async def generate_text(prompt, **kwargs):
+        prompts.append(prompt)
+        raise ConnectionError("provider down")
+
+    provider.generate_text = generate_text
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(provider.analyze_batch(["a", "bb", "ccc"]))
+    assert len(prompts) == 1
+    assert provider.calls == []
@@ -0,0 +1,64 @@
+import asyncio
+from backend.ai import cache
+from backend.ai.cache import CachedAIProvider, MemoryCacheTier, SQLiteCacheTier
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_memory_tier_evicts_least_recently_used():
+    tier = MemoryCacheTier(max_entries=2)
+    run(tier.set("a", "1", 60))
+    run(tier.set("b", "2", 60))
+    assert run(tier.get("a")) == "1"
+    run(tier.set("c", "3", 60))
+
+    assert run(tier.get("b")) is None
+    assert run(tier.get("a")) == "1"
+    assert tier.evictions == 1
+
+def test_memory_tier_is_bounded_by_size():
+    tier = MemoryCacheTier(max_bytes=10)
+    run(tier.set("a", "x" * 6, 60))
+    run(tier.set("b", "y" * 6, 60))
+    run(tier.set("huge", "z" * 11, 60))
+
+    assert len(tier) == 1
+    assert tier.size_bytes == 6
+    assert run(tier.get("huge")) is None
+
+def test_memory_tier_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    tier = MemoryCacheTier()
+    run(tier.set("a", "1", ttl=10))
+
+    now[0] += 5
+    assert run(tier.get("a")) == "1"
+    now[0] += 10
+    assert run(tier.get("a")) is None
+    assert len(tier) == 0
+
+def test_repeated_calls_are_served_from_cache(provider):
+    cached = CachedAIProvider(provider, [MemoryCacheTier()])
+
+    first = run(cached.analyze_text("some text"))
+    second = run(cached.analyze_text("some text"))
+    run(cached.analyze_text("other text"))
+    run(cached.generate_text("prompt"))
+    run(cached.generate_text("prompt"))
+
+    assert first == second == {"length": 9}
+    # generate_text is not cached by default
+    assert [m for m, _ in provider.calls] == ["analyze_text", "analyze_text", "generate_text", "generate_text"]
+    stats = cached.get_stats()
+    assert (stats["hits"], stats["misses"], stats["memory_entries"]) == (1, 2, 2)
+
+def test_disk_hits_are_promoted_to_memory(provider, tmp_path):
+    path = str(tmp_path / "cache.db")
+    run(CachedAIProvider(provider, [SQLiteCacheTier(path)]).generate_keywords("seo"))
+
+    memory = MemoryCacheTier()
+    cached = CachedAIProvider(provider, [memory, SQLiteCacheTier(path)])
+    assert run(cached.generate_keywords("seo")) == ["seo", "seo tips"]
+    assert len(provider.calls) == 1
+    assert len(memory) == 1
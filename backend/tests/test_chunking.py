@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from backend.agents.chunking import chunk_document, join_chunks, map_chunks, merge_analyses, split_chunks
+
+SENTENCE = "Search engines reward pages that answer a question clearly and quickly. "
+DOCUMENT = (
+    "\n# Guide\n\n" + SENTENCE * 30 + "\n\n## Tools\n" + SENTENCE * 30
+    + "\n<h2>List</h2>\n" + "- " + SENTENCE * 30 + "\n"
+)
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_chunks_join_back_to_the_document():
+    chunks = chunk_document(DOCUMENT, max_tokens=300)
+
+    assert len(chunks) > 3
+    assert "".join(chunks) == DOCUMENT
+
+def test_split_and_join_restore_the_original_separators():
+    chunks, separators = split_chunks(DOCUMENT, max_tokens=300)
+
+    assert len(separators) == len(chunks) + 1
+    assert all(chunk == chunk.strip() for chunk in chunks)
+    assert join_chunks(chunks, separators) == DOCUMENT
+
+def test_rewritten_chunks_keep_the_document_layout():
+    chunks, separators = split_chunks("# Title\n\nIntro text.\n## Next\nBody", max_tokens=3)
+    # Rewrites come back with their own surrounding whitespace
+    rewritten = [f"\n {chunk.upper()} \n\n" for chunk in chunks]
+
+    assert join_chunks(rewritten, separators) == "# TITLE\n\nINTRO TEXT.\n## NEXT\nBODY"
+
+def test_blank_chunks_become_separators():
+    chunks, separators = split_chunks("   \n\n  ", max_tokens=1)
+
+    assert chunks == []
+    assert join_chunks([], separators) == "   \n\n  "
+
+def test_map_chunks_keeps_order_and_bounds_concurrency():
+    running = 0
+    peak = 0
+
+    async def work(chunk):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01 if chunk == "a" else 0)
+        running -= 1
+        return chunk.upper()
+
+    assert run(map_chunks(["a", "b", "c", "d"], work, concurrency=2)) == ["A", "B", "C", "D"]
+    assert peak == 2
+
+def test_map_chunks_cancels_the_rest_when_one_fails():
+    cancelled = []
+
+    async def work(chunk):
+        if chunk == "bad":
+            raise RuntimeError("boom")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(chunk)
+            raise
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await map_chunks(["a", "bad", "b"], work, concurrency=3)
+        await asyncio.sleep(0)
+
+    run(scenario())
+    assert sorted(cancelled) == ["a", "b"]
+
+def test_merge_analyses_weights_scores_and_combines_values():
+    merged = merge_analyses(
+        [
+            {"seo_score": 80, "keywords": ["seo"], "has_faq": False, "summary": "One"},
+            {"seo_score": 40, "keywords": ["seo", "tips"], "has_faq": True, "summary": "Two"},
+        ],
+        weights=[3, 1],
+    )
+
+    assert merged == {"seo_score": 70.0, "keywords": ["seo", "tips"], "has_faq": True, "summary": "One; Two"}
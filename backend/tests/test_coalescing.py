@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+from backend.ai.coalescing import CoalescingAIProvider
+
+def test_concurrent_identical_calls_share_one_request(provider):
+    async def scenario():
+        provider.gate = asyncio.Event()
+        coalescing = CoalescingAIProvider(provider)
+        calls = [asyncio.create_task(coalescing.analyze_text("same")) for _ in range(3)]
+        calls.append(asyncio.create_task(coalescing.analyze_text("other")))
+        await asyncio.sleep(0)
+        provider.gate.set()
+        return await asyncio.gather(*calls), coalescing.get_stats()
+
+    results, stats = asyncio.run(scenario())
+    assert results == [{"length": 4}] * 3 + [{"length": 5}]
+    assert len(provider.calls) == 2
+    assert (stats["calls"], stats["coalesced"], stats["in_flight"]) == (4, 2, 0)
+
+def test_followers_receive_the_leaders_error(provider):
+    async def scenario():
+        provider.gate = asyncio.Event()
+        provider.errors = [RuntimeError("quota")]
+        coalescing = CoalescingAIProvider(provider)
+        calls = [asyncio.create_task(coalescing.optimize_text("text")) for _ in range(2)]
+        await asyncio.sleep(0)
+        provider.gate.set()
+        return await asyncio.gather(*calls, return_exceptions=True), coalescing.get_stats()
+
+    results, stats = asyncio.run(scenario())
+    assert [str(r) for r in results] == ["quota", "quota"]
+    assert len(provider.calls) == 1
+    assert (stats["calls"], stats["coalesced"]) == (2, 1)
+
+def test_cancelled_follower_leaves_the_leader_running(provider):
+    async def scenario():
+        provider.gate = asyncio.Event()
+        coalescing = CoalescingAIProvider(provider)
+        leader = asyncio.create_task(coalescing.optimize_text("text"))
+        follower = asyncio.create_task(coalescing.optimize_text("text"))
+        await asyncio.sleep(0)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        provider.gate.set()
+        return await leader
+
+    assert asyncio.run(scenario()) == "TEXT"
+
+def test_follower_retries_when_the_leader_is_cancelled(provider):
+    async def scenario():
+        provider.gate = asyncio.Event()
+        coalescing = CoalescingAIProvider(provider)
+        leader = asyncio.create_task(coalescing.optimize_text("text"))
+        follower = asyncio.create_task(coalescing.optimize_text("text"))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        provider.gate.set()
+        return await follower, leader.cancelled(), coalescing.get_stats()
+
+    result, leader_cancelled, stats = asyncio.run(scenario())
+    assert result == "TEXT"
+    assert leader_cancelled
+    assert len(provider.calls) == 2
+    # The follower made its own call, so it is not counted as coalesced
+    assert (stats["calls"], stats["coalesced"], stats["retried"]) == (2, 0, 1)
@@ -0,0 +1,74 @@
+import asyncio
+import pytest
+from backend.ai.composite import CompositeAIProvider
+
+def measured(composite, latencies):
+    """Give each provider enough latency samples to be ranked and hedged"""
+    for health, latency in zip(composite.health, latencies):
+        for _ in range(composite.min_samples):
+            health.record_latency(latency)
+    return composite
+
+def test_failed_provider_fails_over_and_cools_down(make_provider):
+    primary, secondary = make_provider("primary"), make_provider("secondary")
+    primary.errors = [RuntimeError("unavailable")]
+    composite = measured(CompositeAIProvider([primary, secondary], explore_rate=0), [0.01, 0.5])
+
+    async def scenario():
+        return await composite.generate_keywords("seo"), await composite.generate_keywords("links")
+
+    assert asyncio.run(scenario()) == (["seo", "seo tips"], ["links", "links tips"])
+    # The second call skips the primary while it cools down
+    assert [v for _, v in primary.calls] == ["seo"]
+    assert [v for _, v in secondary.calls] == ["seo", "links"]
+    assert composite.stats["failovers"] == 1
+    assert not composite.get_stats()["providers"]["primary"]["available"]
+
+def test_error_is_raised_when_every_provider_fails(make_provider):
+    providers = [make_provider("a"), make_provider("b")]
+    for p in providers:
+        p.errors = [RuntimeError(f"{p.name} down")]
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(CompositeAIProvider(providers, explore_rate=0).analyze_text("text"))
+    assert all(len(p.calls) == 1 for p in providers)
+
+def test_slow_primary_is_hedged_and_cancelled(make_provider):
+    primary, backup = make_provider("primary"), make_provider("backup")
+    composite = measured(
+        CompositeAIProvider([primary, backup], hedge=True, hedge_max_ratio=1, explore_rate=0),
+        [0.01, 0.5],
+    )
+
+    async def scenario():
+        # The primary hangs; after its p95 latency the backup is asked too
+        primary.gate = asyncio.Event()
+        result = await composite.optimize_text("text")
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(scenario()) == "TEXT"
+    assert primary.cancelled == 1
+    assert (composite.stats["hedged"], composite.stats["hedge_wins"]) == (1, 1)
+
+def test_fast_primary_is_not_hedged(make_provider):
+    primary, backup = make_provider("primary"), make_provider("backup")
+    composite = measured(
+        CompositeAIProvider([primary, backup], hedge=True, hedge_max_ratio=1, explore_rate=0),
+        [0.01, 0.5],
+    )
+
+    assert asyncio.run(composite.optimize_text("text")) == "TEXT"
+    assert backup.calls == []
+    assert composite.stats["hedged"] == 0
+
+def test_stream_fails_over_before_the_first_chunk(make_provider):
+    primary, secondary = make_provider("primary"), make_provider("secondary")
+    primary.errors = [RuntimeError("unavailable")]
+    composite = measured(CompositeAIProvider([primary, secondary], explore_rate=0), [0.01, 0.5])
+
+    async def collect():
+        return [chunk async for chunk in composite.stream_text("prompt")]
+
+    assert asyncio.run(collect()) == ["text for prompt"]
+    assert composite.stats["failovers"] == 1
@@ -0,0 +1,73 @@
+import asyncio
+import json
+from backend.mcp_server.connections import AgentConnection
+from backend.mcp_server.main import AgentManager
+from backend.mcp_server.state import InMemoryStateBackend
+from backend.mcp_server.task_events import TaskEventHub
+from backend.mcp_server.task_store import create_task_store
+
+class RecordingWebSocket:
+    """Records what the server sends to an agent"""
+
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    async def send_text(self, data):
+        self.sent.append(json.loads(data))
+
+    async def close(self):
+        self.closed = True
+
+class StalledWebSocket(RecordingWebSocket):
+    """Socket whose sends never complete, like an agent that stopped reading"""
+
+    async def send_text(self, data):
+        await super().send_text(data)
+        await asyncio.Event().wait()
+
+def test_full_queue_reports_overflow_without_waiting():
+    async def scenario():
+        overflowed = []
+        connection = AgentConnection("agent_1", StalledWebSocket(), max_queue=2, on_overflow=overflowed.append)
+        await asyncio.sleep(0)
+        accepted = [connection.send({"n": n}) for n in range(4)]
+        await connection.close()
+        return accepted, overflowed, connection.websocket.closed
+
+    accepted, overflowed, closed = asyncio.run(scenario())
+    assert accepted == [True, True, False, False]
+    assert overflowed == ["agent_1", "agent_1"]
+    assert closed
+
+def test_slow_consumer_is_evicted_and_others_keep_receiving():
+    async def scenario():
+        manager = AgentManager(create_task_store("sqlite:///"), InMemoryStateBackend(), TaskEventHub())
+        manager.outbound_queue_size = 1
+        slow = await manager.register_agent("slow", StalledWebSocket())
+        fast = await manager.register_agent("fast", RecordingWebSocket())
+
+        for n in range(3):
+            await manager.publish(["context"], {"type": "context_update", "n": n})
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return set(manager.agents), slow.websocket.closed, len(fast.websocket.sent)
+
+    agents, slow_closed, fast_received = asyncio.run(scenario())
+    assert agents == {"fast"}
+    assert slow_closed
+    assert fast_received == 3
+
+def test_agents_receive_only_subscribed_topics_and_not_their_own_echo():
+    async def scenario():
+        manager = AgentManager(create_task_store("sqlite:///"), InMemoryStateBackend(), TaskEventHub())
+        await manager.register_agent("sender", RecordingWebSocket())
+        await manager.register_agent("listener", RecordingWebSocket())
+        manager.update_subscriptions("listener", {"type": "subscribe", "topics": ["task:a"], "replace": True})
+
+        return (
+            await manager.publish(["context"], {"type": "context_update"}, exclude="sender"),
+            await manager.publish(["task_updates", "task:a"], {"type": "task_update"}),
+        )
+
+    assert asyncio.run(scenario()) == (0, 2)
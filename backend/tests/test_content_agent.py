@@ -0,0 +1,34 @@
+import asyncio
+import pytest
+from backend.agents.content_agent import ContentAgent
+
+@pytest.fixture
+def agent(monkeypatch, provider):
+    monkeypatch.setenv("AI_PROVIDER", "fake")
+    monkeypatch.setenv("KEYWORD_INDEX_URL", "none")
+    agent = ContentAgent("content_agent_1", "ws://unused")
+    agent.ai_provider = provider
+    return agent
+
+def test_optimize_content_reuses_a_given_analysis(agent, provider):
+    result = asyncio.run(agent._optimize_content({"content": "seo text", "analysis": {"seo_score": 50}}))
+
+    assert result["optimized_content"] == "SEO TEXT"
+    assert result["analysis"] == {"seo_score": 50}
+    assert [method for method, _ in provider.calls] == ["optimize_text"]
+
+def test_failed_analysis_cancels_the_optimization(agent, provider):
+    async def analyze_text(text, **kwargs):
+        raise RuntimeError("analysis failed")
+
+    async def scenario():
+        provider.analyze_text = analyze_text
+        # The optimization would wait forever
+        provider.gate = asyncio.Event()
+        with pytest.raises(RuntimeError):
+            await agent._optimize_content({"content": "seo text"})
+        await asyncio.sleep(0)
+        # Checked before asyncio.run cancels whatever is left
+        return provider.cancelled
+
+    assert asyncio.run(scenario()) == 1
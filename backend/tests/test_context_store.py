@@ -0,0 +1,97 @@
+import asyncio
+import random
+from backend.agents.base_agent import BaseAgent
+from backend.mcp_server.context_store import ContextStore
+from backend.mcp_server.state import InMemoryStateBackend
+
+class ReplicaAgent(BaseAgent):
+    """Agent that only keeps a replica of the shared context"""
+
+    def __init__(self):
+        super().__init__("replica", "ws://unused")
+        self.sent = []
+
+    async def _send(self, message, buffer=False):
+        self.sent.append(message)
+        return True
+
+    async def process_task(self, task):
+        pass
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_deltas_rebuild_the_snapshot():
+    async def scenario():
+        store = ContextStore(InMemoryStateBackend(), max_keys=100)
+        agent = ReplicaAgent()
+        rng = random.Random(7)
+        for i in range(200):
+            key = f"key_{rng.randrange(20)}"
+            if rng.random() < 0.3:
+                delta = await store.apply_patch(delete=[key], source="a")
+            else:
+                delta = await store.apply_patch({key: {"i": i}}, source="a")
+            if delta:
+                await agent._handle_context_delta(delta)
+        return agent, await store.snapshot()
+
+    agent, snapshot = run(scenario())
+    assert agent.context == snapshot["context"]
+    assert agent.context_version == snapshot["version"]
+    assert agent.sent == []
+
+def test_out_of_order_deltas_keep_newest_values():
+    async def scenario():
+        store = ContextStore(InMemoryStateBackend())
+        deltas = [
+            await store.apply_patch({"topic": "seo"}),
+            await store.apply_patch({"topic": "marketing", "tone": "formal"}),
+            await store.apply_patch(delete=["tone"]),
+        ]
+        agent = ReplicaAgent()
+        for delta in reversed(deltas):
+            await agent._handle_context_delta(delta)
+        return agent, await store.snapshot()
+
+    agent, snapshot = run(scenario())
+    assert agent.context == snapshot["context"] == {"topic": "marketing"}
+    assert agent.context_version == snapshot["version"]
+
+def test_missed_delta_requests_snapshot_that_catches_up():
+    async def scenario():
+        store = ContextStore(InMemoryStateBackend())
+        agent = ReplicaAgent()
+        await agent._handle_context_delta(await store.apply_patch({"a": 1, "b": 2}))
+        await store.apply_patch({"a": 10}, delete=["b"])
+        await agent._handle_context_delta(await store.apply_patch({"c": 3}))
+        requested = list(agent.sent)
+        await agent._handle_context_snapshot({"type": "context_snapshot", **await store.snapshot()})
+        return agent, requested, await store.snapshot()
+
+    agent, requested, snapshot = run(scenario())
+    assert [m["type"] for m in requested] == ["context_sync"]
+    assert agent.context == snapshot["context"] == {"a": 10, "c": 3}
+
+def test_stale_snapshot_does_not_undo_newer_delta():
+    async def scenario():
+        store = ContextStore(InMemoryStateBackend())
+        agent = ReplicaAgent()
+        await agent._handle_context_delta(await store.apply_patch({"a": 1}))
+        stale = await store.snapshot()
+        await agent._handle_context_delta(await store.apply_patch({"a": 2, "b": 3}))
+        await agent._handle_context_snapshot({"type": "context_snapshot", **stale})
+        return agent
+
+    assert run(scenario()).context == {"a": 2, "b": 3}
+
+def test_eviction_and_oversized_values_appear_in_the_delta():
+    async def scenario():
+        store = ContextStore(InMemoryStateBackend(), max_keys=2, max_value_bytes=20)
+        agent = ReplicaAgent()
+        for patch in ({"a": 1}, {"b": 2}, {"c": 3, "big": "x" * 50}):
+            await agent._handle_context_delta(await store.apply_patch(patch))
+        return agent, await store.snapshot()
+
+    agent, snapshot = run(scenario())
+    assert agent.context == snapshot["context"] == {"b": 2, "c": 3}
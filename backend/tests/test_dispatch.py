@@ -0,0 +1,320 @@
+import asyncio
+import json
+import time
+from backend.mcp_server.fake_redis import FakeRedis
+from backend.mcp_server import main
+from backend.mcp_server.main import AgentManager
+from backend.mcp_server.state import InMemoryStateBackend, RedisStateBackend
+from backend.mcp_server.task_events import TaskEventHub
+from backend.mcp_server.task_store import TaskStatus, create_task_store
+
+class FakeWebSocket:
+    """Records the messages the MCP Server sends to an agent"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, data):
+        self.sent.append(json.loads(data))
+
+    async def close(self):
+        pass
+
+class CountingState(InMemoryStateBackend):
+    """Counts registry reads, to check dispatch does not re-read agents per task"""
+
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    async def get_agents(self):
+        self.reads += 1
+        return await super().get_agents()
+
+async def make_manager(agents, state=None):
+    store = create_task_store("sqlite:///")
+    await store.initialize()
+    manager = AgentManager(store, state or InMemoryStateBackend(), TaskEventHub())
+    for agent_id, status in agents.items():
+        await manager.register_agent(agent_id, FakeWebSocket())
+        await manager.update_agent_status(agent_id, status)
+    return manager
+
+def test_dispatch_respects_capabilities_and_concurrency():
+    async def scenario():
+        manager = await make_manager({
+            "agent_1": {"capabilities": ["analyze"], "max_concurrent_tasks": 2},
+            "agent_2": {"capabilities": ["analyze"], "max_concurrent_tasks": 1},
+        })
+        await manager.task_store.enqueue_many(
+            [{"task_id": f"t{i}", "type": "analyze"} for i in range(5)]
+            + [{"task_id": "keywords", "type": "generate_keywords"}]
+        )
+
+        dispatched = await manager.dispatch_queued()
+        queued = [r["task_id"] for r in await manager.task_store.list_queued()]
+        await asyncio.sleep(0)
+        tasks = await manager.state.get_agent_tasks(["agent_1", "agent_2"])
+        return dispatched, tasks, queued, manager.agents["agent_1"].websocket.sent
+
+    dispatched, tasks, queued, sent = asyncio.run(scenario())
+    assert dispatched == 3
+    assert {agent_id: len(t) for agent_id, t in tasks.items()} == {"agent_1": 2, "agent_2": 1}
+    assert len(queued) == 3 and "keywords" in queued
+    assert all(m["type"] == "task" and m["task_type"] == "analyze" for m in sent)
+
+def test_dispatch_fills_free_capacity_from_one_snapshot():
+    async def scenario():
+        manager = await make_manager({
+            "agent_1": {"capabilities": ["analyze"], "max_concurrent_tasks": 2},
+            "agent_2": {"capabilities": ["analyze"], "max_concurrent_tasks": 1},
+        }, state=CountingState())
+        await manager.task_store.enqueue_many([{"task_id": f"t{i}", "type": "analyze"} for i in range(6)])
+        manager.state.reads = 0
+
+        dispatched = await manager.dispatch_queued()
+        return dispatched, manager.state.reads, await manager.task_store.count_queued()
+
+    assert asyncio.run(scenario()) == (3, 1, 3)
+
+def test_dispatch_skips_tasks_no_agent_can_run():
+    async def scenario():
+        manager = await make_manager({"agent_1": {"capabilities": ["analyze"], "max_concurrent_tasks": 1}})
+        await manager.task_store.enqueue_many([
+            {"task_id": "keywords", "type": "generate_keywords"},
+            {"task_id": "targeted", "type": "analyze", "target_agent": "agent_2"},
+            {"task_id": "analyze", "type": "analyze"},
+        ])
+        await manager.dispatch_queued()
+        return {t: (await manager.task_store.get(t))["status"] for t in ("keywords", "targeted", "analyze")}
+
+    assert asyncio.run(scenario()) == {
+        "keywords": TaskStatus.QUEUED,
+        "targeted": TaskStatus.QUEUED,
+        "analyze": TaskStatus.DISPATCHED,
+    }
+
+def test_targeted_task_waits_for_its_agent():
+    async def scenario():
+        manager = await make_manager({"agent_1": {"capabilities": ["analyze"]}})
+        task = {"task_id": "a", "type": "analyze", "target_agent": "agent_2"}
+        await manager.task_store.enqueue(task)
+
+        assert await manager.route_task(task) is None
+        await manager.register_agent("agent_2", FakeWebSocket())
+        await manager.update_agent_status("agent_2", {"status": "ready"})
+        return (await manager.task_store.get("a"))["assigned_agent"]
+
+    assert asyncio.run(scenario()) == "agent_2"
+
+def test_finishing_a_task_dispatches_the_next():
+    async def scenario():
+        manager = await make_manager({"agent_1": {"capabilities": ["analyze"], "max_concurrent_tasks": 1}})
+        first, second = {"task_id": "a", "type": "analyze"}, {"task_id": "b", "type": "analyze"}
+        await manager.task_store.enqueue_many([first, second])
+
+        assert await manager.route_task(first) == "agent_1"
+        assert await manager.route_task(second) is None
+        await manager.finish_task("agent_1", "a", result="done")
+        return {t: (await manager.task_store.get(t))["status"] for t in ("a", "b")}
+
+    assert asyncio.run(scenario()) == {"a": TaskStatus.COMPLETED, "b": TaskStatus.DISPATCHED}
+
+def test_resumed_agent_gets_only_tasks_it_is_not_running():
+    async def scenario():
+        manager = await make_manager({"agent_1": {"capabilities": ["analyze"]}})
+        await manager.task_store.enqueue_many([{"task_id": "a", "type": "analyze"}, {"task_id": "b", "type": "analyze"}])
+        await manager.dispatch_queued()
+
+        socket = FakeWebSocket()
+        await manager.register_agent("agent_1", socket)
+        await manager.update_agent_status("agent_1", {"status": "ready", "current_tasks": ["a"]})
+        await asyncio.sleep(0)
+        outstanding = await manager.state.get_agent_tasks(["agent_1"])
+        return [m["task_id"] for m in socket.sent if m["type"] == "task"], outstanding["agent_1"]
+
+    sent, outstanding = asyncio.run(scenario())
+    assert sent == ["b"]
+    assert sorted(outstanding) == ["a", "b"]
+
+def test_lost_agents_tasks_are_requeued_after_grace():
+    async def scenario():
+        manager = await make_manager({"agent_1": {"capabilities": ["analyze"]}})
+        manager.requeue_grace = 0
+        await manager.task_store.enqueue({"task_id": "a", "type": "analyze"})
+        await manager.dispatch_queued()
+
+        # A stale connection closing leaves the agent registered
+        stale = manager.agents["agent_1"]
+        await manager.register_agent("agent_1", FakeWebSocket())
+        await manager.unregister_agent("agent_1", stale)
+        assert "agent_1" in manager.agents
+
+        await manager.unregister_agent("agent_1")
+        await manager.register_agent("agent_2", FakeWebSocket())
+        await manager.update_agent_status("agent_2", {"capabilities": ["analyze"]})
+        await asyncio.sleep(0.01)
+        record = await manager.task_store.get("a")
+        return record["assigned_agent"], record["attempts"]
+
+    assert asyncio.run(scenario()) == ("agent_2", 2)
+
+def test_tasks_are_relayed_to_agents_on_other_nodes():
+    async def scenario():
+        redis = FakeRedis()
+        store = create_task_store("sqlite:///")
+        await store.initialize()
+        nodes = [AgentManager(store, RedisStateBackend(redis, node_id), TaskEventHub()) for node_id in ("a", "b")]
+        for node in nodes:
+            await node.state.initialize()
+
+        socket = FakeWebSocket()
+        await nodes[1].register_agent("agent_1", socket)
+        await nodes[1].update_agent_status("agent_1", {"capabilities": ["analyze"]})
+        await store.enqueue({"task_id": "t", "type": "analyze"})
+
+        # The node without the connection claims the task and relays it
+        assert await nodes[0].dispatch_queued() == 1
+        assert await nodes[1].dispatch_queued() == 0
+        await asyncio.sleep(0.01)
+        return [m["task_id"] for m in socket.sent if m["type"] == "task"]
+
+    assert asyncio.run(scenario()) == ["t"]
+
+def test_tasks_past_their_deadline_expire_instead_of_dispatching():
+    async def scenario():
+        manager = await make_manager({"agent_1": {"capabilities": ["analyze"]}})
+        events = manager.task_events.subscribe("late")
+        await manager.task_store.enqueue_many([
+            {"task_id": "late", "type": "analyze", "deadline": time.time() - 1},
+            {"task_id": "on_time", "type": "analyze", "deadline": time.time() + 60},
+        ])
+
+        dispatched = await manager.dispatch_queued()
+        statuses = {t: (await manager.task_store.get(t))["status"] for t in ("late", "on_time")}
+        return dispatched, statuses, events.get_nowait()
+
+    dispatched, statuses, event = asyncio.run(scenario())
+    assert dispatched == 1
+    assert statuses == {"late": TaskStatus.EXPIRED, "on_time": TaskStatus.DISPATCHED}
+    assert event["event"] == "expired"
+
+def test_cancelling_a_running_task_frees_its_agent():
+    async def scenario():
+        manager = await make_manager({"agent_1": {"capabilities": ["analyze"], "max_concurrent_tasks": 1}})
+        await manager.task_store.enqueue_many([{"task_id": "a", "type": "analyze"}, {"task_id": "b", "type": "analyze"}])
+        await manager.dispatch_queued()
+
+        record = await manager.cancel_task("a")
+        # The agent's result arrives after the cancel and is ignored
+        recorded = await manager.finish_task("agent_1", "a", result="late")
+        await asyncio.sleep(0)
+        sent = [(m["type"], m["task_id"]) for m in manager.agents["agent_1"].websocket.sent]
+        return record["status"], recorded, (await manager.task_store.get("a"))["result"], sent, await manager.task_store.get("b")
+
+    status, recorded, result, sent, next_task = asyncio.run(scenario())
+    assert status == TaskStatus.CANCELLED
+    assert not recorded
+    assert result is None
+    assert sent == [("task", "a"), ("cancel", "a"), ("task", "b")]
+    assert next_task["status"] == TaskStatus.DISPATCHED
+
+def test_cancel_during_an_in_flight_completion_is_kept():
+    async def scenario():
+        manager = await make_manager({"agent_1": {"capabilities": ["analyze"]}})
+        await manager.task_store.enqueue({"task_id": "a", "type": "analyze"})
+        await manager.dispatch_queued()
+        events = manager.task_events.subscribe("a")
+
+        # Hold the completion's write until the cancel has gone through
+        complete = manager.task_store.complete
+        release = asyncio.Event()
+
+        async def slow_complete(task_id, result):
+            await release.wait()
+            return await complete(task_id, result)
+
+        manager.task_store.complete = slow_complete
+        finishing = asyncio.create_task(manager.finish_task("agent_1", "a", result="done"))
+        await asyncio.sleep(0)
+        cancelled = await manager.cancel_task("a")
+        release.set()
+        recorded = await finishing
+
+        published = []
+        while not events.empty():
+            published.append(events.get_nowait()["event"])
+        return cancelled["status"], recorded, await manager.task_store.get("a"), published
+
+    status, recorded, record, published = asyncio.run(scenario())
+    assert status == TaskStatus.CANCELLED
+    assert not recorded
+    assert record["status"] == TaskStatus.CANCELLED
+    assert record["result"] is None
+    assert published == ["cancelled"]
+
+def test_finished_tasks_cannot_be_cancelled():
+    async def scenario():
+        manager = await make_manager({"agent_1": {"capabilities": ["analyze"]}})
+        await manager.task_store.enqueue({"task_id": "a", "type": "analyze"})
+        await manager.dispatch_queued()
+        await manager.finish_task("agent_1", "a", result="done")
+        return await manager.cancel_task("a"), await manager.cancel_task("missing")
+
+    record, missing = asyncio.run(scenario())
+    assert record["status"] == TaskStatus.COMPLETED
+    assert missing is None
+
+def test_resume_claims_queued_targeted_tasks():
+    async def scenario():
+        manager = await make_manager({"agent_1": {"capabilities": ["analyze"]}})
+        await manager.task_store.enqueue_many([
+            {"task_id": "mine", "type": "analyze", "target_agent": "agent_1"},
+            {"task_id": "taken", "type": "analyze", "target_agent": "agent_1"},
+        ])
+        pending = await manager.task_store.pending_for_agent("agent_1")
+        # Another node dispatches this one after the pending tasks were read
+        await manager.task_store.claim("taken", "agent_1")
+
+        async def stale_pending(agent_id):
+            return pending
+
+        manager.task_store.pending_for_agent = stale_pending
+        await manager.resume_agent("agent_1")
+        outstanding = await manager.state.get_agent_tasks(["agent_1"])
+        return [await manager.task_store.get(t) for t in ("mine", "taken")], outstanding["agent_1"]
+
+    (mine, taken), outstanding = asyncio.run(scenario())
+    assert mine["status"] == TaskStatus.DISPATCHED
+    assert mine["attempts"] == 1
+    # Sent and counted once, by the node that claimed it
+    assert taken["attempts"] == 1
+    assert outstanding == ["mine"]
+
+def test_tasks_of_agents_on_dead_nodes_are_redispatched():
+    async def scenario():
+        manager = await make_manager({"agent_1": {"capabilities": ["analyze"]}})
+        await manager.state.set_agent("agent_2", {"node": "dead_node", "capabilities": ["analyze"]})
+        await manager.task_store.enqueue_many([{"task_id": "t", "type": "analyze", "target_agent": None}])
+        await manager.task_store.claim("t", "agent_2")
+
+        await manager.check_agents()
+        return await manager.task_store.get("t")
+
+    record = asyncio.run(scenario())
+    assert record["status"] == TaskStatus.DISPATCHED
+    assert record["assigned_agent"] == "agent_1"
+
+def test_lifespan_opens_and_closes_the_server_state(monkeypatch):
+    async def scenario():
+        manager = AgentManager(create_task_store("sqlite:///"), InMemoryStateBackend(), TaskEventHub())
+        monkeypatch.setattr(main, "agent_manager", manager)
+        async with main.lifespan(main.app):
+            await manager.task_store.enqueue({"task_id": "a", "type": "analyze"})
+            monitoring = not manager._monitor.done()
+        await asyncio.sleep(0)
+        return monitoring, manager._monitor.cancelled(), manager.task_store._conn
+
+    monitoring, stopped, conn = asyncio.run(scenario())
+    assert monitoring and stopped
+    assert conn is None
@@ -0,0 +1,58 @@
+import asyncio
+import random
+import pytest
+from backend.ai.base_provider import AIProviderError, RateLimitError
+from backend.ai.fake_provider import FakeAIProvider, parse_latency
+
+def test_latency_distributions():
+    rng = random.Random(1)
+
+    assert parse_latency("fixed:250")(rng) == 0.25
+    assert all(0.1 <= parse_latency("uniform:100:200")(rng) <= 0.2 for _ in range(100))
+    assert parse_latency("lognormal:0:0.5")(rng) == 0.0
+    for spec in ("fixed", "gaussian:100", "uniform:1"):
+        with pytest.raises(ValueError):
+            parse_latency(spec)
+
+def test_outputs_depend_only_on_the_input(fake_provider):
+    other = FakeAIProvider(latency="fixed:0", seed=2)
+
+    async def scenario():
+        return (
+            await fake_provider.optimize_text("some text to rewrite"),
+            await other.optimize_text("some text to rewrite"),
+            await fake_provider.generate_keywords("seo"),
+            await fake_provider.analyze_text("a page", fields=["seo_score"]),
+        )
+
+    optimized, optimized_elsewhere, keywords, analysis = asyncio.run(scenario())
+    assert optimized == optimized_elsewhere
+    assert len(optimized.split()) == 4
+    assert len(keywords) == 10 and all(k.startswith("seo ") for k in keywords)
+    assert list(analysis) == ["seo_score"]
+
+def test_streamed_text_matches_generated_text(fake_provider):
+    async def scenario():
+        chunks = [chunk async for chunk in fake_provider.stream_text("topic")]
+        return chunks, await fake_provider.generate_text("topic")
+
+    chunks, text = asyncio.run(scenario())
+    assert len(chunks) > 1
+    assert "".join(chunks).strip() == text
+
+def test_packed_batches_are_answered_per_document(fake_provider):
+    results = asyncio.run(fake_provider.analyze_batch(["first page", "second page", "third page"]))
+
+    assert len(results) == 3
+    assert all("seo_score" in r and "index" not in r for r in results)
+    assert fake_provider.calls == 1
+
+def test_configured_failure_rates():
+    async def outcomes(provider):
+        results = await asyncio.gather(*(provider.analyze_text(str(i)) for i in range(200)), return_exceptions=True)
+        return [type(r) for r in results]
+
+    limited = asyncio.run(outcomes(FakeAIProvider(latency="fixed:0", rate_limit_rate=1, seed=1)))
+    failing = asyncio.run(outcomes(FakeAIProvider(latency="fixed:0", error_rate=0.5, seed=1)))
+    assert set(limited) == {RateLimitError}
+    assert 60 < failing.count(AIProviderError) < 140
@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+from backend.agents.keyword_index import KeywordIndex, canonical_key, normalize_keyword
+
+def run(coro):
+    return asyncio.run(coro)
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "keywords.db")
+
+def test_normalized_and_canonical_forms():
+    assert normalize_keyword(" Best SEO-Tools! ") == "best seo tools"
+    assert canonical_key("best SEO tools") == canonical_key("seo tool best") == "best seo tool"
+    assert canonical_key("content strategies") == canonical_key("strategy content")
+
+def test_reorderings_and_plurals_are_stored_once(path):
+    index = KeywordIndex(path)
+
+    stored = run(index.add("seo", ["best SEO tools", "seo tool best", "Best seo tool", "content strategy"]))
+
+    assert stored == ["best seo tools", "content strategy"]
+    assert run(index.get_stats())["keywords"] == 2
+
+def test_near_duplicates_collapse_to_one_keyword(path):
+    index = KeywordIndex(path, similarity_threshold=0.75)
+
+    stored = run(index.add("keyword research", ["keyword research tool", "keyword reserch tool", "keyword research guide"]))
+
+    # The misspelling joins the first keyword's cluster but is kept in the index
+    assert stored == ["keyword research tool", "keyword research guide"]
+    stats = run(index.get_stats())
+    assert stats["keywords"] == 3
+    assert stats["clusters"] == 2
+
+def test_similarity_threshold_controls_collapsing(path):
+    index = KeywordIndex(path, similarity_threshold=0.95)
+
+    stored = run(index.add("keyword research", ["keyword research tool", "keyword reserch tool"]))
+
+    assert stored == ["keyword research tool", "keyword reserch tool"]
+
+def test_stored_topic_is_returned_in_any_word_order(path):
+    index = KeywordIndex(path)
+    run(index.add("SEO tools", ["seo audit", "rank tracker"]))
+
+    # A stored topic is answered however few keywords it has
+    assert run(index.lookup("tool seo", min_results=10)) == ["seo audit", "rank tracker"]
+    assert run(index.lookup("seo tools", limit=1)) == ["seo audit"]
+
+def test_other_topics_need_enough_matching_keywords(path):
+    index = KeywordIndex(path)
+    run(index.add("backlinks", [
+        "link building strategy", "link building tools", "broken link building", "content marketing",
+    ]))
+
+    assert run(index.lookup("link building", min_results=3)) == [
+        "link building strategy", "link building tools", "broken link building",
+    ]
+    assert run(index.lookup("link building", min_results=4)) is None
+    # A limit below min_results lowers the number needed
+    assert run(index.lookup("link building", limit=2, min_results=10)) == [
+        "link building strategy", "link building tools",
+    ]
+    assert run(index.lookup("email marketing", min_results=1)) is None
+
+def test_keywords_sharing_word_pairs_rank_first(path):
+    index = KeywordIndex(path)
+    run(index.add("seo", ["tools for local seo", "local seo tools"]))
+
+    assert run(index.lookup("seo tools", min_results=1)) == ["local seo tools", "tools for local seo"]
+
+def test_index_is_shared_through_its_database(path):
+    first, second = KeywordIndex(path), KeywordIndex(path)
+    run(first.add("seo tools", ["seo audit", "rank tracker"]))
+
+    assert run(second.lookup("seo tools")) == ["seo audit", "rank tracker"]
+    # Keywords already stored by the other instance are not duplicated
+    assert run(second.add("audits", ["SEO audits"])) == ["seo audit"]
+    assert run(second.get_stats())["keywords"] == 2
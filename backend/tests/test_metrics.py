@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from backend.ai.base_provider import RateLimitError
+from backend.ai.instrumented import InstrumentedAIProvider
+from backend.telemetry.metrics import MetricsRegistry, render, with_labels
+
+def samples(registry, name):
+    family = next(f for f in registry.collect() if f["name"] == name)
+    return {(sample_name, tuple(sorted(labels.items()))): value for sample_name, labels, value in family["samples"]}
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", ("method",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 5):
+        latency.observe(value, method="analyze")
+
+    values = samples(registry, "latency_seconds")
+    buckets = [values[("latency_seconds_bucket", (("le", le), ("method", "analyze")))] for le in ("0.1", "1", "+Inf")]
+    assert buckets == [1, 3, 4]
+    assert values[("latency_seconds_count", (("method", "analyze"),))] == 4
+    assert values[("latency_seconds_sum", (("method", "analyze"),))] == pytest.approx(6.05)
+
+def test_render_merges_families_pushed_by_several_agents():
+    registry = MetricsRegistry()
+    tasks = registry.counter("tasks_total", "Tasks run", ("type",))
+    tasks.inc(type="analyze")
+    tasks.inc(2, type="analyze")
+    registry.gauge("queue_depth", "Queued tasks", func=lambda: 7)
+
+    families = with_labels(registry.collect(), agent="a") + with_labels(registry.collect(), agent="b")
+    text = render(families)
+
+    assert text.count("# TYPE tasks_total counter") == 1
+    assert 'tasks_total{agent="a",type="analyze"} 3' in text
+    assert 'tasks_total{agent="b",type="analyze"} 3' in text
+    assert 'queue_depth{agent="a"} 7' in text
+
+def test_metric_names_keep_their_type():
+    registry = MetricsRegistry()
+    registry.counter("calls_total")
+
+    with pytest.raises(ValueError):
+        registry.gauge("calls_total")
+
+def test_provider_calls_are_timed_and_errors_counted(provider):
+    registry = MetricsRegistry()
+    instrumented = InstrumentedAIProvider(provider, registry)
+    asyncio.run(instrumented.analyze_text("some text"))
+    provider.errors = [RateLimitError("429")]
+    with pytest.raises(RateLimitError):
+        asyncio.run(instrumented.analyze_text("some text"))
+
+    latency = samples(registry, "ai_call_duration_seconds")
+    counts = [
+        latency[("ai_call_duration_seconds_count", (("method", "analyze_text"), ("outcome", outcome), ("provider", "recording")))]
+        for outcome in ("ok", "error")
+    ]
+    assert counts == [1, 1]
+    errors = samples(registry, "ai_errors_total")
+    assert errors[("ai_errors_total", (("error", "rate_limited"), ("method", "analyze_text"), ("provider", "recording")))] == 1
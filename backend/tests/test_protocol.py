@@ -0,0 +1,47 @@
+import pytest
+from backend.mcp_server.protocol import (
+    FLAG_RAW, FLAG_ZLIB, WireCodec, codec_for_subprotocol, negotiate, offered_subprotocols,
+)
+
+MESSAGE = {"type": "task", "task_id": "a", "data": {"content": "word " * 400, "keywords": ["seo"]}}
+
+@pytest.mark.parametrize("encoding,compression", [
+    ("json", None), ("msgpack", None), ("msgpack", "zlib"), ("msgpack", "zstd"),
+])
+def test_codecs_round_trip(encoding, compression):
+    codec = WireCodec(encoding, compression)
+
+    assert codec.decode(codec.encode(MESSAGE)) == MESSAGE
+    assert codec.decode(codec.encode({"type": "heartbeat"})) == {"type": "heartbeat"}
+
+def test_only_large_binary_frames_are_compressed():
+    codec = WireCodec("msgpack", "zlib", compress_min_bytes=1024)
+
+    large = codec.encode(MESSAGE)
+    small = codec.encode({"type": "heartbeat"})
+    assert large[0] == FLAG_ZLIB and len(large) < len(str(MESSAGE)) / 4
+    assert small[0] == FLAG_RAW
+
+def test_binary_codec_reads_json_text_frames():
+    assert WireCodec("msgpack", "zlib").decode(WireCodec("json").encode(MESSAGE)) == MESSAGE
+
+def test_unknown_frame_flag_is_rejected():
+    with pytest.raises(ValueError):
+        WireCodec("msgpack").decode(bytes([9]) + b"body")
+
+def test_server_picks_the_first_supported_offer():
+    offered = offered_subprotocols("msgpack", "zstd")
+    assert offered == ["mcp.msgpack.zstd", "mcp.msgpack.zlib", "mcp.msgpack", "mcp.json"]
+
+    subprotocol, codec = negotiate(["mcp.msgpack.brotli", "other"] + offered[1:])
+    assert subprotocol == "mcp.msgpack.zlib"
+    assert (codec.encoding, codec.compression) == ("msgpack", "zlib")
+
+def test_agents_offering_nothing_speak_json():
+    subprotocol, codec = negotiate([])
+    assert subprotocol is None
+    assert codec.encoding == "json"
+
+    # The agent follows whatever the server accepted
+    assert codec_for_subprotocol(None).encoding == "json"
+    assert codec_for_subprotocol("mcp.msgpack.zstd").subprotocol == "mcp.msgpack.zstd"
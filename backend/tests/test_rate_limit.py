@@ -0,0 +1,109 @@
+import asyncio
+import time
+import pytest
+from backend.ai.base_provider import RateLimitError
+from backend.ai import rate_limit
+from backend.ai.provider_factory import AIProviderFactory
+from backend.ai.rate_limit import AdaptiveConcurrencyLimiter, RateLimitedAIProvider, RedisTokenBucket, TokenBucket, create_bucket
+from backend.mcp_server.fake_redis import FakeRedis
+
+def test_token_bucket_waits_for_refill():
+    async def scenario():
+        bucket = TokenBucket(per_minute=600, capacity=2)
+        started = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    # Two tokens are available at once, the third refills at 10 per second
+    assert 0.08 <= asyncio.run(scenario()) < 0.5
+
+def test_shared_bucket_is_one_budget_for_every_process(monkeypatch):
+    monkeypatch.setattr(rate_limit.time, "time", lambda: 120.0)
+
+    async def scenario():
+        redis = FakeRedis()
+        # Two agents, e.g. in different worker processes, sharing one Redis
+        first = RedisTokenBucket(redis, "ai_rate:fake:requests", per_minute=3)
+        second = RedisTokenBucket(redis, "ai_rate:fake:requests", per_minute=3)
+        for bucket in (first, second, first):
+            await bucket.acquire()
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(second.acquire(), 0.05)
+        # The call that did not fit gave its token back
+        return await redis.get("ai_rate:fake:requests:2")
+
+    assert asyncio.run(scenario()) == "3"
+
+def test_budget_is_split_between_agents_without_a_shared_store(monkeypatch):
+    monkeypatch.delenv("AI_RATE_LIMIT_URL", raising=False)
+    monkeypatch.setenv("AI_RATE_LIMIT_SHARES", "4")
+
+    assert create_bucket("fake:requests", 60).rate == 0.25
+    assert create_bucket("fake:tokens", 0) is None
+
+def test_factory_shares_one_bucket_through_the_rate_limit_url(monkeypatch):
+    monkeypatch.setenv("AI_METRICS_ENABLED", "false")
+    monkeypatch.setenv("AI_RATE_LIMIT_URL", "fakeredis://")
+    monkeypatch.setenv("AI_TOKENS_PER_MINUTE", "0")
+    monkeypatch.setattr(rate_limit, "_shared_clients", {})
+
+    first = AIProviderFactory.wrap_model(AIProviderFactory.create_base_provider("fake"))
+    second = AIProviderFactory.wrap_model(AIProviderFactory.create_base_provider("fake"))
+
+    assert isinstance(first.request_bucket, RedisTokenBucket)
+    assert first.request_bucket.redis is second.request_bucket.redis
+    assert first.token_bucket is None
+
+def test_limiter_halves_on_overload_and_grows_on_success():
+    limiter = AdaptiveConcurrencyLimiter(initial=8, minimum=2)
+    limiter.on_overload()
+    assert limiter.limit == 4
+    for _ in range(4):
+        limiter.on_success()
+    assert int(limiter.limit) == 4 and limiter.limit > 4.9
+    for _ in range(5):
+        limiter.on_overload()
+    assert limiter.limit == 2
+
+def test_concurrent_calls_are_capped(provider):
+    async def scenario():
+        provider.gate = asyncio.Event()
+        limited = RateLimitedAIProvider(provider, requests_per_minute=0, concurrency=AdaptiveConcurrencyLimiter(initial=2))
+        calls = [asyncio.create_task(limited.generate_text(f"p{i}")) for i in range(4)]
+        await asyncio.sleep(0.01)
+        started = len(provider.calls)
+        provider.gate.set()
+        await asyncio.gather(*calls)
+        return started
+
+    assert asyncio.run(scenario()) == 2
+
+def test_rate_limit_errors_reduce_concurrency_and_retry(provider):
+    provider.errors = [RateLimitError("429")]
+    limited = RateLimitedAIProvider(provider, requests_per_minute=0, backoff_base=0)
+
+    assert asyncio.run(limited.generate_text("prompt")) == "text for prompt"
+    stats = limited.get_stats()
+    assert (stats["rate_limited"], stats["retries"], stats["concurrency_limit"]) == (1, 1, 2)
+    assert len(provider.calls) == 2
+
+def test_rate_limit_errors_raise_after_max_retries(provider):
+    provider.errors = [RateLimitError("429") for _ in range(3)]
+    limited = RateLimitedAIProvider(provider, requests_per_minute=0, max_retries=2, backoff_base=0)
+
+    with pytest.raises(RateLimitError):
+        asyncio.run(limited.generate_text("prompt"))
+    assert len(provider.calls) == 3
+
+def test_stream_retries_rate_limits_before_the_first_chunk(provider):
+    async def collect(limited):
+        return [chunk async for chunk in limited.stream_text("prompt")]
+
+    provider.errors = [RateLimitError("429")]
+    limited = RateLimitedAIProvider(provider, requests_per_minute=0, backoff_base=0)
+
+    assert asyncio.run(collect(limited)) == ["text for prompt"]
+    assert limited.get_stats()["retries"] == 1
+    assert limited.get_stats()["in_flight"] == 0
@@ -0,0 +1,53 @@
+from backend.agents.seo_analyzer import KeywordMatcher, SeoAnalyzer
+
+TEXTS = [
+    "",
+    "# Best SEO Tools\n\nSEO tools make the table simple. Free tools are great!\n\n## Why use them?\n",
+    "<h1>Guide</h1><p>Write the code. Ship it quickly!</p><h3>Skipped level</h3><li>one<li>two<li>three",
+    "No sentence end here and a trailing e: the large tree agree",
+    "Ünïcödé wörds, İstanbul café! Numbers 2024 and don't forget it's 'quoted'.",
+    "A sentence ending at the document end.",
+    "...!!! ??? \n\n\n",
+    "<p>unclosed tag < at the end",
+    "Non-breaking.\u00a0Space after a full stop.\u2028Line separator!",
+]
+
+def test_keywords_prefer_the_longest_match():
+    matcher = KeywordMatcher(["SEO", "seo tools", " seo ", "code"])
+
+    assert matcher.count("SEO tools help SEO. Barcode is not code!") == {"seo tools": 1, "seo": 1, "code": 1}
+
+def test_keywords_match_across_unicode_case():
+    matcher = KeywordMatcher(["istanbul", "straße", "σας"])
+
+    assert matcher.count("İstanbul and ISTANBUL. STRAẞE or Straße. ΣΑΣ") == {"istanbul": 2, "straße": 2, "σας": 1}
+
+def test_keywords_may_start_or_end_with_punctuation():
+    matcher = KeywordMatcher(["c++", ".net", "c"])
+
+    assert matcher.count("Use C++ or .NET, not c, and not abc++ or asp.net.") == {"c++": 1, ".net": 1, "c": 1}
+
+def test_heading_structure_issues():
+    analyzer = SeoAnalyzer()
+
+    result = analyzer.analyze("<h1>Guide</h1><p>Write it.</p><h3>Skipped level</h3>")
+    assert result["metrics"]["heading_counts"] == {"h1": 1, "h3": 1}
+    assert result["metrics"]["structure_issues"] == ["heading levels are skipped"]
+
+    result = analyzer.analyze("Just text. No headings.")
+    assert result["metrics"]["structure_issues"] == ["missing H1 heading", "no H2/H3 subheadings"]
+    assert result["metrics"]["sentence_count"] == 2
+
+def test_lists_are_snippet_eligible():
+    analyzer = SeoAnalyzer()
+
+    assert analyzer.analyze("# Steps\n\n- one\n- two\n- three\n")["featured_snippet_potential"]
+    assert not analyzer.analyze("# Steps\n\n- one\n- two\n")["featured_snippet_potential"]
+
+def test_batch_matches_single_document_analysis():
+    analyzer = SeoAnalyzer(["seo tools", "seo", "code"])
+
+    assert analyzer.analyze_batch(TEXTS) == [analyzer.analyze(text) for text in TEXTS]
+
+def test_batch_of_none():
+    assert SeoAnalyzer().analyze_batch([]) == []
@@ -0,0 +1,64 @@
+import asyncio
+import pytest
+from backend.mcp_server.fake_redis import FakeRedis
+from backend.mcp_server.state import RedisStateBackend, create_state_backend
+
+@pytest.fixture(params=["memory://", "fakeredis://"])
+def state(request):
+    return create_state_backend(request.param)
+
+def test_agent_registry_and_task_table(state):
+    async def scenario():
+        await state.set_agent("agent_1", {"node": state.node_id, "capabilities": ["analyze"]})
+        await state.set_agent("agent_1", {"max_concurrent_tasks": 2})
+        await state.set_agent_tasks("agent_1", ["a", "b", "a"])
+        await state.add_agent_task("agent_1", "c")
+        await state.remove_agent_task("agent_1", "a")
+        before = await state.get_agents(), await state.get_agent_tasks(["agent_1", "agent_2"])
+
+        # Only the node holding the agent may remove it
+        await state.remove_agent("agent_1", "other-node")
+        kept = "agent_1" in await state.get_agents()
+        await state.remove_agent("agent_1", state.node_id)
+        return before, kept, await state.get_agents()
+
+    (agents, tasks), kept, after = asyncio.run(scenario())
+    assert agents["agent_1"]["capabilities"] == ["analyze"]
+    assert agents["agent_1"]["max_concurrent_tasks"] == 2
+    assert sorted(tasks["agent_1"]) == ["b", "c"]
+    assert tasks["agent_2"] == []
+    assert kept
+    assert after == {}
+
+def test_context_entries_and_versions(state):
+    async def scenario():
+        first = await state.next_context_version()
+        last = await state.next_context_version(2)
+        await state.set_context_entries({"topic": {"value": "seo", "version": first}})
+        await state.set_context_entries({"tone": {"value": "formal", "version": last}})
+        await state.delete_context_keys(["topic", "missing"])
+        return first, last, await state.context_version(), await state.get_context_entries()
+
+    assert asyncio.run(scenario()) == (1, 3, 3, {"tone": {"value": "formal", "version": 3}})
+
+def test_relayed_messages_reach_other_nodes_only():
+    async def scenario():
+        redis = FakeRedis()
+        nodes = [RedisStateBackend(redis, node_id) for node_id in ("a", "b", "c")]
+        received = {node.node_id: [] for node in nodes}
+
+        def handler(node_id):
+            async def handle(message):
+                received[node_id].append(message["n"])
+            return handle
+
+        for node in nodes:
+            node.set_relay_handler(handler(node.node_id))
+            await node.initialize()
+
+        await nodes[0].relay({"kind": "publish", "n": 1})
+        await nodes[0].relay({"kind": "deliver", "n": 2}, "c")
+        await asyncio.sleep(0.01)
+        return received
+
+    assert asyncio.run(scenario()) == {"a": [], "b": [1], "c": [1, 2]}
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import pytest
+from backend.ai.base_provider import BaseAIProvider, StructuredOutputError, analysis_prompt
+from backend.ai.provider_factory import AIProviderFactory
+from backend.ai.structured import ContentAnalysis, parse_partial, validate_fields
+
+FULL = {
+    "seo_score": 80,
+    "readability_score": 70,
+    "keyword_usage": ["seo"],
+    "structure_analysis": "Good",
+    "engagement_score": 60,
+    "featured_snippet_potential": True,
+}
+
+class ScriptedProvider(BaseAIProvider):
+    """Returns the scripted responses in order and records each prompt"""
+
+    name = "scripted"
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.prompts = []
+
+    async def generate_text(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return self.responses.pop(0)
+
+    async def analyze_text(self, text, **kwargs):
+        return await self.generate_structured(
+            "analyze_text", lambda fields: analysis_prompt(text, fields), kwargs.get("fields"),
+        )
+
+    async def optimize_text(self, text, **kwargs):
+        return text
+
+    async def generate_keywords(self, topic, **kwargs):
+        return await self.generate_structured("generate_keywords", lambda fields: f"keywords for {topic}")
+
+@pytest.mark.parametrize("text, expected, complete", [
+    ('{"a": 1}', {"a": 1}, True),
+    ('Here you go:\n```json\n{"a": [1, 2,],}\n```\nThanks', {"a": [1, 2]}, True),
+    ('{"ok": True, "missing": None}', {"ok": True, "missing": None}, True),
+    ('{"a": 1, "b": [1, 2', {"a": 1, "b": [1, 2]}, False),
+    ('{"a": 1, "b": "unterminated', {"a": 1, "b": "unterminated"}, False),
+    ('{"a": 1, "b": {"c": ', {"a": 1, "b": {}}, False),
+    ('The list is ["seo", "tools"] as requested', ["seo", "tools"], True),
+])
+def test_parse_partial_repairs_responses(text, expected, complete):
+    assert parse_partial(text) == (expected, complete)
+
+def test_parse_partial_rejects_text_without_json():
+    with pytest.raises(ValueError):
+        parse_partial("no json here")
+
+def test_validate_fields_drops_invalid_values():
+    values, missing = validate_fields(
+        {"seo_score": 150, "readability_score": "70", "keyword_usage": ["seo"]},
+        ContentAnalysis,
+        ["seo_score", "readability_score", "keyword_usage", "engagement_score"],
+    )
+    assert values == {"readability_score": 70, "keyword_usage": ["seo"]}
+    assert missing == ["seo_score", "engagement_score"]
+
+def test_truncated_response_is_completed_by_asking_for_missing_fields():
+    truncated = '{"seo_score": 80, "readability_score": 70, "keyword_usage": ["seo"], "structure_analysis": "Go'
+    provider = ScriptedProvider([
+        truncated,
+        '{"engagement_score": 60, "featured_snippet_potential": true}',
+    ])
+
+    result = asyncio.run(provider.analyze_text("text"))
+
+    assert result == {**FULL, "structure_analysis": "Go"}
+    # The re-ask names only the fields still missing
+    assert "engagement_score" in provider.prompts[1]
+    assert "seo_score" not in provider.prompts[1]
+
+def test_structured_output_error_after_max_reasks():
+    provider = ScriptedProvider(['{"seo_score": 80}', "not json", '{"seo_score": 90}'])
+
+    with pytest.raises(StructuredOutputError, match="readability_score"):
+        asyncio.run(provider.analyze_text("text"))
+    assert len(provider.prompts) == provider.max_reasks + 1
+
+def test_keyword_list_is_asked_again_whole_and_unwrapped():
+    provider = ScriptedProvider(["Sorry, no keywords", '{"keywords": ["seo", "seo tools"]}'])
+
+    assert asyncio.run(provider.generate_keywords("seo")) == ["seo", "seo tools"]
+    assert provider.prompts == ["keywords for seo"] * 2
+
+def test_reasks_go_through_the_rate_limited_chain(monkeypatch):
+    monkeypatch.setenv("AI_METRICS_ENABLED", "false")
+    rest = {k: v for k, v in FULL.items() if k != "seo_score"}
+    provider = ScriptedProvider(['{"seo_score": 80}', json.dumps(rest)])
+    wrapped = AIProviderFactory.wrap_model(provider)
+
+    assert asyncio.run(wrapped.analyze_text("text")) == FULL
+    assert wrapped.get_stats()["calls"] == 2
+
+def test_packed_analysis_unwraps_objects_and_completes_documents():
+    documents = [{**FULL, "index": 0}, {"index": 1, "seo_score": 10}]
+    rest = {k: v for k, v in FULL.items() if k != "seo_score"}
+    provider = ScriptedProvider([json.dumps({"documents": documents}), json.dumps(rest)])
+
+    results = asyncio.run(provider.analyze_batch(["first", "second"]))
+
+    assert results == [FULL, {**FULL, "seo_score": 10}]
+    assert len(provider.prompts) == 2
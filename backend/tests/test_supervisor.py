@@ -0,0 +1,87 @@
+from backend import supervisor
+from backend.supervisor import Supervisor
+
+class ExitedProcess:
+    """Stands in for a worker process that has already exited"""
+
+    exitcode = 1
+
+    def is_alive(self):
+        return False
+
+    def close(self):
+        pass
+
+def make_supervisor(monkeypatch, clock):
+    sup = Supervisor(
+        processes=2, agents_per_process=2, mcp_server_url="ws://test", id_prefix="agent",
+        restart_base_delay=1.0, restart_max_delay=4.0, stable_after=30.0,
+    )
+    monkeypatch.setattr(supervisor.time, "monotonic", lambda: clock[0])
+    started = []
+
+    def start(slot):
+        slot.process = ExitedProcess()
+        slot.started_at = clock[0]
+        slot.restart_at = None
+        started.append(slot.index)
+
+    monkeypatch.setattr(sup, "_start", start)
+    return sup, started
+
+def test_slots_keep_stable_agent_ids():
+    sup = Supervisor(processes=2, agents_per_process=2, mcp_server_url="ws://test", id_prefix="agent")
+
+    assert [slot.agent_ids for slot in sup.slots] == [["agent_1_1", "agent_1_2"], ["agent_2_1", "agent_2_2"]]
+
+def test_rate_limits_are_split_between_all_agents():
+    sup = Supervisor(processes=3, agents_per_process=2, mcp_server_url="ws://test", id_prefix="agent")
+    assert sup.rate_limit_shares == 6
+
+    sup = Supervisor(processes=3, agents_per_process=2, mcp_server_url="ws://test", id_prefix="agent", rate_limit_shares=12)
+    assert sup.rate_limit_shares == 12
+
+def test_crashing_worker_is_restarted_with_exponential_backoff(monkeypatch):
+    clock = [100.0]
+    sup, started = make_supervisor(monkeypatch, clock)
+    slot = sup.slots[0]
+    sup._start(slot)
+
+    delays = []
+    for _ in range(5):
+        sup._check(slot)
+        delays.append(slot.restart_at - clock[0])
+        clock[0] = slot.restart_at
+        sup._check(slot)
+
+    assert delays == [1.0, 2.0, 4.0, 4.0, 4.0]
+    assert started == [0] * 6
+
+def test_restart_waits_for_the_backoff_delay(monkeypatch):
+    clock = [100.0]
+    sup, started = make_supervisor(monkeypatch, clock)
+    slot = sup.slots[0]
+    sup._start(slot)
+    slot.failures = 2
+
+    sup._check(slot)
+    clock[0] += 3.9
+    sup._check(slot)
+    assert started == [0]
+
+    clock[0] += 0.1
+    sup._check(slot)
+    assert started == [0, 0]
+
+def test_worker_that_ran_stably_resets_its_backoff(monkeypatch):
+    clock = [100.0]
+    sup, _ = make_supervisor(monkeypatch, clock)
+    slot = sup.slots[0]
+    sup._start(slot)
+    slot.failures = 3
+
+    clock[0] += 30.0
+    sup._check(slot)
+
+    assert slot.failures == 1
+    assert slot.restart_at == clock[0] + 1.0
@@ -0,0 +1,17 @@
+import asyncio
+from backend.mcp_server.task_events import TaskEventHub
+
+def test_watchers_receive_events_until_the_task_finishes():
+    async def scenario():
+        hub = TaskEventHub()
+        queue = hub.subscribe("a")
+        hub.publish("a", {"event": "progress", "chunk": "Hello"})
+        hub.publish("b", {"event": "progress", "chunk": "other task"})
+        hub.publish("a", {"event": "completed", "result": "Hello world"})
+        hub.publish("a", {"event": "progress", "chunk": "late"})
+        events = [event async for event in hub.events("a", queue)]
+        return events, hub._subscribers
+
+    events, subscribers = asyncio.run(scenario())
+    assert [e["event"] for e in events] == ["progress", "completed"]
+    assert subscribers == {}
@@ -0,0 +1,171 @@
+import asyncio
+import pytest
+from backend.mcp_server import task_store
+from backend.mcp_server.task_store import TaskPriority, TaskStatus, create_task_store
+
+@pytest.fixture(params=["sqlite:///", "fakeredis://"])
+def store(request):
+    store = create_task_store(request.param)
+    asyncio.run(store.initialize())
+    yield store
+    asyncio.run(store.close())
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_enqueued_tasks_are_queued_oldest_first(store):
+    run(store.enqueue_many([
+        {"task_id": "a", "type": "analyze"},
+        {"task_id": "b", "type": "analyze"},
+    ]))
+    run(store.enqueue({"task_id": "c", "type": "optimize"}))
+
+    assert [r["task_id"] for r in run(store.list_queued())] == ["a", "b", "c"]
+    record = run(store.get("c"))
+    assert record["status"] == TaskStatus.QUEUED
+    assert record["task"] == {"task_id": "c", "type": "optimize"}
+    assert record["attempts"] == 0
+    assert run(store.get("missing")) is None
+
+def test_dispatch_and_completion_are_recorded(store):
+    run(store.enqueue_many([{"task_id": "a", "type": "analyze"}, {"task_id": "b", "type": "analyze"}]))
+
+    record = run(store.mark_dispatched("a", "agent_1"))
+    assert record["status"] == TaskStatus.DISPATCHED
+    assert record["assigned_agent"] == "agent_1"
+    assert record["attempts"] == 1
+
+    run(store.complete("a", {"score": 80}))
+    run(store.fail("b", "boom"))
+    assert run(store.get("a"))["result"] == {"score": 80}
+    assert run(store.get("b"))["error"] == "boom"
+    assert run(store.list_queued()) == []
+
+def test_finished_tasks_are_not_dispatched_again(store):
+    run(store.enqueue({"task_id": "a", "type": "analyze"}))
+    run(store.complete("a", "done"))
+
+    record = run(store.mark_dispatched("a", "agent_1"))
+    assert record["status"] == TaskStatus.COMPLETED
+    assert record["assigned_agent"] is None
+
+def test_pending_for_agent_includes_targeted_tasks(store):
+    run(store.enqueue_many([
+        {"task_id": "a", "type": "analyze", "target_agent": "agent_1"},
+        {"task_id": "b", "type": "analyze"},
+        {"task_id": "c", "type": "analyze", "target_agent": "agent_2"},
+    ]))
+    run(store.mark_dispatched("b", "agent_1"))
+
+    assert [r["task_id"] for r in run(store.pending_for_agent("agent_1"))] == ["a", "b"]
+
+    run(store.complete("b", None))
+    assert [r["task_id"] for r in run(store.pending_for_agent("agent_1"))] == ["a"]
+
+def test_claim_succeeds_once(store):
+    run(store.enqueue_many([{"task_id": "a", "type": "analyze"}]))
+
+    assert run(store.claim("a", "agent_1"))
+    assert not run(store.claim("a", "agent_2"))
+
+    record = run(store.get("a"))
+    assert record["assigned_agent"] == "agent_1"
+    assert record["attempts"] == 1
+    assert run(store.list_queued()) == []
+
+def test_concurrent_claims_have_one_winner(store):
+    run(store.enqueue_many([{"task_id": "a", "type": "analyze"}]))
+
+    async def claim_all():
+        return await asyncio.gather(*(store.claim("a", f"agent_{i}") for i in range(5)))
+
+    assert sum(run(claim_all())) == 1
+
+def test_claim_ignores_tasks_not_queued(store):
+    run(store.enqueue_many([{"task_id": "a", "type": "analyze"}]))
+    run(store.complete("a", None))
+
+    assert not run(store.claim("a", "agent_1"))
+    assert not run(store.claim("missing", "agent_1"))
+
+def test_only_the_first_final_status_is_recorded(store):
+    run(store.enqueue_many([{"task_id": "a", "type": "analyze"}, {"task_id": "b", "type": "analyze"}]))
+    run(store.claim("a", "agent_1"))
+
+    assert run(store.cancel("a"))["status"] == TaskStatus.CANCELLED
+    assert run(store.complete("a", "late")) is None
+    record = run(store.get("a"))
+    assert record["status"] == TaskStatus.CANCELLED
+    assert record["result"] is None
+    assert run(store.fail("missing", "error")) is None
+
+    async def race():
+        return await asyncio.gather(store.complete("b", "done"), store.cancel("b"))
+
+    assert sum(r is not None for r in run(race())) == 1
+
+def test_requeued_task_can_be_claimed_again(store):
+    run(store.enqueue_many([{"task_id": "a", "type": "analyze"}]))
+    run(store.claim("a", "agent_1"))
+
+    assert run(store.requeue_agent_tasks("agent_1")) == 1
+    assert run(store.claim("a", "agent_2"))
+    record = run(store.get("a"))
+    assert record["assigned_agent"] == "agent_2"
+    assert record["attempts"] == 2
+
+def test_queued_tasks_in_priority_order(store):
+    run(store.enqueue_many([
+        {"task_id": "bulk", "type": "analyze", "priority": "bulk"},
+        {"task_id": "interactive", "type": "analyze", "priority": "interactive"},
+        {"task_id": "normal", "type": "analyze"},
+    ]))
+
+    assert [r["task_id"] for r in run(store.list_queued())] == ["interactive", "normal", "bulk"]
+
+def test_old_bulk_tasks_age_past_new_interactive_ones(store, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(task_store.time, "time", lambda: now[0])
+    run(store.enqueue({"task_id": "old_bulk", "type": "analyze", "priority": "bulk"}))
+    now[0] += TaskPriority.BOOSTS[TaskPriority.INTERACTIVE] - 1
+    run(store.enqueue({"task_id": "recent_bulk", "type": "analyze", "priority": "bulk"}))
+    run(store.enqueue({"task_id": "interactive", "type": "analyze", "priority": "interactive"}))
+    now[0] += 2
+    run(store.enqueue({"task_id": "late_interactive", "type": "analyze", "priority": "interactive"}))
+
+    order = [r["task_id"] for r in run(store.list_queued())]
+    assert order == ["interactive", "old_bulk", "late_interactive", "recent_bulk"]
+
+def test_unknown_priority_is_rejected(store):
+    with pytest.raises(ValueError):
+        run(store.enqueue({"task_id": "a", "type": "analyze", "priority": "urgent"}))
+
+def test_sqlite_batch_that_fails_part_way_is_rolled_back():
+    async def scenario():
+        store = create_task_store("sqlite:///")
+        await store.initialize()
+        await store.enqueue_many([{"task_id": "a", "type": "analyze"}])
+
+        with pytest.raises(Exception):
+            await store.enqueue_many([{"task_id": "b", "type": "analyze"}, {"task_id": "a", "type": "analyze"}])
+        await store.enqueue_many([{"task_id": "c", "type": "analyze"}])
+
+        assert await store.get("b") is None
+        assert [r["task_id"] for r in await store.list_queued()] == ["a", "c"]
+        await store.close()
+
+    run(scenario())
+
+def test_enqueue_many_rejects_existing_ids(store):
+    run(store.enqueue_many([{"task_id": "a", "type": "analyze"}]))
+    assert run(store.claim("a", "agent_1"))
+
+    with pytest.raises(Exception):
+        run(store.enqueue_many([{"task_id": "b", "type": "analyze"}, {"task_id": "a", "type": "analyze"}]))
+
+    # The existing record is untouched and the rest of the batch was not queued
+    record = run(store.get("a"))
+    assert record["status"] == TaskStatus.DISPATCHED
+    assert record["assigned_agent"] == "agent_1"
+    assert run(store.get("b")) is None
+    assert run(store.count_queued()) == 0
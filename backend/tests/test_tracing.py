@@ -0,0 +1,75 @@
+import asyncio
+import json
+import pytest
+from backend.telemetry.tracing import NOOP_SPAN, JsonlSpanExporter, Tracer, parse_traceparent
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+def test_nested_spans_join_the_current_trace():
+    exporter = ListExporter()
+    tracer = Tracer("test", exporter)
+
+    async def scenario():
+        with tracer.span("task.process") as parent:
+            with tracer.span("ai.call", attributes={"method": "analyze_text"}) as child:
+                pass
+        await tracer.flush()
+        return parent, child
+
+    parent, child = asyncio.run(scenario())
+    assert child.trace_id == parent.trace_id
+    assert child.parent_id == parent.span_id
+    assert parent.parent_id is None
+    assert [s.name for s in exporter.spans] == ["ai.call", "task.process"]
+
+def test_traceparent_continues_a_trace_from_another_process():
+    tracer = Tracer("agent", ListExporter())
+    server_span = Tracer("server", ListExporter()).start_span("task.enqueue")
+
+    span = tracer.start_span("task.process", parent=server_span.traceparent)
+
+    assert parse_traceparent(server_span.traceparent) == (server_span.trace_id, server_span.span_id, True)
+    assert (span.trace_id, span.parent_id) == (server_span.trace_id, server_span.span_id)
+    assert parse_traceparent("not-a-traceparent") is None
+
+def test_errors_are_recorded_on_the_span():
+    exporter = ListExporter()
+    tracer = Tracer("test", exporter)
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            with tracer.span("task.process"):
+                raise ValueError("bad input")
+        await tracer.flush()
+
+    asyncio.run(scenario())
+    assert exporter.spans[0].error == "bad input"
+
+def test_unsampled_and_disabled_tracing_export_nothing():
+    exporter = ListExporter()
+    unsampled = Tracer("test", exporter, sample_rate=0)
+
+    async def scenario():
+        with unsampled.span("task.process"):
+            pass
+        await unsampled.flush()
+
+    asyncio.run(scenario())
+    assert exporter.spans == []
+    assert Tracer("test").start_span("task.process") is NOOP_SPAN
+
+def test_jsonl_exporter_writes_one_span_per_line(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer("test", JsonlSpanExporter(str(path)))
+    # Without a running loop spans are exported as they end
+    tracer.start_span("task.enqueue", attributes={"task_id": "a"}).end()
+
+    line = json.loads(path.read_text())
+    assert line["name"] == "task.enqueue"
+    assert line["attributes"] == {"task_id": "a"}
+    assert line["service"] == "test"
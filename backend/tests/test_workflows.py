@@ -0,0 +1,124 @@
+import asyncio
+import pytest
+from backend.mcp_server.task_store import TaskStatus, create_task_store
+from backend.mcp_server.workflows import WorkflowEngine, WorkflowError, parse_workflow
+
+def run(coro):
+    return asyncio.run(coro)
+
+@pytest.fixture(params=["sqlite:///", "fakeredis://"])
+def store(request):
+    store = create_task_store(request.param)
+    run(store.initialize())
+    yield store
+    run(store.close())
+
+@pytest.fixture
+def events():
+    return []
+
+@pytest.fixture
+def engine(store, events):
+    async def dispatch():
+        return 0
+
+    async def publish_event(workflow_id, event):
+        events.append(event)
+
+    return WorkflowEngine(store, dispatch, publish_event)
+
+PIPELINE = {
+    "steps": [
+        {"id": "publish", "type": "publish", "data": {"text": "$steps.optimize.result.text"}},
+        {"id": "keywords", "type": "generate_keywords", "data": {"topic": "seo"}},
+        {"id": "optimize", "type": "optimize", "data": {"keywords": "$steps.keywords.result.keywords"}},
+    ]
+}
+
+def finish(store, engine, workflow_id, step_id, status=TaskStatus.COMPLETED, result=None, error=None):
+    task_id = engine.step_task_id(workflow_id, step_id)
+    record = run(store.update(task_id, status=status, result=result, error=error))
+    run(engine.step_finished(record))
+
+def test_parse_orders_steps_after_dependencies():
+    steps = parse_workflow(PIPELINE)
+
+    assert [s["id"] for s in steps] == ["keywords", "optimize", "publish"]
+    assert steps[1]["depends_on"] == ["keywords"]
+
+def test_parse_rejects_cycles_and_unknown_steps():
+    with pytest.raises(WorkflowError, match="cycle"):
+        parse_workflow({"steps": [
+            {"id": "a", "type": "t", "depends_on": ["b"]},
+            {"id": "b", "type": "t", "depends_on": ["a"]},
+        ]})
+    with pytest.raises(WorkflowError, match="unknown"):
+        parse_workflow({"steps": [{"id": "a", "type": "t", "depends_on": ["missing"]}]})
+
+def test_steps_run_in_dependency_order(store, engine):
+    workflow_id = run(engine.submit(PIPELINE))["workflow_id"]
+    assert [r["task"]["workflow_step"] for r in run(store.list_queued())] == ["keywords"]
+
+    finish(store, engine, workflow_id, "keywords", result={"keywords": ["seo tools"]})
+    queued = run(store.list_queued())
+    assert [r["task"]["workflow_step"] for r in queued] == ["optimize"]
+    assert queued[0]["task"]["data"] == {"keywords": ["seo tools"]}
+
+    finish(store, engine, workflow_id, "optimize", result={"text": "optimized"})
+    finish(store, engine, workflow_id, "publish", result={"url": "/post"})
+
+    status = run(engine.status(workflow_id))
+    assert status["status"] == TaskStatus.COMPLETED
+    assert run(store.get(workflow_id))["result"]["steps"]["publish"] == {"url": "/post"}
+
+def test_failed_step_skips_dependents_and_fails_workflow(store, engine, events):
+    workflow_id = run(engine.submit({"steps": [
+        {"id": "a", "type": "t"},
+        {"id": "b", "type": "t", "depends_on": ["a"]},
+        {"id": "c", "type": "t", "depends_on": ["b"]},
+        {"id": "independent", "type": "t"},
+    ]}))["workflow_id"]
+
+    finish(store, engine, workflow_id, "a", status=TaskStatus.FAILED, error="model unavailable")
+    status = run(engine.status(workflow_id))
+    # The workflow waits for steps that can still run
+    assert status["status"] == TaskStatus.RUNNING
+    assert status["steps"]["b"]["status"] == TaskStatus.SKIPPED
+    assert status["steps"]["c"]["status"] == TaskStatus.SKIPPED
+
+    finish(store, engine, workflow_id, "independent", result={})
+    status = run(engine.status(workflow_id))
+    assert status["status"] == TaskStatus.FAILED
+    assert "step a failed: model unavailable" in status["error"]
+    assert status["steps"]["independent"]["status"] == TaskStatus.COMPLETED
+    assert events[-1]["event"] == "failed"
+
+def test_missing_output_reference_fails_workflow(store, engine):
+    workflow_id = run(engine.submit({"steps": [
+        {"id": "a", "type": "t"},
+        {"id": "b", "type": "t", "data": {"text": "$steps.a.result.text"}},
+    ]}))["workflow_id"]
+
+    finish(store, engine, workflow_id, "a", result={"other": 1})
+
+    status = run(engine.status(workflow_id))
+    assert status["status"] == TaskStatus.FAILED
+    assert "refers to missing output" in status["error"]
+
+def test_step_queued_by_another_node_is_not_queued_again(store, engine, events):
+    workflow_id = run(engine.submit({"steps": [{"id": "a", "type": "t"}]}))["workflow_id"]
+    step_id = engine.step_task_id(workflow_id, "a")
+    assert run(store.claim(step_id, "agent_1"))
+
+    # A second node whose view predates the step tries to queue it too
+    other = WorkflowEngine(store, engine.dispatch, engine.publish_event)
+
+    async def stale_records(workflow):
+        return {"a": None}
+
+    other._step_records = stale_records
+    assert run(other.advance(workflow_id)) == 0
+
+    record = run(store.get(step_id))
+    assert record["status"] == TaskStatus.DISPATCHED
+    assert record["assigned_agent"] == "agent_1"